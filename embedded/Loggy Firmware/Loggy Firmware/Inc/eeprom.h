@@ -62,6 +62,7 @@ typedef struct {
     float adc[4];
     AccelData Acc;
     float temp;
+    uint32_t tick; // time the sample was taken, in us since power up
 } SensorData;
 
 extern SensorData sensor;
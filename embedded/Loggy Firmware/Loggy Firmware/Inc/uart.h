@@ -14,9 +14,27 @@
 
 #define BAUD 103
 
+// the baud rate after power up and after the GUI disconnects
+#define DEFAULT_BAUD 9600UL
+
+// the fastest baud rate the GUI can ask for
+#define MAX_BAUD 500000UL
+
+// time to wait for the last bytes to be sent before changing the baud rate
+#define BAUD_SWITCH_MS 5
+
+// time the GUI has to echo a message at a new baud rate, in ms
+#define BAUD_TRIAL_MS 500
+
 // the buffer size of sending data
 #define DATA_BUFFER 110
 
+// first byte of a binary data frame, never sent in a text message
+#define FRAME_SYNC 0xA5
+
+// the length of a binary data frame: sync, sequence, tick, 8 floats, crc
+#define FRAME_LENGTH 41
+
 // the buffer size of sending config
 #define CONFIG_BUFFER 100
 
@@ -34,6 +52,8 @@
 
 void USART_Init(unsigned int ubrr);
 
+void set_baud_rate(uint32_t baud);
+
 unsigned char USART_Receive(void);
 
 void USART_Transmit(unsigned char data);
@@ -42,6 +62,8 @@ void uart_send_string(char* str);
 
 void com_send_data(const SensorData* data);
 
+void com_send_frame(const SensorData* data);
+
 void send_config(Config* config);
 
 void process_command(char* cmd, Config* loggy_config);
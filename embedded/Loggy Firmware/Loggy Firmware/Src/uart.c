@@ -17,6 +17,7 @@
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
+#include <util/crc16.h>
 #include <util/delay.h>
 //
 //
@@ -35,6 +36,12 @@ volatile bool offRec = true;
 volatile bool contSending;
 // Flag to stop send the data and set when replay
 volatile bool onReplay = false;
+// Flag to send the data as binary frames instead of "D:" lines
+volatile bool binaryFrames = false;
+// sequence number of the next binary frame
+uint16_t frameSeq = 0;
+// the baud rate the GUI and the loggy have agreed on
+uint32_t baudRate = DEFAULT_BAUD;
 
 /*
  * init the uart baud rate
@@ -53,6 +60,64 @@ void USART_Init(unsigned int ubrr)
     UCSR0C = (1 << UCSZ01) | (1 << UCSZ00); // 8 data bits, 1 stop bits
 }
 
+/**
+ * change the baud rate, double speed mode is used because the fast rates
+ * are much closer to 16 MHz / (8 * n) than 16 MHz / (16 * n)
+ *
+ * baud: the new baud rate
+ *
+ * return: None
+ */
+void set_baud_rate(uint32_t baud)
+{
+    uint16_t ubrr = (F_CPU / 4 / baud - 1) / 2; // rounded to nearest
+    UCSR0A |= (1 << U2X0);
+    UBRR0H = (unsigned char)(ubrr >> 8);
+    UBRR0L = (unsigned char)ubrr;
+    uartIndex = 0; // anything received during the change is garbage
+}
+
+/**
+ * this function is to try a faster baud rate asked for by the GUI
+ * "BAUD OK <rate>" is sent at the old rate, then the GUI has BAUD_TRIAL_MS
+ * to send "ECHO <text>" at the new rate. The loggy sends it back and keeps
+ * the new rate, otherwise it goes back to the old rate
+ *
+ * baud: the new baud rate
+ *
+ * return: None
+ */
+static void try_baud_rate(uint32_t baud)
+{
+    char buff[ALARM_BUFFER];
+    if (baud < DEFAULT_BAUD || baud > MAX_BAUD) {
+        uart_send_string("BAUD NO\r\n");
+        return;
+    }
+    sprintf(buff, "BAUD OK %lu\r\n", (unsigned long)baud);
+    uart_send_string(buff);
+    _delay_ms(BAUD_SWITCH_MS); // let the last bytes leave at the old rate
+    set_baud_rate(baud);
+    // this command is still in the queue, the echo goes after it
+    uint8_t waiting = cmdsWaiting;
+    for (uint16_t ms = 0; ms < BAUD_TRIAL_MS; ms++) {
+        if (cmdsWaiting > waiting) {
+            char* echo = (char*)cmdsToProcess[waiting];
+            if (strncmp(echo, "ECHO ", 5) == 0) {
+                uart_send_string(echo);
+                uart_send_string("\r\n");
+                cmdsWaiting = waiting;
+                baudRate = baud;
+                return;
+            }
+            cmdsWaiting = waiting;
+            break;
+        }
+        _delay_ms(1);
+    }
+    set_baud_rate(baudRate);
+}
+
 /**
  * receive the byte and return it
  *
@@ -118,6 +183,9 @@ void process_command(char* cmd, Config* loggyConfig)
         send_config(loggyConfig);
         reset_alarm();
         onReplay = false;
+        // every connection starts with "D:" lines, the GUI asks for frames
+        binaryFrames = false;
+        frameSeq = 0;
         uart_send_string("END CONT\r\n");
         contSending = true;
         return;
@@ -128,6 +196,23 @@ void process_command(char* cmd, Config* loggyConfig)
         return;
     }
 
+    // GUI asks for a faster baud rate
+    if (strncmp(cmd, "BAUD ", 5) == 0) {
+        try_baud_rate(strtoul(cmd + 5, NULL, 10));
+        return;
+    }
+
+    // GUI can decode binary frames
+    if (strncmp(cmd, "BIN ON", 6) == 0) {
+        uart_send_string("BIN OK\r\n");
+        binaryFrames = true;
+        return;
+    }
+    if (strncmp(cmd, "BIN OFF", 7) == 0) {
+        binaryFrames = false;
+        return;
+    }
+
     // receive stop cont
     if (strncmp(cmd, "RPY ON", 6) == 0) {
         onReplay = true;
@@ -215,6 +300,10 @@ void process_command(char* cmd, Config* loggyConfig)
 void com_send_data(const SensorData* data)
 {
     if (contSending && (!onReplay)) {
+        if (binaryFrames) {
+            com_send_frame(data);
+            return;
+        }
         char buffer[DATA_BUFFER];
         // THE COMMAND "D" SHOULD NOT BE USED IN OTHER COMMAND
         sprintf(buffer, "D:%.6f,%.6f,%.6f,%.6f,%.6f,%.6f,%.6f,%.6f\r\n",
@@ -224,6 +313,41 @@ void com_send_data(const SensorData* data)
     }
 }
 
+/**
+ * this function is to send the data to the GUI as one binary frame
+ *
+ * frame: sync byte, sequence number (uint16), tick in us (uint32), the eight
+ * channels (float32) and a CRC-16/XMODEM of everything after the sync byte.
+ * All little endian, FRAME_LENGTH bytes in total
+ *
+ * data: all eight channels data need to send
+ *
+ * return:None
+ */
+void com_send_frame(const SensorData* data)
+{
+    uint8_t frame[FRAME_LENGTH];
+    float values[8] = { data->adc[0], data->adc[1], data->adc[2],
+        data->adc[3], data->Acc.x, data->Acc.y, data->Acc.z, data->temp };
+    uint16_t crc = 0;
+
+    frame[0] = FRAME_SYNC;
+    frame[1] = (uint8_t)frameSeq;
+    frame[2] = (uint8_t)(frameSeq >> 8);
+    // the AVR is little endian and its floats are IEEE 754 single precision
+    memcpy(&frame[3], &data->tick, sizeof(data->tick));
+    memcpy(&frame[7], values, sizeof(values));
+    for (uint8_t i = 1; i < FRAME_LENGTH - 2; i++) {
+        crc = _crc_xmodem_update(crc, frame[i]);
+    }
+    frame[FRAME_LENGTH - 2] = (uint8_t)crc;
+    frame[FRAME_LENGTH - 1] = (uint8_t)(crc >> 8);
+    for (uint8_t i = 0; i < FRAME_LENGTH; i++) {
+        USART_Transmit(frame[i]);
+    }
+    frameSeq++;
+}
+
 /**
  *
  *this function is to send the basic eeprom config to the GUI when start
@@ -275,6 +399,11 @@ ISR(USART_RX_vect)
         // if the cmd is STOP CONT then disconnected dis cont_sending
         if (!strcmp("STOP CONT", (char*)uartBuffer)) {
             contSending = false;
+            // the next GUI connects at the default rate
+            if (baudRate != DEFAULT_BAUD) {
+                baudRate = DEFAULT_BAUD;
+                set_baud_rate(DEFAULT_BAUD);
+            }
             uartIndex = 0;
             return;
         } else {
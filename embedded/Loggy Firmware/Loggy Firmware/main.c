@@ -38,7 +38,12 @@ extern volatile char cmdsToProcess[UART_QUEUE_LENGTH][UART_QUEUE_STR_LENGTH];
 // Store the number of commands in cmdsToProcess
 extern volatile uint8_t cmdsWaiting;
 
+// ms since power up, counted by timer0
+volatile uint32_t msTicks = 0;
+
 void hardware_init(void);
+void tick_init(void);
+uint32_t get_tick_us(void);
 
 /**
  * Main super loop
@@ -50,6 +55,8 @@ int main(void)
     while (1) {
         SensorData Data;
         SAMPLE_LED_TOGGLE();
+        // the GUI works out the sample times from this
+        Data.tick = get_tick_us();
         // get channel data
         get_vol_values(&Data, &LoggyConfig);
         accelerometer_read(&Data.Acc);
@@ -87,6 +94,7 @@ void hardware_init(void)
     // init peripherals
     button_init();
     init_pins();
+    tick_init();
     USART_Init(BAUD);
     HD44780_Init();
     HD44780_DisplayOn();
@@ -102,3 +110,40 @@ void hardware_init(void)
     // change set based on eeprom
     check_scale(&LoggyConfig);
 }
+
+/**
+ * Start timer0 as a 1 ms tick, prescaler 64 so each count is 4 us
+ *
+ * Return: None
+ */
+void tick_init(void)
+{
+    TCCR0A = (1 << WGM01); // CTC mode
+    OCR0A = 249; // 250 counts of 4 us
+    TIMSK0 = (1 << OCIE0A);
+    TCCR0B = (1 << CS01) | (1 << CS00);
+}
+
+/**
+ * Time since power up in us, wraps every 71.6 minutes
+ *
+ * Return: the time in us
+ */
+uint32_t get_tick_us(void)
+{
+    uint8_t sreg = SREG;
+    cli();
+    uint32_t ms = msTicks;
+    uint8_t count = TCNT0;
+    // the timer has wrapped but the interrupt has not run yet
+    if ((TIFR0 & (1 << OCF0A)) && count < 249) {
+        ms++;
+    }
+    SREG = sreg;
+    return ms * 1000UL + count * 4UL;
+}
+
+ISR(TIMER0_COMPA_vect)
+{
+    msTicks++;
+}
@@ -0,0 +1,20 @@
+"""
+Benchmarks of the acquisition pipeline, from the bytes read from the port
+to the live plots and the recordings. They need no loggy and no display:
+the input is made up and the graphs are drawn with Agg.
+
+    python -m benchmarks.run
+    python -m benchmarks.run --quick --out results.json
+    python -m benchmarks.run --runs 3 --save-baseline
+
+Run them from the lab_pc folder. The results are compared with
+benchmarks/baseline.json and a result that is more than --tolerance worse
+is reported as a regression (exit status 1). The baseline depends on the
+machine, so save a new one before comparing on a different computer. On a
+busy machine the results vary between runs, --runs keeps the median of
+several.
+"""
+import os
+
+# No display is needed, set before pyplot is imported by main_gui
+os.environ["MPLBACKEND"] = "Agg"
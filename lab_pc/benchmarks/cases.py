@@ -0,0 +1,238 @@
+"""
+The benchmark cases. Each case takes the size of its input and returns
+{metric name: (value, unit, higher is better)}.
+"""
+import binascii
+import contextlib
+import io
+import os
+import tempfile
+import time
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import main_gui as gui
+from loggy.core import (FRAME_DTYPE, FRAME_SEQ_WRAP, FRAME_SYNC,
+                        FRAME_TICK_WRAP, LOGGY_SAMPLE_RATE, Data, ReplayFile,
+                        WriteFrames)
+
+# Samples per live plot frame at the loggy's rate
+FRAME_SAMPLES = int(LOGGY_SAMPLE_RATE * gui.LIVE_PLOT_INTERVAL / 1000)
+GRAPH_POINTS = (100, 420, 1000)  # Graph.num_data_points measured
+READ_SIZE = 4096  # Bytes read from the port at a time
+BLOCK_SAMPLES = 64  # Samples received together
+REPEATS = 3  # The fastest of this many runs is kept, after a warm up run
+
+
+class NoWidget:
+    """Stands in for the Tk widgets of a Graph, nothing is shown"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class AggCanvas(FigureCanvasAgg):
+    """FigureCanvasTkAgg without Tk, the figure is drawn into memory. The
+    copy of the drawing onto the Tk widget is the only part not measured."""
+
+    def __init__(self, figure, master=None):
+        super().__init__(figure)
+
+    def get_tk_widget(self):
+        return NoWidget()
+
+    def blit(self, bbox=None):
+        pass
+
+
+@contextlib.contextmanager
+def headless_gui():
+    """Makes Graphs without a display while it is active"""
+    saved = {name: getattr(gui.tk, name)
+             for name in ("Text", "Label", "BooleanVar")}
+    saved_canvas = gui.FigureCanvasTkAgg
+    for name in saved:
+        setattr(gui.tk, name, NoWidget)
+    gui.FigureCanvasTkAgg = AggCanvas
+    try:
+        yield
+    finally:
+        for name, widget in saved.items():
+            setattr(gui.tk, name, widget)
+        gui.FigureCanvasTkAgg = saved_canvas
+
+
+def make_lines(count: int) -> list:
+    """Returns count "D:" lines like the firmware sends"""
+    values = np.random.default_rng(0).normal(size=(count, 8))
+    return ["D:%.6f,%.6f,%.6f,%.6f,%.6f,%.6f,%.6f,%.6f" % tuple(row)
+            for row in values.tolist()]
+
+
+def make_frames(count: int) -> np.ndarray:
+    """Returns count binary frames with correct CRCs"""
+    frames = np.zeros(count, dtype=FRAME_DTYPE)
+    frames["sync"] = FRAME_SYNC
+    frames["seq"] = np.arange(count) % FRAME_SEQ_WRAP
+    frames["tick"] = (np.arange(count) * 5952) % FRAME_TICK_WRAP
+    frames["values"] = np.random.default_rng(0).normal(size=(count, 8))
+    raw = memoryview(frames.tobytes())
+    size = FRAME_DTYPE.itemsize
+    frames["crc"] = [binascii.crc_hqx(raw[start + 1:start + size - 2], 0)
+                     for start in range(0, len(raw), size)]
+    return frames
+
+
+def new_data(capacity: int = gui.DATA_CAPACITY) -> Data:
+    data = Data(1, capacity)
+    data.clear_data()
+    return data
+
+
+def timed(function, *args) -> float:
+    """Returns the seconds function(*args) took"""
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def bench_append(samples: int) -> dict:
+    """Data.append_data one line at a time, Data.append_lines and
+    Data.append_frames in blocks, and the whole binary path from the bytes
+    read to the data (WriteFrames.data_received)."""
+    lines = make_lines(samples)
+    frames = make_frames(samples)
+
+    def one_at_a_time(data):
+        for line in lines:
+            data.append_data(line)
+
+    def line_blocks(data):
+        for start in range(0, samples, BLOCK_SAMPLES):
+            data.append_lines(lines[start:start + BLOCK_SAMPLES])
+
+    def frame_blocks(data):
+        for start in range(0, samples, BLOCK_SAMPLES):
+            data.append_frames(frames[start:start + BLOCK_SAMPLES])
+
+    def from_bytes(data):
+        reader = WriteFrames(lambda message: None, None, data.append_lines,
+                             data.append_frames, data.stats,
+                             data.skip_frame)
+        raw = frames.tobytes()
+        for start in range(0, len(raw), READ_SIZE):
+            reader.data_received(raw[start:start + READ_SIZE])
+
+    results = {}
+    for name, function in (("append_data", one_at_a_time),
+                           ("append_lines", line_blocks),
+                           ("append_frames", frame_blocks),
+                           ("frames_from_bytes", from_bytes)):
+        seconds = min(timed(function, new_data())
+                      for _ in range(REPEATS + 1))
+        results[f"{name}_rate"] = (samples / seconds, "samples/s", True)
+    return results
+
+
+def bench_graph(frames: int) -> dict:
+    """The live plot frame time (Graph.draw_frame, which calls animate) for
+    each of GRAPH_POINTS, with FRAME_SAMPLES new samples each frame. Some
+    frames redraw the whole figure when the x-axis scrolls."""
+    results = {}
+    saved_points = gui.Graph.num_data_points
+    lines = make_lines(FRAME_SAMPLES * (frames + max(GRAPH_POINTS)))
+    try:
+        for points in GRAPH_POINTS:
+            gui.Graph.num_data_points = points
+            data = new_data()
+            with headless_gui():
+                graph = gui.Graph(NoWidget(), ("V", "A", "T"),
+                                  ("V", "m/s^2", "C"))
+                graph.add_live_plot(gui.CHANNELS_LIST, data, blit=True)
+            draw_frame, args, _ = graph._timer.callbacks[0]
+            # Fill the window before timing
+            data.append_lines(lines[:points])
+            used = points
+            draw_frame(*args)
+            times = []
+            for _ in range(frames):
+                data.append_lines(lines[used:used + FRAME_SAMPLES])
+                used += FRAME_SAMPLES
+                times.append(timed(draw_frame, *args) * 1000)
+            graph.stop_live_plot()
+            results[f"frame_{points}_mean"] = (float(np.mean(times)), "ms",
+                                               False)
+            results[f"frame_{points}_p95"] = (
+                float(np.percentile(times, 95)), "ms", False)
+    finally:
+        gui.Graph.num_data_points = saved_points
+    return results
+
+
+def bench_search(queries: int) -> dict:
+    """search_for_point on the live window and on a long replay window"""
+    results = {}
+    rng = np.random.default_rng(0)
+    for size in (gui.DATA_CAPACITY, 1_000_000):
+        xdata = np.cumsum(rng.uniform(0.001, 0.01, size))
+        points = rng.uniform(xdata[0], xdata[-1], queries).tolist()
+
+        def search_all():
+            for point in points:
+                gui.search_for_point(point, xdata)
+
+        seconds = min(timed(search_all) for _ in range(REPEATS + 1))
+        results[f"search_{size}"] = (seconds / queries * 1e6, "us", False)
+    return results
+
+
+def record(samples: int, file_path: str) -> float:
+    """Records that many made up samples to file_path, in the binary format
+    if it ends with .lgy.
+    Returns the seconds from the start of recording until save_data has
+    finished the file"""
+    values = np.random.default_rng(0).normal(size=(8, samples))
+    stamps = time.time() + np.arange(samples) / LOGGY_SAMPLE_RATE
+    data = new_data()
+    start = time.perf_counter()
+    data.record(file_path.endswith(gui.BIN_EXTENSION), file_path)
+    for first in range(0, samples, BLOCK_SAMPLES):
+        last = first + BLOCK_SAMPLES
+        data.append_values(values[:, first:last], stamps[first:last])
+    with contextlib.redirect_stdout(io.StringIO()):
+        data.save_data()
+    return time.perf_counter() - start
+
+
+def bench_files(samples: int) -> dict:
+    """Recording with Data.save_data, and opening the recording for replay
+    (what Replay.read_csv_file does after the file is chosen) then reading
+    the first window"""
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for kind in ("csv", "lgy"):
+            file_path = os.path.join(directory, f"bench.{kind}")
+            seconds = record(samples, file_path)
+            results[f"save_{kind}_rate"] = (samples / seconds, "samples/s",
+                                            True)
+            start = time.perf_counter()
+            replay_file = ReplayFile(file_path)
+            seconds = time.perf_counter() - start
+            results[f"replay_{kind}_load_rate"] = (samples / seconds,
+                                                   "samples/s", True)
+            seconds = timed(replay_file.window, 0.0, replay_file.duration,
+                            2000)
+            results[f"replay_{kind}_window"] = (seconds * 1000, "ms", False)
+            replay_file.close()
+    return results
+
+
+# name: (function, full size, --quick size)
+CASES = {
+    "append": (bench_append, 200_000, 20_000),
+    "graph": (bench_graph, 60, 30),
+    "search": (bench_search, 20_000, 10_000),
+    "files": (bench_files, 500_000, 50_000),
+}
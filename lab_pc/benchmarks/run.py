@@ -0,0 +1,135 @@
+"""
+Runs the benchmarks, writes the results as JSON and compares them with the
+baseline. See benchmarks/__init__.py.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import matplotlib
+import numpy as np
+from benchmarks.cases import CASES
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+TOLERANCE = 0.25  # Fraction a result can be worse than the baseline
+
+
+def run_cases(names: list, quick: bool, runs: int = 1) -> dict:
+    """Runs the cases in names, runs times over. The median of the runs is
+    kept, which steadies the results on a busy machine.
+    Returns {metric name: {"value", "unit", "higher_is_better"}}"""
+    values = {}
+    results = {}
+    for run in range(runs):
+        for name in names:
+            function, size, quick_size = CASES[name]
+            print(f"Running {name} ({run + 1}/{runs})...", file=sys.stderr)
+            for metric, (value, unit, higher) in function(
+                    quick_size if quick else size).items():
+                key = f"{name}.{metric}"
+                values.setdefault(key, []).append(value)
+                results[key] = {"value": value, "unit": unit,
+                                "higher_is_better": higher}
+    for key, result in results.items():
+        result["value"] = float(np.median(values[key]))
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> dict:
+    """Compares each result with the baseline. change is how much better
+    (positive) or worse (negative) the result is, as a fraction.
+    Returns {metric name: {"baseline", "change", "regression"}}"""
+    comparison = {}
+    for metric, result in results.items():
+        if metric not in baseline:
+            continue
+        old = baseline[metric]["value"]
+        change = result["value"] / old - 1 if old else 0.0
+        if not result["higher_is_better"]:
+            change = old / result["value"] - 1 if result["value"] else 0.0
+        comparison[metric] = {"baseline": old, "change": change,
+                              "regression": change < -tolerance}
+    return comparison
+
+
+def print_table(results: dict, comparison: dict) -> None:
+    """Prints the results and their change from the baseline.
+    Returns nothing"""
+    for metric, result in results.items():
+        line = f"{metric:36} {result['value']:14.4g} {result['unit']:10}"
+        if metric in comparison:
+            change = comparison[metric]
+            line += f" {change['change']:+7.1%}"
+            if change["regression"]:
+                line += "  REGRESSION"
+        print(line)
+
+
+def main(argv: list | None = None) -> int:
+    """Runs the benchmarks.
+    Returns 1 if there is a regression, otherwise 0"""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run",
+        description="Benchmark the acquisition pipeline.")
+    parser.add_argument("cases", nargs="*",
+                        help=f"the cases to run, from {', '.join(CASES)}, "
+                             f"all of them by default")
+    parser.add_argument("--quick", action="store_true",
+                        help="smaller inputs, for a fast check")
+    parser.add_argument("--runs", type=int, default=1,
+                        help="run everything this many times and keep the "
+                             "median, 3 or more for a baseline")
+    parser.add_argument("--out", help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=BASELINE_PATH,
+                        help="JSON file of the results to compare with")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="save the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="fraction worse than the baseline that is a "
+                             "regression")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.cases if name not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+
+    mode = "quick" if args.quick else "full"
+    results = run_cases(args.cases or list(CASES), args.quick, args.runs)
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baselines = json.load(file)
+    # Results are only comparable with a baseline of the same input sizes
+    comparison = compare(results, baselines.get(mode, {}), args.tolerance)
+    print_table(results, comparison)
+    report = {
+        "mode": mode,
+        "runs": args.runs,
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(),
+                    "numpy": np.__version__,
+                    "matplotlib": matplotlib.__version__,
+                    "platform": platform.platform(),
+                    "processor": platform.processor()},
+        "results": results,
+        "comparison": comparison,
+    }
+    if args.out:
+        with open(args.out, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.save_baseline:
+        baselines.setdefault(mode, {}).update(results)
+        with open(args.baseline, "w") as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+            file.write("\n")
+    regressions = [metric for metric, change in comparison.items()
+                   if change["regression"]]
+    if regressions:
+        print(f"{len(regressions)} regressions: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
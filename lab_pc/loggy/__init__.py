@@ -0,0 +1,6 @@
+"""
+The Loggy lab PC software without the GUI. core has the serial link, the
+data and the recordings, alarms checks the alarm thresholds on the PC,
+acquire records a loggy headless and simulator pretends to be a loggy on a
+pseudo-terminal.
+"""
@@ -0,0 +1,188 @@
+"""
+Headless acquisition: records a loggy straight to a file without the GUI, for
+long unattended runs. Tk and matplotlib are never imported, so it runs on a
+machine without a display and uses much less CPU and memory than the GUI.
+
+    python -m loggy.acquire --port /dev/ttyUSB0 --out run.csv
+
+Run it from the lab_pc folder. A .lgy file is saved as a binary recording.
+It stops after --duration seconds, when the file reaches --max-bytes, when
+the loggy is unplugged, or on SIGTERM or Ctrl+C. The file and its
+<name>_stats.csv are finished before it exits. --perf saves the timings
+of the pipeline (see core.PerfStats) when it exits.
+"""
+import argparse
+import os
+import signal
+import sys
+import time
+import serial as ser
+from loggy.core import (BIN_EXTENSION, EVENT_ERROR, RTEMP_CURRENTS,
+                        SENSOR_MODELS, SERIAL_TRANSPORT, VOLT_CHANNELS, Data,
+                        Loggy, events, perf)
+import loggy.core as core
+
+ACQUIRE_CAPACITY = 1  # Samples kept in memory, nothing is plotted
+ACQUIRE_POLL_INTERVAL = 0.2  # s between checks of the limits and the events
+ACQUIRE_STATUS_INTERVAL = 10.0  # s between status lines
+
+
+class Acquisition:
+    """
+    One headless recording. The loggy is read the same way as the extra
+    loggys of the GUI (Loggy), the events the reader posts are handled on
+    the main thread between checks of the limits.
+    """
+
+    def __init__(self, port_name: str, out_path: str,
+                 duration: float | None = None,
+                 max_bytes: int | None = None):
+        """
+        Parameters
+        ----------
+        port_name : str
+            The serial port of the loggy.
+        out_path : str
+            The recording, .csv or .lgy.
+        duration : float
+            Seconds to record for, no limit if it is None.
+        max_bytes : int
+            Size the recording stops at, no limit if it is None.
+        """
+        self.out_path = os.path.abspath(out_path)
+        self.duration = duration
+        self.max_bytes = max_bytes
+        self.data = Data(0, capacity=ACQUIRE_CAPACITY)
+        self.loggy = Loggy(port_name, self.data)
+        self.stop_reason = None
+        perf.gauge("record queue", lambda: self.data.record_queue_depth)
+        events.subscribe(EVENT_ERROR, self.show_error)
+
+    def show_error(self, message: str) -> None:
+        """EVENT_ERROR handler, the errors go to stderr.
+        Returns nothing"""
+        if self.stop_reason is not None and message == "port closed":
+            return  # Closed by stop
+        sys.stderr.write(f"{message}\n")
+
+    def stop(self, reason: str) -> None:
+        """Makes run finish the recording at its next check, can be called
+        from a signal handler.
+        Returns nothing"""
+        if self.stop_reason is None:
+            self.stop_reason = reason
+
+    def run(self) -> int:
+        """Connects to the loggy and records until a limit is reached or
+        stop is called.
+        Returns the exit status, 1 if the loggy could not be reached or was
+        lost"""
+        # The times start from here, before the reader can add samples
+        self.data.clear_data()
+        self.data.record(self.out_path.endswith(BIN_EXTENSION),
+                         self.out_path)
+        try:
+            self.loggy.connect()
+        except (ser.SerialException, OSError) as error:
+            sys.stderr.write(f"Could not open {self.loggy.port_name}: "
+                             f"{error}\n")
+            self.data.save_data()  # Nothing was recorded, no file is made
+            return 1
+        print(f"Recording {self.loggy.port_name} at {self.loggy.baud_rate} "
+              f"baud to {self.out_path}")
+        start = time.monotonic()
+        last_status = start
+        while self.stop_reason is None:
+            time.sleep(ACQUIRE_POLL_INTERVAL)
+            events.handle_pending()
+            now = time.monotonic()
+            if not self.loggy.connected:
+                self.stop("connection lost")
+            elif self.duration is not None \
+                    and now - start >= self.duration:
+                self.stop("duration reached")
+            elif self.max_bytes is not None \
+                    and self.data.bytes_recorded >= self.max_bytes:
+                self.stop("size limit reached")
+            if now - last_status >= ACQUIRE_STATUS_INTERVAL:
+                last_status = now
+                self.print_status()
+        print(f"Stopping: {self.stop_reason}")
+        self.loggy.close()
+        self.data.save_data()
+        events.handle_pending()
+        self.print_status()
+        return 1 if self.stop_reason == "connection lost" else 0
+
+    def print_status(self) -> None:
+        """Prints the sample counters and the size of the recording.
+        Returns nothing"""
+        received, malformed, gapped = self.data.stats.snapshot()
+        print(f"{received} samples, {malformed} malformed, {gapped} gapped, "
+              f"{self.data.bytes_recorded} bytes")
+
+
+def parse_rtemp(text: str) -> tuple[int, str, str]:
+    """Reads a --rtemp value, CHANNEL:CURRENT:SENSOR e.g. 1:200uA:PT1000.
+    Returns (channel, current, sensor)"""
+    try:
+        channel, current, sensor = text.split(":")
+        channel = int(channel)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"{text!r} is not CHANNEL:CURRENT:SENSOR")
+    if channel not in VOLT_CHANNELS or current not in RTEMP_CURRENTS \
+            or sensor not in SENSOR_MODELS:
+        raise argparse.ArgumentTypeError(
+            f"{text!r}: channels {VOLT_CHANNELS}, currents "
+            f"{tuple(RTEMP_CURRENTS)}, sensors {tuple(SENSOR_MODELS)}")
+    return channel, current, sensor
+
+
+def main(argv: list | None = None) -> int:
+    """Reads the arguments and records.
+    Returns the exit status"""
+    parser = argparse.ArgumentParser(
+        prog="python -m loggy.acquire",
+        description="Record a loggy to a file without the GUI.")
+    parser.add_argument("--port", required=True,
+                        help="serial port of the loggy, e.g. /dev/ttyUSB0 "
+                             "or COM3")
+    parser.add_argument("--out", required=True,
+                        help="recording to save, .csv or .lgy (binary)")
+    parser.add_argument("--duration", type=float,
+                        help="seconds to record for")
+    parser.add_argument("--max-bytes", type=int,
+                        help="stop when the recording reaches this size")
+    parser.add_argument("--rtemp", type=parse_rtemp, action="append",
+                        default=[], metavar="CH:CURRENT:SENSOR",
+                        help="record a voltage channel as a temperature, "
+                             "can be given more than once")
+    parser.add_argument("--transport", choices=("asyncio", "thread"),
+                        default=SERIAL_TRANSPORT,
+                        help="how the port is read")
+    parser.add_argument("--no-negotiate", action="store_true",
+                        help="stay at the starting baud rate")
+    parser.add_argument("--perf", metavar="FILE",
+                        help="save the pipeline timings to this JSON file "
+                             "when finished")
+    args = parser.parse_args(argv)
+
+    core.SERIAL_TRANSPORT = args.transport
+    acquisition = Acquisition(args.port, args.out, args.duration,
+                              args.max_bytes)
+    acquisition.loggy.negotiate = not args.no_negotiate
+    for channel, current, sensor in args.rtemp:
+        acquisition.data.toggle_rtemp_mode(channel, current, sensor)
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signal_number,
+                      lambda number, frame: acquisition.stop(
+                          signal.Signals(number).name))
+    status = acquisition.run()
+    if args.perf:
+        perf.dump(args.perf)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+"""
+Alarms worked out on the PC. The thresholds and modes of the Settings tab
+are checked against every block of samples received, or every block of a
+recording being replayed, with the same AlarmEngine. The firmware still
+checks its own alarms, these add hysteresis, a minimum breach duration and
+a log of every alarm raised and cleared.
+"""
+import threading as th
+import numpy as np
+
+# Alarm modes, the same numbers as AlarmType_t in the firmware
+ALARM_DISABLED = 0
+ALARM_LIVE = 1
+ALARM_LATCHING = 2
+# Which threshold was breached, the same numbers as the AS messages
+ALARM_LOW = 1
+ALARM_HIGH = 2
+ALARM_SIDE_NAMES = {ALARM_LOW: "low", ALARM_HIGH: "high"}
+ALARM_CHANNELS = 8
+ALARM_LOG_START = 1024  # Events the log has room for before it grows
+# One alarm raised (raised 1) or cleared (raised 0)
+ALARM_EVENT_DTYPE = np.dtype([("time", "<f8"), ("channel", "u1"),
+                              ("raised", "u1"), ("side", "u1"),
+                              ("value", "<f8")])
+
+
+class AlarmLog:
+    """
+    Every alarm raised and cleared, in the order they happened. Each event
+    has an index (its position in the log), which does not change, so a
+    reader can ask for the events after the last one it has seen. The
+    events are kept in a structured array that doubles in size when full.
+    """
+
+    def __init__(self):
+        self._events = np.zeros(ALARM_LOG_START, dtype=ALARM_EVENT_DTYPE)
+        self._count = 0
+        # The reader thread adds events while the GUI reads them
+        self._lock = th.Lock()
+
+    def extend(self, new_events: np.ndarray) -> None:
+        """Adds events, which must be later than the events in the log.
+        new_events: array of ALARM_EVENT_DTYPE
+        Returns nothing"""
+        with self._lock:
+            end = self._count + len(new_events)
+            if end > len(self._events):
+                grown = np.zeros(max(end, 2 * len(self._events)),
+                                 dtype=ALARM_EVENT_DTYPE)
+                grown[:self._count] = self._events[:self._count]
+                self._events = grown
+            self._events[self._count:end] = new_events
+            self._count = end
+
+    def events(self, first: int = 0, channel: int | None = None,
+               start: float | None = None,
+               end: float | None = None) -> np.ndarray:
+        """Finds events in the log.
+        first: index of the first event looked at
+        channel: only the events of this channel (1 to 8)
+        start, end: only the events at or after start and before end
+        Returns a copy of the events as an array of ALARM_EVENT_DTYPE"""
+        with self._lock:
+            found = self._events[first:self._count]
+            times = found["time"]
+            if start is not None:
+                found = found[np.searchsorted(times, start):]
+                times = found["time"]
+            if end is not None:
+                found = found[:np.searchsorted(times, end)]
+            if channel is not None:
+                found = found[found["channel"] == channel]
+            return found.copy()
+
+    def clear(self) -> None:
+        """Removes every event.
+        Returns nothing"""
+        with self._lock:
+            self._count = 0
+
+    def save_csv(self, file_path: str, first: int = 0) -> int:
+        """Saves the events from index first as a csv file.
+        Returns the number of events saved"""
+        found = self.events(first)
+        with open(file_path, "w") as file:
+            file.write("Index,Time,Channel,Alarm,Threshold,Value\n")
+            for index, event in enumerate(found.tolist(), first):
+                time_stamp, channel, raised, side, value = event
+                file.write(f"{index},{time_stamp:.6f},{channel},"
+                           f"{'raised' if raised else 'cleared'},"
+                           f"{ALARM_SIDE_NAMES.get(side, '')},{value:g}\n")
+        return len(found)
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class AlarmEngine:
+    """
+    Checks the alarm thresholds of every channel against blocks of samples.
+    A sample breaches an alarm when it is below the lower or above the upper
+    threshold (NaN for no threshold).
+    - Live alarms are on while the channel is breached, latching alarms stay
+      on until the mode changes or reset is called. Changing a threshold
+      does not clear them.
+    - With hysteresis an alarm is only cleared once the value is hysteresis
+      back inside the thresholds, so a noisy value near a threshold does not
+      raise and clear it over and over.
+    - With a minimum duration a breach only raises the alarm once it has
+      lasted that many seconds.
+    Each block is checked with array operations: an alarm is on at a sample
+    if the last sample that raised it is later than the last sample that
+    cleared it. The state at the end of a block carries over to the next.
+    """
+
+    def __init__(self, num_channels: int = ALARM_CHANNELS):
+        """
+        Parameters
+        ----------
+        num_channels : int
+            The number of channels in each sample.
+        """
+        self.log = AlarmLog()
+        self._lower = np.full(num_channels, np.nan)
+        self._upper = np.full(num_channels, np.nan)
+        self._modes = np.full(num_channels, ALARM_DISABLED)
+        self._enabled = False  # Any mode is not ALARM_DISABLED
+        self._hysteresis = np.zeros(num_channels)
+        self._min_duration = np.zeros(num_channels)
+        # Settings are changed by the Tk thread while the reader evaluates
+        self._lock = th.Lock()
+        self._num_channels = num_channels
+        self.reset()
+
+    def reset(self, channel: int | None = None) -> None:
+        """Clears the alarms of a channel (1 to 8), or of every channel if
+        it is None. The log is kept.
+        Returns nothing"""
+        with self._lock:
+            if channel is None:
+                self._breached = np.zeros(self._num_channels, dtype=bool)
+                self._breached_since = np.zeros(self._num_channels)
+                self._on = np.zeros(self._num_channels, dtype=bool)
+                self._latched = np.zeros(self._num_channels, dtype=bool)
+                self._status = np.zeros(self._num_channels, dtype=bool)
+                self._side = np.zeros(self._num_channels, dtype=np.uint8)
+                return
+            for state in (self._breached, self._on, self._latched,
+                          self._status):
+                state[channel - 1] = False
+            self._side[channel - 1] = 0
+
+    def set_thresholds(self, channel: int, lower: float,
+                       upper: float) -> None:
+        """Sets the thresholds of a channel (1 to 8), NaN for no threshold.
+        Alarms on or latched stay as they are, the next samples are checked
+        against the new thresholds.
+        Returns nothing"""
+        with self._lock:
+            self._lower[channel - 1] = lower
+            self._upper[channel - 1] = upper
+
+    def set_mode(self, channel: int, mode: int) -> None:
+        """Sets the mode of a channel (1 to 8), ALARM_DISABLED, ALARM_LIVE
+        or ALARM_LATCHING. The alarm of the channel is cleared if the mode
+        changes.
+        Returns nothing"""
+        if mode not in (ALARM_DISABLED, ALARM_LIVE, ALARM_LATCHING):
+            raise ValueError(f"Unknown alarm mode {mode}")
+        with self._lock:
+            if self._modes[channel - 1] == mode:
+                return
+            self._modes[channel - 1] = mode
+            self._enabled = bool((self._modes != ALARM_DISABLED).any())
+        self.reset(channel)
+
+    def set_rules(self, hysteresis: float, min_duration: float,
+                  channel: int | None = None) -> None:
+        """Sets the hysteresis (in the units of the channel) and the minimum
+        breach duration (seconds) of a channel (1 to 8), or of every channel
+        if it is None.
+        Returns nothing"""
+        if hysteresis < 0 or min_duration < 0:
+            raise ValueError("Hysteresis and minimum duration can't be "
+                             "negative")
+        index = slice(None) if channel is None else channel - 1
+        with self._lock:
+            self._hysteresis[index] = hysteresis
+            self._min_duration[index] = min_duration
+
+    def copy(self) -> "AlarmEngine":
+        """Returns a new engine with the same settings, no alarms on and an
+        empty log, e.g. to check a recording with the live settings"""
+        engine = AlarmEngine(self._num_channels)
+        with self._lock:
+            for name in ("_lower", "_upper", "_modes", "_hysteresis",
+                         "_min_duration"):
+                setattr(engine, name, getattr(self, name).copy())
+            engine._enabled = self._enabled
+        return engine
+
+    @property
+    def enabled(self) -> bool:
+        """True if any channel's alarm is not disabled"""
+        return self._enabled
+
+    @property
+    def status(self) -> np.ndarray:
+        """0 for each channel with no alarm on, else ALARM_LOW or ALARM_HIGH
+        for the threshold that raised the alarm"""
+        with self._lock:
+            return np.where(self._status, self._side, 0)
+
+    def evaluate(self, times: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Checks a block of samples and logs the alarms raised and cleared.
+        times: the time of each sample (seconds since epoch), increasing
+        values: (number of channels, number of samples) array
+        Returns the new events, an array of ALARM_EVENT_DTYPE"""
+        num_samples = len(times)
+        if not num_samples or not self.enabled:
+            return np.zeros(0, dtype=ALARM_EVENT_DTYPE)
+        with self._lock:
+            new_events = self._evaluate(np.asarray(times, dtype=np.float64),
+                                        np.asarray(values).T)
+        if len(new_events):
+            self.log.extend(new_events)
+        return new_events
+
+    def _evaluate(self, times: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """evaluate with the lock held, values is (samples, channels)"""
+        samples = np.arange(len(times))[:, np.newaxis]
+        with np.errstate(invalid="ignore"):  # NaN values and thresholds
+            below = values < self._lower
+            above = values > self._upper
+            inside = ~((values < self._lower + self._hysteresis)
+                       | (values > self._upper - self._hysteresis))
+        breached = below | above
+        # The time each breach started, breaches from the last block go on
+        was_breached = np.vstack((self._breached, breached[:-1]))
+        breach_start = np.maximum.accumulate(
+            np.where(breached & ~was_breached, samples, -1), axis=0)
+        since = np.where(breach_start >= 0,
+                         times[np.maximum(breach_start, 0)],
+                         self._breached_since)
+        raises = breached & (times[:, np.newaxis] - since
+                             >= self._min_duration)
+        last_raise = np.maximum.accumulate(np.where(raises, samples, -1),
+                                           axis=0)
+        last_clear = np.maximum.accumulate(np.where(inside, samples, -1),
+                                           axis=0)
+        on = np.where((last_raise < 0) & (last_clear < 0), self._on,
+                      last_raise > last_clear)
+        latched = np.logical_or.accumulate(on, axis=0) | self._latched
+        status = np.where(self._modes == ALARM_LATCHING, latched, on) \
+            & (self._modes != ALARM_DISABLED)
+        # The threshold breached by the last raise at each sample
+        channels = np.arange(values.shape[1])
+        side = np.where(below, ALARM_LOW, ALARM_HIGH).astype(np.uint8)
+        side = np.where(last_raise >= 0,
+                        side[np.maximum(last_raise, 0), channels],
+                        self._side)
+        # A latched alarm keeps the threshold that latched it
+        first_on = np.argmax(status, axis=0)
+        latched_side = np.where(self._status, self._side,
+                                side[first_on, channels])
+        final_side = np.where(self._modes == ALARM_LATCHING, latched_side,
+                              side[-1])
+
+        changed = status != np.vstack((self._status, status[:-1]))
+        rows, columns = np.nonzero(changed)
+        new_events = np.empty(len(rows), dtype=ALARM_EVENT_DTYPE)
+        new_events["time"] = times[rows]
+        new_events["channel"] = columns + 1
+        new_events["raised"] = status[rows, columns]
+        new_events["side"] = side[rows, columns]
+        new_events["value"] = values[rows, columns]
+
+        self._breached = breached[-1]
+        self._breached_since = since[-1]
+        self._on = on[-1]
+        self._latched = latched[-1]
+        self._status = status[-1]
+        self._side = final_side
+        return new_events
+
+    def evaluate_file(self, replay_file, block_size: int = 100_000,
+                      progress=None) -> AlarmLog:
+        """Checks every sample of a recording opened for replay, from no
+        alarms on.
+        replay_file: a ReplayFile
+        progress: optional function called with the fraction checked, the
+        check stops if it returns False
+        Returns the log"""
+        self.reset()
+        if not self.enabled:
+            return self.log
+        num_samples = len(replay_file)
+        for first in range(0, num_samples, block_size):
+            times, values = replay_file.block(first, first + block_size)
+            self.evaluate(times, values)
+            if progress is not None:
+                fraction = min(first + block_size, num_samples) / num_samples
+                if progress(fraction) is False:
+                    break
+        return self.log
@@ -0,0 +1,2405 @@
+"""
+The parts of the Loggy software that do not need a display: the serial
+link and protocol, the conversion of the data and the recordings.
+Used by the GUI (main_gui.py) and the headless acquisition (acquire.py).
+"""
+import asyncio
+import binascii
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import tempfile
+import time
+import threading as th
+import queue as qu
+import tracemalloc
+from collections import deque
+from datetime import datetime, timedelta
+import numpy as np
+import serial as ser
+import serial.threaded as st
+from loggy.alarms import AlarmEngine
+
+STARTCONTMESSAGE = "START CONT#"
+# Binary data frames, see com_send_frame in the firmware. They start with
+# FRAME_SYNC, which is never sent in a text message, and end with a
+# CRC-16/XMODEM of the sequence number, the tick and the values. The tick is
+# the time the sample was taken in us, it wraps every 2^32 us.
+BINARY_FRAMES = True  # Ask for binary frames, old firmware ignores this
+BINARY_ON_MESSAGE = "BIN ON#"
+BINARY_ACK = "BIN OK"
+FRAME_SYNC = 0xA5
+FRAME_DTYPE = np.dtype([("sync", "u1"), ("seq", "<u2"), ("tick", "<u4"),
+                        ("values", "<f4", (8,)), ("crc", "<u2")])
+FRAME_SEQ_WRAP = 1 << 16
+# Scales used to round float32 values to n decimal places (see
+# float32_to_decimal): 10^n is DECIMAL_UP / DECIMAL_DOWN at DECIMAL_OFFSET + n,
+# both exact. Values outside DECIMAL_MIN to DECIMAL_MAX need bigger scales.
+DECIMAL_OFFSET = 30
+DECIMAL_UP = 10.0 ** np.maximum(np.arange(-30, 31), 0)
+DECIMAL_DOWN = 10.0 ** np.maximum(-np.arange(-30, 31), 0)
+DECIMAL_MIN = 1e-14
+DECIMAL_MAX = 1e22
+FRAME_TICK_WRAP = 1 << 32
+TICK_SECONDS = 1e-6  # Length of a tick
+# The times from the ticks are moved back in line with the host clock if they
+# are further apart than this many seconds (clock drift or a lost link)
+TICK_RESYNC = 1.0
+BAUDRATE = 9600  # The loggy starts at this rate and is asked to go faster
+BAUD_RATES = (57600, 115200, 250000, 500000)  # Tried from slowest to fastest
+BAUD_TIMEOUT = 0.6  # Seconds to wait for a reply while changing rate
+# How the port is read: "asyncio" runs it on an event loop in one background
+# thread (AsyncLink), "thread" uses serial.threaded.ReaderThread (ThreadLink)
+SERIAL_TRANSPORT = "asyncio"
+ASYNC_POLL_INTERVAL = 0.002  # s between reads if the loop can't watch a port
+ASYNC_POLL_IDLE = 0.05  # The interval doubles up to this while nothing comes
+ASYNC_WRITE_TIMEOUT = 1.0  # s a message can take to send
+ASYNC_CLOSE_TIMEOUT = 2.0  # s to send the last messages and stop reading
+# Commands that set a value, a newer one replaces one that is not sent yet
+COALESCED_COMMANDS = ("V0", "V1", "ALT CH", "AHT CH", "AM CH")
+# Constants for the thermistor
+A_THERM = 3.354016e-3
+B_THERM = 2.909670e-4
+C_THERM = 1.632136e-6
+D_THERM = 7.192200e-8
+# Constants for the PT1000 (Callendar-Van Dusen above 0 C)
+R0_PT1000 = 1000.0
+A_PT1000 = 3.9083e-3
+B_PT1000 = -5.775e-7
+# Current source of each rtemp current setting in amps
+RTEMP_CURRENTS = {"200uA": 0.000200, "10uA": 0.000010}
+# Channels in the loggy
+CHANNELS_LIST = (1, 2, 3, 4, 5, 6, 7, 8)
+VOLT_CHANNELS = (1, 2, 3, 4)
+ACCEL_CHANNELS = (5, 6, 7)
+TEMP_CHANNEL = 8
+# Number of samples kept for the live plots
+DATA_CAPACITY = 1000
+# Samples per second sent by the loggy, used to space out the times of
+# samples that are received together
+LOGGY_SAMPLE_RATE = 168
+# Data lines received together are parsed with np.loadtxt if there are at
+# least this many, it is slower to start but faster for each line
+PARSE_BLOCK_LINES = 32
+# Recording related constants
+RECORD_CHUNK_SIZE = 256  # Number of samples in each recorded chunk
+RECORD_QUEUE_CHUNKS = 64  # Number of full chunks waiting for the writer
+RECORD_FLUSH_SIZE = 1 << 20  # Characters/bytes buffered before writing
+RECORD_FLUSH_INTERVAL = 1.0  # Seconds between writes to the file
+# File related constants
+FILENAME_FORMAT = "%Y-%m-%d_%H-%M-%S"
+# Time with milliseconds, then the 8 channels
+CSV_ROW_FORMAT = "%s.%03d" + ",%r" * 8 + "\n"
+# The same with the device id at the end, when more than one loggy is recorded
+CSV_DEVICE_ROW_FORMAT = "%s.%03d" + ",%r" * 8 + ",%d\n"
+CSV_TIME_WIDTH = 23  # Length of YYYY-MM-DD_HH-MM-SS.sss
+# Positions and characters of the separators in the time
+CSV_TIME_SEPARATORS = ((4, 7, 10, 13, 16, 19), tuple(b"--_--."))
+# Positions of the digits in the time
+CSV_TIME_DIGITS = (0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18, 20, 21, 22)
+CSV_READ_BLOCK = 1 << 22  # Bytes of the file parsed at a time
+# Binary recording related constants
+BIN_EXTENSION = ".lgy"
+BIN_MAGIC = b"LOGGYBIN"
+BIN_VERSION = 1
+BIN_HEADER_SIZE = 512
+# One record for each sample, the time is in seconds since epoch
+BIN_RECORD = np.dtype([("time", "<f8"), ("channels", "<f8", (8,))])
+# Records of a recording of more than one loggy, not supported by Replay yet
+BIN_DEVICE_VERSION = 2
+BIN_DEVICE_RECORD = np.dtype([("time", "<f8"), ("channels", "<f8", (8,)),
+                              ("device", "<u4")])
+CONVERT_BLOCK = 1 << 16  # Samples converted at a time
+# Replay related constants
+REPLAY_INDEX_STEP = 4096  # Samples between entries of the time index
+REPLAY_MAX_POINTS = 20000  # Most samples read for one window
+REPLAY_LOD_BIN = 64  # Samples in each bin of the first min/max level
+REPLAY_LOD_FACTOR = 4  # Bins of a level combined into a bin of the next
+REPLAY_LOD_MIN_BINS = 1000  # The coarsest level has at most this many bins
+
+# Kinds of events passed from the worker threads to the Tk thread
+EVENT_ERROR = "error"  # payload: the message shown to the user
+EVENT_ALARM = "alarm"  # payload: {channel: latest alarm message}
+EVENT_THRESHOLD = "threshold"  # payload: {channel: latest threshold message}
+EVENT_MESSAGE = "message"  # payload: any other message from the firmware
+EVENT_DATA = "data"  # payload: None, new samples are in the Data
+EVENT_HOST_ALARM = "host alarm"  # payload: None, new events in Data.alarms
+# payload: (ReplayFile, AlarmLog) the alarms of a recording opened for replay
+EVENT_REPLAY_ALARMS = "replay alarms"
+# payload: (port, baud rate or None if the port failed) from negotiate_later
+EVENT_BAUD = "baud"
+EVENT_INTERVAL = 50  # ms between drains of the event queue
+EVENT_BATCH = 500  # Most events handled in one drain, the rest wait
+# Performance statistics
+PERF_WINDOW = 1000  # Latest times kept for each stage
+PERF_RATE_WINDOW = 5.0  # Seconds that rates are averaged over
+PERF_BINS_MS = (0.01, 0.1, 1.0, 10.0, 100.0, 1000.0)  # Histogram bin edges
+PERF_TOP_LINES = 25  # Lines of profile and memory trace written
+
+
+class PerfStats:
+    """
+    Lightweight timing of each stage of the pipeline, so a slow GUI can be
+    traced to the serial reads, the parsing, the conversions or the
+    drawing. The latest PERF_WINDOW times of each stage are kept, along with
+    counters for rates (samples/s) and gauges (queue depths) that are read
+    when a snapshot is taken. Stages are timed from any thread:
+
+        start = time.perf_counter()
+        ...
+        perf.add_time("parse", start)
+
+    It also starts and stops cProfile and tracemalloc sessions.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self._times = {}  # {stage: deque of seconds}
+        self._counts = {}  # {name: deque of (time, amount)}
+        self._gauges = {}  # {name: function returning the value}
+        self._since = time.monotonic()  # Rates are averaged from here
+        self._lock = th.Lock()
+        self._profile = None
+
+    def add_time(self, stage: str, start: float) -> None:
+        """Records the time since start (time.perf_counter) for stage.
+        Returns nothing"""
+        self.add_seconds(stage, time.perf_counter() - start)
+
+    def add_seconds(self, stage: str, seconds: float) -> None:
+        """Records a time that was measured elsewhere for stage.
+        Returns nothing"""
+        if not self.enabled:
+            return
+        try:
+            self._times[stage].append(seconds)
+        except KeyError:
+            with self._lock:
+                self._times.setdefault(stage, deque(maxlen=PERF_WINDOW))
+            self._times[stage].append(seconds)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Adds to a counter, shown as a rate per second.
+        Returns nothing"""
+        if not self.enabled:
+            return
+        try:
+            self._counts[name].append((time.monotonic(), amount))
+        except KeyError:
+            with self._lock:
+                self._counts.setdefault(name, deque(maxlen=PERF_WINDOW))
+            self._counts[name].append((time.monotonic(), amount))
+
+    def gauge(self, name: str, function) -> None:
+        """Shows function() in the snapshots, e.g. a queue depth.
+        Returns nothing"""
+        self._gauges[name] = function
+
+    def reset(self) -> None:
+        """Forgets the times and counts, the gauges are kept.
+        Returns nothing"""
+        with self._lock:
+            self._times = {}
+            self._counts = {}
+            self._since = time.monotonic()
+
+    def snapshot(self) -> dict:
+        """Returns {"stages": {stage: {"count", "mean_ms", "p50_ms",
+        "p95_ms", "max_ms", "histogram"}}, "rates": {name: per second},
+        "gauges": {name: value}}. histogram is the number of times in each
+        bin of PERF_BINS_MS, including below the first and above the last
+        edge"""
+        stages = {}
+        edges = [0.0, *PERF_BINS_MS, np.inf]
+        for stage, times in list(self._times.items()):
+            times_ms = np.array(times) * 1000
+            if not len(times_ms):
+                continue
+            p50, p95 = np.percentile(times_ms, (50, 95))
+            stages[stage] = {
+                "count": len(times_ms), "mean_ms": float(times_ms.mean()),
+                "p50_ms": float(p50), "p95_ms": float(p95),
+                "max_ms": float(times_ms.max()),
+                "histogram": np.histogram(times_ms, edges)[0].tolist()}
+        rates = {}
+        now = time.monotonic()
+        for name, counts in list(self._counts.items()):
+            counts = list(counts)
+            first = now - min(PERF_RATE_WINDOW, now - self._since)
+            if len(counts) == PERF_WINDOW:  # Older counts were dropped
+                first = max(first, counts[0][0])
+            total = sum(amount for when, amount in counts if when >= first)
+            rates[name] = total / (now - first) if now > first else 0.0
+        gauges = {}
+        for name, function in list(self._gauges.items()):
+            try:
+                gauges[name] = function()
+            except Exception:  # The object measured may be gone
+                gauges[name] = None
+        return {"stages": stages, "rates": rates, "gauges": gauges}
+
+    def format(self, snapshot: dict | None = None) -> str:
+        """Returns the snapshot (a new one if None) as a text table"""
+        if snapshot is None:
+            snapshot = self.snapshot()
+        bins = " ".join(f"<{edge:g}" for edge in PERF_BINS_MS)
+        lines = [f"{'Stage':10}{'count':>7}{'mean':>9}{'p50':>9}{'p95':>9}"
+                 f"{'max':>9}  ms, histogram {bins} >="]
+        for stage, times in sorted(snapshot["stages"].items()):
+            lines.append(
+                f"{stage:10}{times['count']:7d}{times['mean_ms']:9.3f}"
+                f"{times['p50_ms']:9.3f}{times['p95_ms']:9.3f}"
+                f"{times['max_ms']:9.3f}  "
+                + " ".join(str(count) for count in times["histogram"]))
+        for name, rate in sorted(snapshot["rates"].items()):
+            lines.append(f"{name}/s: {rate:.1f}")
+        for name, value in sorted(snapshot["gauges"].items()):
+            lines.append(f"{name}: {value}")
+        return "\n".join(lines)
+
+    def dump(self, file_path: str) -> None:
+        """Saves a snapshot to a JSON file.
+        Returns nothing"""
+        snapshot = self.snapshot()
+        snapshot["time"] = datetime.now().isoformat(timespec="seconds")
+        snapshot["histogram_edges_ms"] = list(PERF_BINS_MS)
+        with open(file_path, "w") as file:
+            json.dump(snapshot, file, indent=2)
+
+    @property
+    def profiling(self) -> bool:
+        return self._profile is not None
+
+    def start_profile(self) -> None:
+        """Starts cProfile on the calling thread.
+        Returns nothing"""
+        if self._profile is None:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def stop_profile(self, file_path: str) -> str:
+        """Stops cProfile and saves the profile (for pstats or snakeviz).
+        Returns the PERF_TOP_LINES functions with the most cumulative time"""
+        profile, self._profile = self._profile, None
+        if profile is None:
+            return ""
+        profile.disable()
+        profile.dump_stats(file_path)
+        text = io.StringIO()
+        pstats.Stats(profile, stream=text).sort_stats(
+            "cumulative").print_stats(PERF_TOP_LINES)
+        return text.getvalue()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    @staticmethod
+    def start_tracemalloc() -> None:
+        """Starts tracing memory allocations.
+        Returns nothing"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @staticmethod
+    def stop_tracemalloc(file_path: str) -> str:
+        """Stops tracing memory allocations and saves the PERF_TOP_LINES
+        lines that hold the most memory to a text file.
+        Returns the same text"""
+        if not tracemalloc.is_tracing():
+            return ""
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        lines = [f"Traced {current / 1e6:.1f} MB now, {peak / 1e6:.1f} MB "
+                 f"peak"]
+        lines += [str(stat) for stat in
+                  snapshot.statistics("lineno")[:PERF_TOP_LINES]]
+        text = "\n".join(lines) + "\n"
+        with open(file_path, "w") as file:
+            file.write(text)
+        return text
+
+
+perf = PerfStats()
+
+
+class EventQueue:
+    """
+    Passes events from the worker threads (the serial reader, the recording
+    writer) to the Tk thread, as Tk widgets can only be used from the Tk
+    thread. Events are (kind, payload) pairs, the Tk thread drains the queue
+    every EVENT_INTERVAL ms with root.after and calls the handlers of each
+    kind in the order the events were posted. Without Tk the owner calls
+    handle_pending instead.
+    Frequent events can be coalesced with post_once and post_latest, so the
+    Tk thread only handles the latest state once per drain.
+    """
+    _COALESCED = object()  # Payload of events posted with post_once/latest
+
+    def __init__(self):
+        self._queue = qu.SimpleQueue()
+        self._handlers = {}
+        self._waiting = set()  # Coalesced kinds not handled yet
+        self._latest = {}  # {kind: {key: payload}} posted with post_latest
+        self._waiting_lock = th.Lock()
+        self._root = None
+        self._after_id = None
+
+    def subscribe(self, kind: str, handler) -> None:
+        """Calls handler(payload) on the Tk thread for each event of kind.
+        Returns nothing"""
+        self._handlers.setdefault(kind, []).append(handler)
+
+    def post(self, kind: str, payload=None) -> None:
+        """Queues an event, can be called from any thread.
+        Returns nothing"""
+        self._queue.put((kind, payload))
+
+    def post_once(self, kind: str) -> None:
+        """Queues an event without a payload unless one of the same kind is
+        already waiting, so frequent events are handled once per drain.
+        Returns nothing"""
+        with self._waiting_lock:
+            if kind in self._waiting:
+                return
+            self._waiting.add(kind)
+        self._queue.put((kind, self._COALESCED))
+
+    def post_latest(self, kind: str, key, payload) -> None:
+        """Queues an event where only the latest payload of each key matters,
+        like the alarm status of a channel. The handler is called with a
+        {key: payload} dict of the keys posted since the last drain, in the
+        order they were last posted.
+        Returns nothing"""
+        with self._waiting_lock:
+            latest = self._latest.setdefault(kind, {})
+            latest.pop(key, None)  # The newest payload goes last
+            latest[key] = payload
+            if kind in self._waiting:
+                return
+            self._waiting.add(kind)
+        self._queue.put((kind, self._COALESCED))
+
+    def start(self, root) -> None:
+        """Starts draining the queue on the Tk thread of root.
+        Returns nothing"""
+        self._root = root
+        self._after_id = root.after(EVENT_INTERVAL, self.drain)
+
+    def stop(self) -> None:
+        """Stops draining the queue, events posted later are dropped.
+        Returns nothing"""
+        if self._after_id is not None:
+            self._root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def drain(self) -> None:
+        """Handles up to EVENT_BATCH events and schedules the next drain.
+        Returns nothing"""
+        self.handle_pending()
+        self._after_id = self._root.after(EVENT_INTERVAL, self.drain)
+
+    def handle_pending(self) -> int:
+        """Handles up to EVENT_BATCH events on the calling thread, without
+        Tk when acquiring headless. Events posted while handling wait for the
+        next call.
+        Returns the number of events handled"""
+        start = time.perf_counter()
+        handled = 0
+        for _ in range(min(self._queue.qsize(), EVENT_BATCH)):
+            try:
+                kind, payload = self._queue.get_nowait()
+            except qu.Empty:
+                break
+            if payload is self._COALESCED:
+                with self._waiting_lock:
+                    self._waiting.discard(kind)
+                    payload = self._latest.pop(kind, None)
+            for handler in self._handlers.get(kind, ()):
+                try:
+                    handler(payload)
+                except Exception as error:  # Keep handling the other events
+                    sys.stderr.write(f"Error handling {kind} event: "
+                                     f"{error!r}\n")
+            handled += 1
+        if handled:
+            perf.add_time("events", start)
+        return handled
+
+    @property
+    def pending(self) -> int:
+        """The number of events waiting to be handled"""
+        return self._queue.qsize()
+
+
+events = EventQueue()
+perf.gauge("event queue", lambda: events.pending)
+
+
+class RingBuffer:
+    """
+    Fixed size store for the latest samples from the loggy.
+    Each row of the buffer is a column of the data (Time, ch1, ..., ch8).
+    Every sample is written twice, once at its slot and once at its slot plus
+    the capacity, so the newest samples are always one contiguous slice.
+    """
+
+    def __init__(self, capacity: int, rows: int = 9):
+        """
+        Parameters
+        ----------
+        capacity : int
+            The maximum number of samples kept in the buffer.
+        rows : int
+            The number of values in each sample. e.g. Time + 8 channels
+        """
+        self._capacity = capacity
+        self._rows = rows
+        self._buffer = np.zeros((rows, 2 * capacity), dtype=np.float64)
+        self._cursor = 0  # Slot that the next sample is written to
+        self._count = 0  # Number of samples in the buffer
+        # Number of samples ever appended, used as a sequence number
+        self._total = 0
+        # The reader thread appends while the GUI reads new samples
+        self._lock = th.Lock()
+
+    def append(self, sample) -> None:
+        """Adds one sample to the buffer, overwriting the oldest sample if
+        the buffer is full.
+        sample: (Time, CH1, CH2, ..., CH8)
+        Returns nothing"""
+        with self._lock:
+            cursor = self._cursor
+            self._buffer[:, cursor] = sample
+            self._buffer[:, cursor + self._capacity] = sample
+            self._cursor = (cursor + 1) % self._capacity
+            if self._count < self._capacity:
+                self._count += 1
+            self._total += 1
+
+    def extend(self, samples: np.ndarray) -> None:
+        """Adds many samples to the buffer at once. Only the newest capacity
+        samples are kept.
+        samples: (rows, number of samples) array
+        Returns nothing"""
+        total = samples.shape[1]
+        samples = samples[:, -self._capacity:]
+        n = samples.shape[1]
+        if not n:
+            return
+        with self._lock:
+            cursor = self._cursor
+            first = min(n, self._capacity - cursor)  # Samples before the wrap
+            for offset in (0, self._capacity):
+                self._buffer[:, cursor + offset:cursor + offset + first] \
+                    = samples[:, :first]
+                if first < n:
+                    self._buffer[:, offset:offset + n - first] \
+                        = samples[:, first:]
+            self._cursor = (cursor + n) % self._capacity
+            self._count = min(self._count + n, self._capacity)
+            self._total += total
+
+    def since(self, sequence: int) -> tuple[np.ndarray, int]:
+        """Copies the samples appended after 'sequence'. Samples that have
+        already been overwritten are skipped.
+        sequence: the sequence number returned by the last call, or 0
+        Returns the samples as a (rows, n) array and the new sequence number
+        """
+        with self._lock:
+            n = min(self._total - sequence, self._count)
+            end = self._cursor + self._capacity
+            return self._buffer[:, end - n:end].copy(), self._total
+
+    def view(self) -> np.ndarray:
+        """Returns the samples in the buffer from oldest to newest as an array
+        with the shape (rows, number of samples). No data is copied, so the
+        view is only valid until the next append. Copy it to keep it."""
+        end = self._cursor + self._capacity
+        return self._buffer[:, end - self._count:end]
+
+    def clear(self) -> None:
+        """Removes all the samples from the buffer.
+        Returns nothing"""
+        with self._lock:
+            self._cursor = 0
+            self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def total(self) -> int:
+        """The number of samples ever appended"""
+        return self._total
+
+
+def format_csv_rows(chunk: np.ndarray, narrow: np.ndarray | None = None
+                    ) -> str:
+    """
+    Formats a chunk of recorded samples as lines of a csv file.
+    The date and time is only formatted once for every second in the chunk,
+    only the milliseconds are worked out for each sample.
+    Values are written with repr, except the float32 values of samples from
+    frames, which are written with their float32 repr (23.1, not
+    23.100000381469727). Values converted from them, e.g. temperatures, are
+    no longer float32 and keep repr.
+    chunk: (9, number of samples) array of (Time, CH1, ..., CH8), or
+    (10, number of samples) with the device id in the last row
+    narrow: optional boolean array, True for the samples from frames
+    Line format: YYYY-MM-DD_HH-MM-SS.sss,CH1,CH2,CH3,CH4,CH5,CH6,CH7,CH8
+    (then ,Device for 10 rows)
+    Returns the lines as one string
+    """
+    # Round to microseconds the same way datetime.fromtimestamp does
+    seconds = np.floor(chunk[0])
+    micros = np.round((chunk[0] - seconds) * 1e6)  # Rounds half to even
+    carry = micros >= 1000000
+    seconds[carry] += 1
+    micros[carry] -= 1000000
+    millis = (micros // 1000).astype(np.int64).tolist()
+    seconds = seconds.tolist()
+    prefixes = {}
+    for second in set(seconds):
+        prefixes[second] = datetime.fromtimestamp(
+            second).strftime(FILENAME_FORMAT)
+    if narrow is not None and narrow.any():
+        chunk = chunk.copy()
+        values = chunk[1:9, narrow]
+        single = values.astype(np.float32) == values
+        values[single] = float32_to_decimal(values[single])
+        chunk[1:9, narrow] = values
+    row_format = CSV_ROW_FORMAT if len(chunk) == 9 else CSV_DEVICE_ROW_FORMAT
+    return "".join([row_format % (prefixes[second], milli, *row)
+                    for second, milli, row
+                    in zip(seconds, millis, chunk[1:].T.tolist())])
+
+
+def parse_csv_times(stamps: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Converts the time column of a recording into numbers without strptime.
+    stamps: array of "YYYY-MM-DD_HH-MM-SS.sss" byte strings (dtype "S23")
+    Returns (seconds since epoch as int64, milliseconds as int64).
+    Raises ValueError if a time does not follow the format.
+    """
+    chars = stamps.view(np.uint8).reshape(-1, CSV_TIME_WIDTH)
+    separators = chars[:, CSV_TIME_SEPARATORS[0]]
+    if not np.array_equal(separators, np.broadcast_to(
+            CSV_TIME_SEPARATORS[1], separators.shape)):
+        raise ValueError("Time column does not follow the file format")
+    digits = chars[:, CSV_TIME_DIGITS].astype(np.int64) - ord("0")
+    if digits.size and (digits.min() < 0 or digits.max() > 9):
+        raise ValueError("Time column does not follow the file format")
+
+    def number(first: int, last: int) -> np.ndarray:
+        # Combines the digits at positions first to last into a number
+        value = np.zeros(len(digits), dtype=np.int64)
+        for idx in range(first, last):
+            value = value * 10 + digits[:, idx]
+        return value
+
+    years = number(0, 4)
+    months = number(4, 6)
+    days = number(6, 8)
+    dates = ((years - 1970).astype("datetime64[Y]").astype("datetime64[M]")
+             + (months - 1)).astype("datetime64[D]") + (days - 1)
+    wall = (dates.astype(np.int64) * 86400 + number(8, 10) * 3600
+            + number(10, 12) * 60 + number(12, 14))
+    # The times are in local time. The offset to UTC is found once for every
+    # hour so daylight saving changes are handled like datetime.timestamp.
+    hours = wall // 3600
+    unique_hours, hour_idx = np.unique(hours, return_inverse=True)
+    offsets = np.array([
+        int((datetime(1970, 1, 1) + timedelta(hours=int(hour))).timestamp())
+        - int(hour) * 3600 for hour in unique_hours], dtype=np.int64)
+    return wall + offsets[hour_idx], number(14, 17)
+
+
+def read_csv_blocks(file, progress=None):
+    """
+    Reads the samples of an opened recording (binary mode, after the header
+    line) one block at a time.
+    file: the csv file opened with "rb"
+    progress: optional function called with the fraction of the file read
+    Yields (seconds since epoch, milliseconds, values) for each block where
+    values has the shape (number of samples, 8).
+    Raises ValueError if the file does not follow the format.
+    """
+    file_size = max(os.fstat(file.fileno()).st_size, 1)
+    while True:
+        lines = file.readlines(CSV_READ_BLOCK)
+        if not lines:
+            return
+        stamps = np.array([line[:CSV_TIME_WIDTH] for line in lines],
+                          dtype=f"S{CSV_TIME_WIDTH}")
+        seconds, millis = parse_csv_times(stamps)
+        values = np.loadtxt(lines, delimiter=",", usecols=CHANNELS_LIST,
+                            ndmin=2, dtype=np.float64)
+        if progress is not None:
+            progress(file.tell() / file_size)
+        yield seconds, millis, values
+
+
+def read_csv_headers(file) -> list:
+    """Reads the header line of an opened recording (binary mode).
+    Returns the 9 headers.
+    Raises ValueError if the file does not have 9 columns."""
+    headers = file.readline().decode().strip().split(",")
+    if len(headers) != 9:
+        raise ValueError("File does not have 9 columns")
+    return headers
+
+
+def read_csv_columns(file_path: str, progress=None) -> tuple[list, np.ndarray]:
+    """
+    Reads a recording made by Data.save_data in blocks straight into numpy
+    arrays.
+    file_path: the csv file to read
+    progress: optional function called with the fraction of the file read
+    Returns (headers, columns) where columns has the shape
+    (9, number of samples) of (Time, CH1, ..., CH8) and the time is in
+    seconds since the first sample.
+    Raises ValueError if the file does not follow the format.
+    """
+    seconds = []
+    millis = []
+    values = []
+    with open(file_path, "rb") as file:
+        headers = read_csv_headers(file)
+        for block_seconds, block_millis, block_values in read_csv_blocks(
+                file, progress):
+            seconds.append(block_seconds)
+            millis.append(block_millis)
+            values.append(block_values)
+    if not seconds:
+        raise ValueError("File has no samples")
+    seconds = np.concatenate(seconds)
+    millis = np.concatenate(millis)
+    columns = np.empty((9, len(seconds)), dtype=np.float64)
+    columns[0] = (seconds - seconds[0]) + (millis - millis[0]) / 1000
+    columns[1:] = np.concatenate(values).T
+    return headers, columns
+
+
+def binary_file_header(headers: list, record: np.dtype = BIN_RECORD) -> bytes:
+    """
+    Makes the header of a binary recording.
+    Header format (little-endian, BIN_HEADER_SIZE bytes):
+    magic (8 bytes), version (uint32), record size (uint32),
+    the headers as a comma separated utf-8 string padded with zeros.
+    The rtemp mode of each channel is stored in its header.
+    record: BIN_RECORD, or BIN_DEVICE_RECORD for more than one loggy
+    """
+    text = ",".join(headers).rstrip("\n").encode()
+    version = BIN_VERSION if record == BIN_RECORD else BIN_DEVICE_VERSION
+    fixed = BIN_MAGIC + np.array([version, record.itemsize],
+                                 dtype="<u4").tobytes()
+    if len(fixed) + len(text) > BIN_HEADER_SIZE:
+        raise ValueError("Headers are too long for the binary file")
+    return (fixed + text).ljust(BIN_HEADER_SIZE, b"\0")
+
+
+def chunk_to_records(chunk: np.ndarray) -> np.ndarray:
+    """Converts a chunk of samples (9, number of samples) of
+    (Time, CH1, ..., CH8) into an array of BIN_RECORD records, or a chunk
+    with the device id in a 10th row into BIN_DEVICE_RECORD records."""
+    if len(chunk) == 9:
+        records = np.empty(chunk.shape[1], dtype=BIN_RECORD)
+    else:
+        records = np.empty(chunk.shape[1], dtype=BIN_DEVICE_RECORD)
+        records["device"] = chunk[9]
+    records["time"] = chunk[0]
+    records["channels"] = chunk[1:9].T
+    return records
+
+
+def open_binary_recording(file_path: str) -> tuple[list, np.ndarray]:
+    """
+    Opens a binary recording with np.memmap. Nothing is read until the
+    records are used, so this works for files of any size and for files that
+    are still being recorded (a partly written last record is ignored).
+    Returns (headers, records) where records is a read only array of
+    BIN_RECORD with the time in seconds since epoch.
+    Raises ValueError if the file is not a binary recording.
+    """
+    with open(file_path, "rb") as file:
+        header = file.read(BIN_HEADER_SIZE)
+    if len(header) < BIN_HEADER_SIZE or not header.startswith(BIN_MAGIC):
+        raise ValueError("File is not a binary recording")
+    version, record_size = np.frombuffer(header, dtype="<u4", count=2,
+                                         offset=len(BIN_MAGIC))
+    if version != BIN_VERSION or record_size != BIN_RECORD.itemsize:
+        raise ValueError("Binary recording version is not supported")
+    text = header[len(BIN_MAGIC) + 8:].rstrip(b"\0").decode()
+    headers = text.split(",")
+    if len(headers) != 9:
+        raise ValueError("File does not have 9 columns")
+    headers[-1] += "\n"  # Same as Data.headers
+    num_records = ((os.path.getsize(file_path) - BIN_HEADER_SIZE)
+                   // BIN_RECORD.itemsize)
+    if num_records < 1:
+        raise ValueError("File has no samples")
+    records = np.memmap(file_path, dtype=BIN_RECORD, mode="r",
+                        offset=BIN_HEADER_SIZE, shape=(num_records,))
+    return headers, records
+
+
+def csv_to_binary(csv_path: str, binary_path: str | None = None,
+                  progress=None) -> str:
+    """
+    Converts a csv recording to a binary recording, one block at a time.
+    The binary file is saved next to the csv file if binary_path is None.
+    progress: optional function called with the fraction of the file read
+    Returns the path of the binary file.
+    """
+    if binary_path is None:
+        binary_path = os.path.splitext(csv_path)[0] + BIN_EXTENSION
+    with open(csv_path, "rb") as csv_file, \
+            open(binary_path, "wb") as binary_file:
+        binary_file.write(binary_file_header(read_csv_headers(csv_file)))
+        for seconds, millis, values in read_csv_blocks(csv_file, progress):
+            records = np.empty(len(seconds), dtype=BIN_RECORD)
+            records["time"] = seconds + millis / 1000
+            records["channels"] = values
+            binary_file.write(records.tobytes())
+    return binary_path
+
+
+def binary_to_csv(binary_path: str, csv_path: str | None = None) -> str:
+    """
+    Converts a binary recording to a csv recording in the Data.save_data
+    format, one block at a time.
+    The csv file is saved next to the binary file if csv_path is None.
+    Returns the path of the csv file.
+    """
+    if csv_path is None:
+        csv_path = os.path.splitext(binary_path)[0] + ".csv"
+    headers, records = open_binary_recording(binary_path)
+    with open(csv_path, "w") as csv_file:
+        csv_file.write(",".join(headers))
+        for start in range(0, len(records), CONVERT_BLOCK):
+            block = records[start:start + CONVERT_BLOCK]
+            chunk = np.empty((9, len(block)), dtype=np.float64)
+            chunk[0] = block["time"]
+            chunk[1:] = block["channels"].T
+            csv_file.write(format_csv_rows(chunk))
+    return csv_path
+
+
+class ReplayFile:
+    """
+    A recording opened for replay. The samples are memory mapped and only the
+    samples in the time window being looked at are read. A sparse index of
+    every REPLAY_INDEX_STEP-th time is used to find a time in the file.
+    Csv recordings are converted to a temporary binary recording first.
+    When a window has too many samples to plot, a level of a min/max pyramid
+    made when the file is opened is used instead, so peaks are still shown.
+    """
+
+    def __init__(self, file_path: str, progress=None):
+        """
+        Parameters
+        ----------
+        file_path : str
+            The csv or binary recording to open.
+        progress :
+            Optional function called with the fraction of a csv file
+            converted, then with the fraction of the pyramid made.
+        Raises ValueError if the file is not a recording and OSError if it
+        can't be read.
+        """
+        self._temp_path = None
+        if not file_path.lower().endswith(BIN_EXTENSION):
+            handle, self._temp_path = tempfile.mkstemp(suffix=BIN_EXTENSION)
+            os.close(handle)
+            try:
+                csv_to_binary(file_path, self._temp_path, progress)
+            except (OSError, ValueError, UnicodeDecodeError):
+                self.close()
+                raise
+            file_path = self._temp_path
+        self.headers, self._records = open_binary_recording(file_path)
+        self._times = self._records["time"]
+        # Copy of every REPLAY_INDEX_STEP-th time. Small enough to keep.
+        self._index = np.array(self._times[::REPLAY_INDEX_STEP])
+        self._start = float(self._times[0])
+        self._duration = float(self._times[-1]) - self._start
+        # Levels of (bin size, bin start times, bin minimums, bin maximums)
+        self._levels = []
+        self.make_pyramid(progress)
+
+    def make_pyramid(self, progress=None) -> None:
+        """
+        Makes the min/max pyramid of the recording. The first level has the
+        minimum and maximum of every channel for each REPLAY_LOD_BIN samples,
+        each level after that combines REPLAY_LOD_FACTOR bins of the level
+        before it, until there are at most REPLAY_LOD_MIN_BINS bins.
+        The file is read in blocks so memory use stays bounded.
+        Returns nothing
+        """
+        num_records = len(self._records)
+        block_size = REPLAY_LOD_BIN * (CONVERT_BLOCK // REPLAY_LOD_BIN)
+        mins = []
+        maxs = []
+        for first in range(0, num_records, block_size):
+            channels = self._records["channels"][first:first + block_size]
+            starts = np.arange(0, len(channels), REPLAY_LOD_BIN)
+            mins.append(np.minimum.reduceat(channels, starts, axis=0))
+            maxs.append(np.maximum.reduceat(channels, starts, axis=0))
+            if progress is not None:
+                progress(min(first + block_size, num_records) / num_records)
+        bin_size = REPLAY_LOD_BIN
+        times = np.array(self._times[::REPLAY_LOD_BIN])
+        mins = np.concatenate(mins)
+        maxs = np.concatenate(maxs)
+        self._levels = [(bin_size, times, mins, maxs)]
+        while len(times) > REPLAY_LOD_MIN_BINS:
+            starts = np.arange(0, len(times), REPLAY_LOD_FACTOR)
+            bin_size *= REPLAY_LOD_FACTOR
+            times = times[starts]
+            mins = np.minimum.reduceat(mins, starts, axis=0)
+            maxs = np.maximum.reduceat(maxs, starts, axis=0)
+            self._levels.append((bin_size, times, mins, maxs))
+
+    def find(self, seconds: float) -> int:
+        """Finds the first sample at or after a time.
+        seconds: time since the first sample
+        Returns the index of the sample"""
+        target = self._start + seconds
+        block = max(int(np.searchsorted(self._index, target)) - 1, 0)
+        low = block * REPLAY_INDEX_STEP
+        high = min(low + 2 * REPLAY_INDEX_STEP, len(self._times))
+        return low + int(np.searchsorted(self._times[low:high], target))
+
+    def window(self, start: float, end: float,
+               max_points: int = REPLAY_MAX_POINTS) -> list:
+        """
+        Reads the samples between two times. If there are more than
+        max_points samples, the samples are put into bins and each bin is
+        given as two points at the bin start time, its minimum then its
+        maximum. Small bins are worked out from the samples, bigger bins come
+        from the finest pyramid level that fits.
+        start, end: time since the first sample
+        max_points: the most points to return, e.g. 2 per pixel of the plot
+        Returns [Time, CH1, ..., CH8] as arrays, with the time in seconds
+        since the first sample.
+        """
+        first = self.find(start)
+        last = self.find(end)
+        if last - first <= max_points:
+            records = np.array(self._records[first:last])
+            columns = [records["time"] - self._start]
+            columns += [records["channels"][:, idx] for idx in range(8)]
+            return columns
+        bin_size = -(-2 * (last - first) // max_points)
+        if bin_size < REPLAY_LOD_BIN:
+            # Fewer than REPLAY_LOD_BIN * max_points / 2 samples to read
+            records = np.array(self._records[first:last])
+            starts = np.arange(0, len(records), bin_size)
+            return self._bins_to_columns(
+                records["time"][starts],
+                np.minimum.reduceat(records["channels"], starts, axis=0),
+                np.maximum.reduceat(records["channels"], starts, axis=0))
+        # Finest level with at most max_points points, else the coarsest
+        for bin_size, times, mins, maxs in self._levels:
+            if 2 * (last - first) <= max_points * bin_size:
+                break
+        first_bin = first // bin_size
+        last_bin = -(-last // bin_size)
+        return self._bins_to_columns(times[first_bin:last_bin],
+                                     mins[first_bin:last_bin],
+                                     maxs[first_bin:last_bin])
+
+    def block(self, first: int, last: int) -> tuple:
+        """Reads the samples from index first up to last.
+        Returns (times, values), the times as seconds since epoch and the
+        values as an (8, number of samples) array.
+        Raises ValueError if the file has been closed, e.g. by the Tk thread
+        while a worker reads it"""
+        records = self._records
+        if records is None:
+            raise ValueError("The recording is closed")
+        records = np.array(records[first:last])
+        return records["time"], records["channels"].T
+
+    def _bins_to_columns(self, times: np.ndarray, mins: np.ndarray,
+                         maxs: np.ndarray) -> list:
+        """Turns min/max bins into [Time, CH1, ..., CH8] with two points for
+        each bin, the minimum then the maximum."""
+        values = np.empty((2 * len(times), 8), dtype=np.float64)
+        values[0::2] = mins
+        values[1::2] = maxs
+        columns = [np.repeat(times - self._start, 2)]
+        columns += [values[:, idx] for idx in range(8)]
+        return columns
+
+    def close(self) -> None:
+        """Unmaps the file and removes the temporary file if there is one.
+        Returns nothing"""
+        self._records = None
+        self._times = None
+        if self._temp_path:
+            try:
+                os.remove(self._temp_path)
+            except OSError:
+                pass  # Removed by the system later
+            self._temp_path = None
+
+    @property
+    def duration(self) -> float:
+        return self._duration
+
+    @property
+    def start(self) -> float:
+        """The time of the first sample (seconds since epoch)"""
+        return self._start
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+
+class Recorder:
+    """
+    Records every sample received from the loggy while recording is on.
+    Samples are written into fixed size chunks (Time, ch1, ..., ch8) and full
+    chunks are passed to a writer thread through a bounded queue, so
+    recording does not depend on the live plots.
+    The writer thread streams the chunks to a csv file, or a binary file
+    of BIN_RECORD records, while recording.
+    When more than one loggy is recorded each sample also has the id of the
+    loggy it came from, in a Device column at the end.
+    """
+
+    def __init__(self, chunk_size: int = RECORD_CHUNK_SIZE,
+                 max_chunks: int = RECORD_QUEUE_CHUNKS):
+        """
+        Parameters
+        ----------
+        chunk_size : int
+            The number of samples in each chunk.
+        max_chunks : int
+            The number of full chunks that can wait for the writer thread.
+        """
+        self._chunk_size = chunk_size
+        self._queue = qu.Queue(maxsize=max_chunks)
+        self._lock = th.Lock()  # add and stop are called by different threads
+        self._chunk = None
+        self._narrow = None  # Which samples of the chunk are from frames
+        self._filled = 0  # Number of samples in the current chunk
+        self._headers = []
+        self._directory = ""
+        self._binary = False  # Save a binary file instead of a csv file
+        self._device_column = False  # Save the device id of each sample
+        self._file_path = None
+        self._named_path = None  # The file_path passed to start
+        self._writer = None
+        self._recording = False
+        self._num_rows = 0  # Number of samples recorded
+        self._dropped = 0  # Samples not recorded, the writer was too slow
+        self._bytes_written = 0  # Written to the file by the writer thread
+
+    def start(self, headers: list, directory: str, binary: bool = False,
+              device_column: bool = False,
+              file_path: str | None = None) -> None:
+        """Starts recording and the writer thread.
+        headers: The headers written at the start of the file
+        directory: The folder the file is saved in
+        binary: True to save a binary recording instead of a csv file
+        device_column: True to save the device id of each sample, the
+        headers must end with the Device header
+        file_path: The file to save to, instead of one in directory named
+        after the time of the first sample
+        Returns nothing"""
+        with self._lock:
+            if self._recording:
+                return
+            self._headers = list(headers)
+            self._directory = directory
+            self._binary = binary
+            self._device_column = device_column
+            self._file_path = None
+            self._named_path = file_path
+            self._chunk = self._new_chunk()
+            self._narrow = np.zeros(self._chunk_size, dtype=bool)
+            self._filled = 0
+            self._num_rows = 0
+            self._dropped = 0
+            self._bytes_written = 0
+            self._writer = th.Thread(target=self._write_chunks, daemon=True)
+            self._writer.start()
+            self._recording = True
+
+    def _new_chunk(self) -> np.ndarray:
+        rows = 10 if self._device_column else 9
+        return np.empty((rows, self._chunk_size), dtype=np.float64)
+
+    def add(self, time_stamp: float, sample: list, device: int = 1) -> None:
+        """Records one sample if recording is on.
+        time_stamp: the time the sample was received (seconds since epoch)
+        sample: (Time, CH1, CH2, ..., CH8), the time in sample is ignored
+        device: the id of the loggy the sample came from
+        Returns nothing"""
+        with self._lock:
+            if not self._recording:
+                return
+            chunk = self._chunk
+            chunk[0, self._filled] = time_stamp
+            chunk[1:9, self._filled] = sample[1:9]
+            if self._device_column:
+                chunk[9, self._filled] = device
+            self._narrow[self._filled] = False
+            self._filled += 1
+            self._num_rows += 1
+            if self._filled == self._chunk_size:
+                self._queue_chunk()
+
+    def add_block(self, time_stamps: np.ndarray, samples: np.ndarray,
+                  device: int = 1, narrow: bool = False) -> None:
+        """Records a block of samples if recording is on.
+        time_stamps: the times the samples were received (seconds since epoch)
+        samples: (9, number of samples) array, the first row is ignored
+        device: the id of the loggy the samples came from
+        narrow: True if the samples are float32 values from frames, they
+        are written to csv files with their float32 repr
+        Returns nothing"""
+        with self._lock:
+            if not self._recording:
+                return
+            done = 0
+            while done < len(time_stamps):
+                take = min(len(time_stamps) - done,
+                           self._chunk_size - self._filled)
+                chunk = self._chunk
+                chunk[0, self._filled:self._filled + take] \
+                    = time_stamps[done:done + take]
+                chunk[1:9, self._filled:self._filled + take] \
+                    = samples[1:9, done:done + take]
+                if self._device_column:
+                    chunk[9, self._filled:self._filled + take] = device
+                self._narrow[self._filled:self._filled + take] = narrow
+                done += take
+                self._filled += take
+                self._num_rows += take
+                if self._filled == self._chunk_size:
+                    self._queue_chunk()
+
+    def _queue_chunk(self) -> None:
+        """Passes the full chunk to the writer thread, called with the lock
+        held. Never waits for the writer: if it has fallen RECORD_QUEUE_CHUNKS
+        behind (or can't write) the chunk is thrown away and counted, so the
+        reader thread is never held up.
+        Returns nothing"""
+        try:
+            self._queue.put_nowait((self._chunk, self._narrow))
+        except qu.Full:
+            if not self._dropped:
+                events.post(EVENT_ERROR, "Recording can't keep up, some "
+                                         "samples were not saved.")
+            self._dropped += self._filled
+            self._num_rows -= self._filled
+            self._filled = 0  # The chunk is used again
+            return
+        self._chunk = self._new_chunk()
+        self._narrow = np.zeros(self._chunk_size, dtype=bool)
+        self._filled = 0
+
+    def stop(self) -> str | None:
+        """Stops recording and waits for the writer thread to finish the
+        file.
+        Returns the path of the saved file, or None if nothing was recorded"""
+        with self._lock:
+            if not self._recording:
+                return None
+            self._recording = False
+            last = None
+            if self._filled:
+                last = (self._chunk[:, :self._filled],
+                        self._narrow[:self._filled])
+            self._chunk = None
+            self._narrow = None
+        # Outside the lock, the writer empties the queue until it gets None
+        if last is not None:
+            self._queue.put(last)
+        self._queue.put(None)  # Tells the writer to finish
+        self._writer.join()
+        self._writer = None
+        return self._file_path
+
+    def _open_file(self, start_stamp: float):
+        """Creates the file and writes the headers at the start of it.
+        The file is named after the time of the first sample.
+        file name format: YYYY-MM-DD_HH-MM-SS.csv or YYYY-MM-DD_HH-MM-SS.lgy
+        Returns the opened file"""
+        start_time = datetime.fromtimestamp(start_stamp)
+        # create the filename string
+        filename = start_time.strftime(FILENAME_FORMAT)
+        if self._binary:
+            self._file_path = self._named_path or os.path.join(
+                self._directory, filename + BIN_EXTENSION)
+            file = open(self._file_path, "wb")
+            record = BIN_DEVICE_RECORD if self._device_column else BIN_RECORD
+            header = binary_file_header(self._headers, record)
+        else:
+            self._file_path = self._named_path or os.path.join(
+                self._directory, filename + ".csv")
+            file = open(self._file_path, "w")
+            header = ",".join(self._headers)
+        file.write(header)
+        self._bytes_written = len(header)
+        return file
+
+    def _write_chunks(self) -> None:
+        """Writer thread function. Formats the chunks from the queue and
+        writes them to the file in large blocks. The block is written when it
+        is bigger than RECORD_FLUSH_SIZE, when RECORD_FLUSH_INTERVAL has
+        passed, or when recording stops."""
+        file = None
+        empty = b"" if self._binary else ""
+        pending = []  # Formatted samples that have not been written
+        pending_size = 0
+        last_flush = time.monotonic()
+        finished = False
+        while not finished:
+            try:
+                item = self._queue.get(timeout=RECORD_FLUSH_INTERVAL)
+            except qu.Empty:
+                item = (np.empty((9, 0)), None)  # Nothing new, check timer
+            if item is None:
+                finished = True
+            elif item[0].shape[1]:
+                chunk, narrow = item
+                if file is None:
+                    try:
+                        file = self._open_file(chunk[0, 0])
+                    except (OSError, ValueError) as error:
+                        events.post(EVENT_ERROR,
+                                    f"Could not save recording: {error}")
+                        self._drain_queue()
+                        return
+                start = time.perf_counter()
+                if self._binary:
+                    text = chunk_to_records(chunk).tobytes()
+                else:
+                    text = format_csv_rows(chunk, narrow)
+                perf.add_time("format", start)
+                pending.append(text)
+                pending_size += len(text)
+            now = time.monotonic()
+            if pending and (finished or pending_size >= RECORD_FLUSH_SIZE
+                            or now - last_flush >= RECORD_FLUSH_INTERVAL):
+                start = time.perf_counter()
+                try:
+                    file.write(empty.join(pending))
+                    file.flush()
+                except (OSError, ValueError) as error:  # e.g. disk full
+                    events.post(EVENT_ERROR,
+                                f"Could not save recording: {error}")
+                    try:
+                        file.close()
+                    except OSError:
+                        pass  # The file is lost already
+                    if not finished:
+                        self._drain_queue()
+                    return
+                perf.add_time("write", start)
+                self._bytes_written += pending_size
+                pending = []
+                pending_size = 0
+                last_flush = now
+        if file is not None:
+            file.close()  # close file resources.
+
+    def _drain_queue(self) -> None:
+        """Throws away chunks until recording stops. Used when the file can
+        not be written so that stop does not wait on a full queue."""
+        while self._queue.get() is not None:
+            pass
+
+    @property
+    def num_rows(self) -> int:
+        return self._num_rows
+
+    @property
+    def dropped(self) -> int:
+        """The number of samples not recorded because the writer thread fell
+        behind or could not write"""
+        return self._dropped
+
+    @property
+    def queue_depth(self) -> int:
+        """The number of full chunks waiting for the writer thread"""
+        return self._queue.qsize()
+
+    @property
+    def bytes_written(self) -> int:
+        """The size of the file so far, it grows every
+        RECORD_FLUSH_INTERVAL seconds"""
+        return self._bytes_written
+
+    @property
+    def recording(self) -> bool:
+        return self._recording
+
+
+def parse_data_lines(lines: list) -> np.ndarray:
+    """
+    Parses many data lines from the loggy at once.
+    Lines that do not have 8 values are skipped.
+    lines: ["D:CH1,CH2,CH3,CH4,CH5,CH6,CH7,CH8", ...]
+    Returns the values as a (8, number of lines) array
+    """
+    payloads = [line[2:] for line in lines if line.count(',') == 7]
+    if not payloads:
+        return np.empty((8, 0), dtype=np.float64)
+    try:
+        if len(payloads) >= PARSE_BLOCK_LINES:
+            values = np.loadtxt(payloads, delimiter=',', dtype=np.float64,
+                                ndmin=2)
+        else:
+            values = np.array(','.join(payloads).split(','),
+                              dtype=np.float64).reshape(-1, 8)
+    except ValueError:
+        # A damaged line, parse the lines one at a time to skip it
+        rows = []
+        for payload in payloads:
+            try:
+                rows.append([float(value) for value in payload.split(',')])
+            except ValueError:
+                continue
+        values = np.array(rows, dtype=np.float64).reshape(-1, 8)
+    return values.T
+
+
+def float32_to_decimal(values: np.ndarray) -> np.ndarray:
+    """
+    Converts float32 values (from frames) to the float64 values of their
+    shortest decimal repr, so 23.1 in a frame is recorded as 23.1 and not
+    23.100000381469727, the same as float(str(np.float32(value))).
+    The number of significant digits (1 to 9) of each value is found with a
+    binary search on the whole array, as more digits always give back the
+    float32 value once enough do. Values too big or small for the exact
+    powers of ten are converted one at a time.
+    values: array of float32
+    Returns an array of float64 of the same shape
+    """
+    values = np.asarray(values, dtype=np.float32)
+    wide = values.astype(np.float64)
+    magnitude = np.abs(wide)
+    usable = (magnitude > DECIMAL_MIN) & (magnitude < DECIMAL_MAX)
+    # Index in DECIMAL_UP and DECIMAL_DOWN of the scale for 1 digit
+    shift = DECIMAL_OFFSET - np.floor(np.log10(
+        np.where(usable, magnitude, 1.0))).astype(np.intp)
+    low = np.zeros(wide.shape, dtype=np.intp)  # Digits - 1
+    high = np.full(wide.shape, 8, dtype=np.intp)
+    for _ in range(4):
+        middle = (low + high) >> 1
+        up = DECIMAL_UP[middle + shift]
+        down = DECIMAL_DOWN[middle + shift]
+        fits = (np.rint(wide * up / down) * down / up).astype(
+            np.float32) == values
+        np.copyto(high, middle, where=fits)
+        middle += 1
+        np.copyto(low, middle, where=~fits)
+    up = DECIMAL_UP[high + shift]
+    down = DECIMAL_DOWN[high + shift]
+    result = np.rint(wide * up / down) * down / up
+    np.copyto(result, wide, where=~usable)
+    others = ~usable & np.isfinite(wide) & (wide != 0)
+    if others.any():
+        result[others] = [float(str(value)) for value in values[others]]
+    return result
+
+
+def thermistor_temperature(resistance: np.ndarray,
+                           coefficients: tuple) -> np.ndarray:
+    """
+    Converts thermistor resistances to temperatures with the Steinhart-Hart
+    equation 1/T = A + B ln(R/Rref) + C ln(R/Rref)^2 + D ln(R/Rref)^3.
+    resistance: resistances in ohms
+    coefficients: (Rref, A, B, C, D)
+    Returns the temperatures in C
+    """
+    r_ref, a, b, c, d = coefficients
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ln = np.log(resistance / r_ref)
+        return 1 / (a + ln * (b + ln * (c + ln * d))) - 273.15
+
+
+def rtd_temperature(resistance: np.ndarray, coefficients: tuple) -> np.ndarray:
+    """
+    Converts RTD resistances to temperatures by solving the Callendar-Van
+    Dusen equation R = R0 (1 + A T + B T^2) for T.
+    resistance: resistances in ohms
+    coefficients: (R0, A, B)
+    Returns the temperatures in C
+    """
+    r0, a, b = coefficients
+    # abs stops a negative square root for impossible resistances
+    root = np.sqrt(np.abs(a * a - 4 * b * (1 - resistance / r0)))
+    return (root - a) / (2 * b)
+
+
+# Sensors that a voltage channel can be switched to
+# name: (conversion function, coefficients)
+SENSOR_MODELS = {
+    "Thermistor": (thermistor_temperature,
+                   (1000.0, A_THERM, B_THERM, C_THERM, D_THERM)),
+    "PT1000": (rtd_temperature, (R0_PT1000, A_PT1000, B_PT1000)),
+}
+
+
+def add_thermistor_model(name: str, r_ref: float, a: float, b: float,
+                         c: float, d: float) -> None:
+    """Adds a thermistor with its own Steinhart-Hart coefficients to the
+    sensors that can be picked in the settings.
+    Returns nothing"""
+    SENSOR_MODELS[name] = (thermistor_temperature, (r_ref, a, b, c, d))
+
+
+def add_rtd_model(name: str, r0: float, a: float, b: float) -> None:
+    """Adds an RTD with its own Callendar-Van Dusen coefficients to the
+    sensors that can be picked in the settings. e.g. a PT100 is
+    add_rtd_model("PT100", 100.0, 3.9083e-3, -5.775e-7)
+    Returns nothing"""
+    SENSOR_MODELS[name] = (rtd_temperature, (r0, a, b))
+
+
+class RtempTable:
+    """
+    The resistive temperature conversion of each voltage channel. Channels
+    are added when they are switched to temperature mode, then whole blocks
+    of samples are converted at once.
+    """
+
+    def __init__(self):
+        # channel: (current, conversion function, coefficients)
+        # The reader thread converts samples while the GUI changes the
+        # channels, so the dictionary is replaced instead of changed.
+        self._channels = {}
+
+    def set_channel(self, channel: int, current: str, sensor: str) -> None:
+        """Switches a channel to temperature mode.
+        current: a key of RTEMP_CURRENTS e.g. "200uA"
+        sensor: a key of SENSOR_MODELS e.g. "PT1000"
+        Returns nothing"""
+        convert, coefficients = SENSOR_MODELS[sensor]
+        channels = dict(self._channels)
+        channels[channel] = (RTEMP_CURRENTS[current], convert, coefficients)
+        self._channels = channels
+
+    def clear_channel(self, channel: int) -> None:
+        """Switches a channel back to voltage mode.
+        Returns nothing"""
+        channels = dict(self._channels)
+        channels.pop(channel, None)
+        self._channels = channels
+
+    def convert(self, samples: np.ndarray) -> None:
+        """Replaces the voltages of the temperature channels with
+        temperatures, in place.
+        samples: (9, number of samples) array of (Time, CH1, ..., CH8)
+        Returns nothing"""
+        for channel, (current, convert, coefficients) in \
+                self._channels.items():
+            resistance = np.abs(samples[channel]) / current
+            samples[channel] = convert(resistance, coefficients)
+
+    def __bool__(self) -> bool:
+        return bool(self._channels)
+
+
+class StreamStats:
+    """
+    Counts the samples received from the loggy. Samples are counted by the
+    reader thread and read by the GUI.
+    received: samples appended to the data
+    malformed: data lines that could not be parsed and frames that failed
+    their CRC check
+    gapped: samples the loggy sent that never arrived, worked out from the
+    frame sequence numbers (text lines have no sequence number). A frame
+    that failed its CRC check is not counted again as a gap if its sequence
+    number was the next one expected.
+    """
+
+    def __init__(self):
+        self._lock = th.Lock()
+        self.received = 0
+        self.malformed = 0
+        self.gapped = 0
+
+    def add(self, received: int = 0, malformed: int = 0,
+            gapped: int = 0) -> None:
+        """Adds to the counters.
+        Returns nothing"""
+        with self._lock:
+            self.received += received
+            self.malformed += malformed
+            self.gapped += gapped
+
+    def snapshot(self) -> tuple[int, int, int]:
+        """Returns (received, malformed, gapped)"""
+        with self._lock:
+            return self.received, self.malformed, self.gapped
+
+    def reset(self) -> None:
+        """Sets the counters back to 0.
+        Returns nothing"""
+        with self._lock:
+            self.received = self.malformed = self.gapped = 0
+
+
+class TimeBase:
+    """
+    The time the session started. The Data of every loggy in the session
+    shares one, so the samples of all of them are on the same time axis.
+    """
+
+    def __init__(self):
+        self.start = None  # Seconds since epoch
+
+
+class Data:
+    """
+    The place where all the data is stored.
+    Readings from the loggy are stored in a ring buffer.
+    (Time, ch1, ch2, ch3, ..., ch8)
+    """
+
+    def __init__(self, ready_to_plot, capacity: int = DATA_CAPACITY,
+                 time_base: TimeBase | None = None):
+        """
+        Parameters
+        ----------
+        ready_to_plot : int
+            1 for ready, 0 for not ready.
+        capacity : int
+            The number of samples kept for the live plots.
+        time_base : TimeBase
+            Shared with the Data of the other loggys in the session, a new
+            one is made if it is None.
+        """
+        # Temporary place to store data from the loggy.
+        # Has a maximum size of capacity.
+        self._data_list = RingBuffer(capacity)
+        # The place where data is saved
+        self._recorder = Recorder()
+        # Conversions of the channels in resistive temperature mode
+        self._rtemp = RtempTable()
+        # Headers are changed when a voltage channel is switched to a rtemp.
+        self.headers = ["Time",
+                        "CH1 (V)", "CH2 (V)", "CH3 (V)", "CH4 (V)",
+                        "CH5 (m/s^2)", "CH6 (m/s^2)", "CH7 (m/s^2)",
+                        "CH8 (C)\n"]
+        self._ready_to_plot = ready_to_plot
+        # The time that the loggy connected to the GUI
+        self.time_base = time_base if time_base is not None else TimeBase()
+        self._last_time = None  # The time the last samples were received
+        self._is_data_recording = False  # Flag for recording
+        # Recorded in the Device column when more than one loggy is recorded
+        self.device_id = 1
+        # The Data of each loggy recorded with this one (see join_recording)
+        self._devices = [self]
+        # Counters of the samples received, lost and damaged
+        self.stats = StreamStats()
+        self._stats_at_record = {}  # {device id: counters}
+        # Alarms checked on the PC, the log index when recording started
+        self.alarms = AlarmEngine()
+        self._alarms_at_record = 0
+        # Frame sequence number and tick of the last frame, None until the
+        # first frame is received
+        self._last_seq = None
+        self._last_tick = None
+        self._device_time = 0.0  # Seconds since the first frame's tick
+        self._tick_epoch = None  # Host time of the first frame's tick
+
+    @property
+    def _start_time(self) -> float | None:
+        return self.time_base.start
+
+    @_start_time.setter
+    def _start_time(self, start: float | None) -> None:
+        self.time_base.start = start
+
+    def set_headers(self, headers: list) -> None:
+        """Function is used to change the headers of Data.
+        Only used in the replay graph.
+        Returns nothing
+        """
+        self.headers = headers
+
+    def record(self, binary: bool = False,
+               file_path: str | None = None) -> None:
+        """Function is called when user presses record button.
+        The data class will begin to record data when this function is called.
+        binary: True to save a binary recording (.lgy) instead of a csv file
+        file_path: The file to save to, named after the time of the first
+        sample in the working directory if it is None
+        Returns nothing
+        """
+        # The headers can't change while recording, the settings are disabled
+        headers = self.headers
+        combined = len(self._devices) > 1
+        if combined:
+            headers = headers[:-1] + [headers[-1].rstrip("\n"), "Device\n"]
+        self._recorder.start(headers, os.getcwd(), binary, combined,
+                             file_path)
+        self._stats_at_record = {data.device_id: data.stats.snapshot()
+                                 for data in self._devices}
+        self._alarms_at_record = len(self.alarms.log)
+        self._is_data_recording = True
+
+    def join_recording(self, other: "Data", device_id: int) -> None:
+        """Records the samples of another loggy with this one's, in one file
+        with a Device column. Not while recording.
+        other: the Data of the other loggy
+        device_id: written in the Device column for its samples
+        Returns nothing"""
+        other.device_id = device_id
+        other._recorder = self._recorder
+        self._devices.append(other)
+
+    def leave_recording(self, other: "Data") -> None:
+        """Stops recording the samples of a loggy added with join_recording.
+        Not while recording.
+        Returns nothing"""
+        self._devices.remove(other)
+        other._recorder = Recorder()
+
+    @property
+    def recording(self) -> bool:
+        return self._is_data_recording
+
+    @property
+    def bytes_recorded(self) -> int:
+        return self._recorder.bytes_written
+
+    @property
+    def record_queue_depth(self) -> int:
+        return self._recorder.queue_depth
+
+    def toggle_rtemp_mode(self, channel: int, current: str,
+                          sensor: str) -> None:
+        """Function is used to change the mode of a Voltage channel
+        Channels 1 to 4 can be switched to temperature mode
+        if current != "OFF" and sensor != "OFF"
+        Channels 1 to 4 can be switched to voltage mode
+        if current == "OFF" and sensor == "OFF"
+        Returns nothing"""
+        if channel in VOLT_CHANNELS:  # only accept voltage channels
+            # Checks in case the main rtemp channel checkbutton was clicked
+            # off.
+            if current == "OFF" and sensor == "OFF":
+                self.headers[channel] = f"CH{channel} (V)"
+                self._rtemp.clear_channel(channel)
+                return
+            self.headers[channel] = f"CH{channel} (C) {current} {sensor}"
+            self._rtemp.set_channel(channel, current, sensor)
+
+    def save_data(self) -> None:
+        """Stops recording and finishes the file. The recorded data is
+        streamed to the file while recording, so this only waits for the
+        writer thread to write the last samples.
+        Line format: YYYY-MM-DD_HH-MM-SS.sss,CH1,CH2,CH3,CH4,CH5,CH6,CH7,CH8
+        file name format: YYYY-MM-DD_HH-MM-SS.csv
+        The file will be saved to the usb drive.
+        """
+        start = time.perf_counter()
+        file_path = self._recorder.stop()
+        perf.add_time("save", start)
+        self._is_data_recording = False  # data has stopped recording.
+        if file_path:
+            self.save_stats(file_path)
+            self.save_alarms(file_path)
+            print(f"Saved to {file_path}")
+
+    def save_stats(self, file_path: str) -> None:
+        """Saves the sample counters of the recording next to it, one line
+        for each loggy recorded.
+        file_path: the recording, the counters go in <name>_stats.csv
+        Returns nothing"""
+        combined = len(self._devices) > 1
+        stats_path = os.path.splitext(file_path)[0] + "_stats.csv"
+        with open(stats_path, "w") as file:
+            if combined:
+                file.write("Device,")
+            file.write("Received,Malformed,Gapped\n")
+            for data in self._devices:
+                start = self._stats_at_record.get(data.device_id, (0, 0, 0))
+                counts = [now - then for now, then
+                          in zip(data.stats.snapshot(), start)]
+                if combined:
+                    counts.insert(0, data.device_id)
+                file.write(",".join(str(count) for count in counts) + "\n")
+
+    def save_alarms(self, file_path: str) -> None:
+        """Saves the alarms raised and cleared while recording next to the
+        recording, if there were any.
+        file_path: the recording, the alarms go in <name>_alarms.csv
+        Returns nothing"""
+        if len(self.alarms.log) > self._alarms_at_record:
+            self.alarms.log.save_csv(
+                os.path.splitext(file_path)[0] + "_alarms.csv",
+                self._alarms_at_record)
+
+    def append_data(self, data_str: str) -> None:
+        """
+        Converts a string from the loggy into a list of floats and
+        appends it to the ring buffer.
+        If recording is enabled, the data will also be recorded.
+        This function will calculate the resistive temperature if required.
+        data_str: "D:CH1,CH2,CH3,CH4,CH5,CH6,CH7,CH8"
+        """
+        self.append_lines([data_str])
+
+    def append_lines(self, lines: list) -> None:
+        """
+        Converts many data lines from the loggy at once and appends them to
+        the ring buffer (and the recording) in one go.
+        lines: ["D:CH1,CH2,CH3,CH4,CH5,CH6,CH7,CH8", ...]
+        """
+        start = time.perf_counter()
+        values = parse_data_lines(lines)
+        perf.add_time("parse", start)
+        self.stats.add(received=values.shape[1],
+                       malformed=len(lines) - values.shape[1])
+        self.append_values(values)
+
+    def append_frames(self, frames: np.ndarray) -> None:
+        """
+        Appends the values of binary data frames from the loggy.
+        Missing sequence numbers are counted as gaps and the times of the
+        samples come from the frame ticks.
+        frames: array of FRAME_DTYPE frames that passed their CRC check
+        """
+        num_frames = len(frames)
+        if not num_frames:
+            return
+        seqs = frames["seq"].astype(np.int64)
+        ticks = frames["tick"].astype(np.int64)
+        if self._last_seq is None:
+            self._last_seq, self._last_tick = seqs[0], ticks[0]
+        steps = np.diff(seqs, prepend=self._last_seq) % FRAME_SEQ_WRAP
+        # A repeated sequence number is not a gap
+        gapped = int(np.maximum(steps - 1, 0).sum())
+        self.stats.add(received=num_frames, gapped=gapped)
+        ticks_passed = np.diff(ticks, prepend=self._last_tick) \
+            % FRAME_TICK_WRAP
+        device_times = (self._device_time
+                        + np.cumsum(ticks_passed) * TICK_SECONDS)
+        self._last_seq, self._last_tick = seqs[-1], ticks[-1]
+        self._device_time = device_times[-1]
+        now = time.time()
+        if self._tick_epoch is None and self._last_time is not None:
+            # Switching from "D:" lines, carry on after the last line's time
+            # so the time does not step back
+            self._tick_epoch = max(
+                now - device_times[-1],
+                self._last_time + 1 / LOGGY_SAMPLE_RATE - device_times[0])
+        if (self._tick_epoch is None or
+                abs(now - self._tick_epoch - device_times[-1]) > TICK_RESYNC):
+            self._tick_epoch = now - device_times[-1]
+        self.append_values(frames["values"].T,
+                           self._tick_epoch + device_times, narrow=True)
+
+    def skip_frame(self, frame: np.void) -> None:
+        """Takes note of a frame that failed its CRC check. If its sequence
+        number is the next one expected only the data was damaged, so the
+        next good frame does not count it as a gap. Otherwise the header is
+        damaged too (or it was not a frame) and it is ignored.
+        frame: a FRAME_DTYPE frame
+        Returns nothing"""
+        if (self._last_seq is not None and
+                frame["seq"] == (self._last_seq + 1) % FRAME_SEQ_WRAP):
+            self._last_seq = int(frame["seq"])
+
+    def append_values(self, values: np.ndarray,
+                      time_stamps: np.ndarray | None = None,
+                      narrow: bool = False) -> None:
+        """
+        Appends a block of values received together to the ring buffer (and
+        the recording) in one go.
+        Without time stamps, values received together are spaced out evenly
+        since the last values were received, at most 1 / LOGGY_SAMPLE_RATE
+        apart.
+        values: (8, number of samples) array of CH1, ..., CH8
+        time_stamps: the times the samples were taken (seconds since epoch)
+        narrow: True if the values are float32, from frames
+        """
+        num_samples = values.shape[1]
+        if not num_samples:
+            return  # skip the lines if they do not follow the protocol
+        now = time.time()
+        if time_stamps is None:
+            spacing = 1 / LOGGY_SAMPLE_RATE
+            if self._last_time is not None:
+                spacing = min(spacing, (now - self._last_time) / num_samples)
+            time_stamps = now - spacing * np.arange(num_samples - 1, -1, -1)
+        self._last_time = now
+        if self._start_time is None:  # Samples before the session started
+            self._start_time = float(time_stamps[0])
+        samples = np.empty((9, num_samples), dtype=np.float64)
+        samples[0] = time_stamps - self._start_time
+        samples[1:] = values
+        if self._rtemp:
+            start = time.perf_counter()
+            self._rtemp.convert(samples)
+            perf.add_time("rtemp", start)
+        if self.alarms.enabled:
+            start = time.perf_counter()
+            if len(self.alarms.evaluate(time_stamps, samples[1:])):
+                events.post_once(EVENT_HOST_ALARM)
+            perf.add_time("alarms", start)
+        start = time.perf_counter()
+        self._data_list.extend(samples)
+        self._recorder.add_block(time_stamps, samples, self.device_id,
+                                 narrow)
+        perf.add_time("store", start)
+        perf.count("samples", num_samples)
+        events.post_once(EVENT_DATA)
+
+    def clear_data(self) -> None:
+        """This function will remove all the data from the
+         _data_list. Recorded data is kept until it is saved."""
+        self._start_time = time.time()
+        self._last_time = None
+        self._data_list.clear()
+
+    def reset_stream(self) -> None:
+        """Forgets the sequence numbers, ticks and counters of the last
+        connection. Called when connecting to the loggy.
+        Returns nothing"""
+        self.stats.reset()
+        self._stats_at_record.pop(self.device_id, None)
+        self._last_seq = None
+        self._last_tick = None
+        self._device_time = 0.0
+        self._tick_epoch = None
+
+    def get_data(self) -> np.ndarray:
+        """This function returns the entire _data_list as a (9, N) array view
+        ordered from oldest to newest sample.
+        This function should be called every 200ms."""
+        return self._data_list.view()
+
+    def get_data_since(self, sequence: int) -> tuple[np.ndarray, int]:
+        """Returns a copy of the samples received after 'sequence' as a
+        (9, n) array, and the sequence number to pass next time.
+        Start with sequence 0, or self.sequence to skip the old samples."""
+        return self._data_list.since(sequence)
+
+    @property
+    def sequence(self) -> int:
+        """The number of samples received since the GUI started"""
+        return self._data_list.total
+
+    def ready_to_plot(self) -> int:
+        """This function returns 0 if not ready to plot and
+        1 if ready to plot"""
+        return self._ready_to_plot
+
+
+class WriteLines(st.LineReader):
+    """Class is used to handle a reader thread to read in lines sent from
+    firmware to the GUI."""
+
+    def __init__(self, callback, root, data_callback=None):
+        """
+        Parameters
+        ----------
+        callback :
+            A callback function used whenever the LineReader recieves a
+            message.
+        root :
+            The frame the link belongs to, None without the GUI.
+        data_callback :
+            Called with a list of all the data lines ("D:...") received
+            together. If it is None the data lines are passed to callback
+            one at a time.
+        """
+        super().__init__()
+        self._callback = callback
+        self._data_callback = data_callback
+        self._control_frame = root
+        self.bytes_received = 0  # Read by the GUI to show the link speed
+
+    def connection_made(self, transport):
+        """Function used to initialise the LineReader. Mostly inherited
+        from the super class, with a message printed to the terminal indicating
+        startup.
+        Returns nothing.
+        """
+        super(WriteLines, self).connection_made(transport)
+
+    def data_received(self, data):
+        """Function is called with the bytes read from the port. All the
+        complete lines are decoded at once and passed to handle_lines.
+        Returns nothing."""
+        start = time.perf_counter()
+        self.bytes_received += len(data)
+        perf.count("bytes", len(data))
+        self.buffer.extend(data)
+        end = self.buffer.rfind(self.TERMINATOR)
+        if end < 0:
+            return  # No complete line yet
+        text = self.buffer[:end].decode(self.ENCODING, self.UNICODE_HANDLING)
+        del self.buffer[:end + len(self.TERMINATOR)]
+        self.handle_lines(text.split(self.TERMINATOR.decode()))
+        perf.add_time("read", start)
+
+    def handle_lines(self, lines: list):
+        """
+        Passes runs of data lines to the data callback in one call, and every
+        other line to the callback, keeping the order of the lines.
+        Parameters
+        ----------
+        lines:
+            The complete lines received from the firmware.
+        """
+        if self._data_callback is None:
+            for line in lines:
+                self.handle_line(line)
+            return
+        data_lines = []
+        for line in lines:
+            if line.startswith("D:"):
+                data_lines.append(line)
+                continue
+            if data_lines:
+                self._data_callback(data_lines)
+                data_lines = []
+            self.handle_line(line)
+        if data_lines:
+            self._data_callback(data_lines)
+
+    def handle_line(self, data):
+        """
+        Function is called whenever the Line Reader reads in data sent from the
+        port.
+        Parameters
+        ----------
+        data:
+            The recieved data from the firmware.
+        """
+        start = time.perf_counter()
+        self._callback(data)
+        perf.add_time("message", start)
+
+    def connection_lost(self, exc):
+        """Function prints a message to the terminal when the connection with
+        the Oirt ceases.
+        """
+
+        sys.stdout.write("error message\n")
+        message = "port closed"
+        events.post(EVENT_ERROR, message)
+
+        pass
+
+
+class WriteFrames(WriteLines):
+    """Reads the binary data frames and the text lines sent from firmware to
+    the GUI. Runs of frames are decoded together with np.frombuffer. If the
+    firmware only sends text this is the same as WriteLines."""
+
+    def __init__(self, callback, root, data_callback=None,
+                 frame_callback=None, stats: StreamStats | None = None,
+                 bad_frame_callback=None):
+        """
+        Parameters
+        ----------
+        callback, data_callback :
+            The same as WriteLines.
+        frame_callback :
+            Called with an array of FRAME_DTYPE frames that passed their CRC
+            check.
+        stats :
+            Frames that fail their CRC check are counted as malformed in it.
+        bad_frame_callback :
+            Called with each whole frame that failed its CRC check.
+        """
+        super().__init__(callback, root, data_callback)
+        self._frame_callback = frame_callback
+        self._stats = stats
+        self._bad_frame_callback = bad_frame_callback
+        self.bad_frames = 0  # Frames that failed their CRC check
+
+    def data_received(self, data):
+        """Function is called with the bytes read from the port. Splits the
+        bytes into frames and lines, keeping incomplete ones for next time.
+        Returns nothing."""
+        if FRAME_SYNC not in data and FRAME_SYNC not in self.buffer:
+            super().data_received(data)  # Only text
+            return
+        start = time.perf_counter()
+        self.bytes_received += len(data)
+        perf.count("bytes", len(data))
+        self.buffer.extend(data)
+        buffer = self.buffer
+        size = FRAME_DTYPE.itemsize
+        pos = 0
+        lines = []
+        while pos < len(buffer):
+            if buffer[pos] == FRAME_SYNC:
+                # A run of complete frames sent one after the other
+                end = pos
+                while end + size <= len(buffer) and buffer[end] == FRAME_SYNC:
+                    end += size
+                if end == pos:
+                    break  # Wait for the rest of the frame
+                if lines:
+                    self.handle_lines(lines)
+                    lines = []
+                pos = self.handle_frames(bytes(buffer[pos:end]), pos)
+                continue
+            end = buffer.find(self.TERMINATOR, pos)
+            line_end = len(buffer) if end < 0 else end
+            sync = buffer.find(FRAME_SYNC, pos, line_end)
+            if sync >= 0:
+                pos = sync  # Part of a line or frame was lost, skip it
+                continue
+            if end < 0:
+                break  # Wait for the rest of the line
+            lines.append(buffer[pos:end].decode(self.ENCODING,
+                                                self.UNICODE_HANDLING))
+            pos = end + len(self.TERMINATOR)
+        del buffer[:pos]
+        if lines:
+            self.handle_lines(lines)
+        perf.add_time("read", start)
+
+    def handle_frames(self, run: bytes, pos: int) -> int:
+        """
+        Checks and passes on a run of frames.
+        Parameters
+        ----------
+        run:
+            Bytes that look like back to back frames
+        pos:
+            Where the run starts in the buffer
+        Returns where reading should carry on in the buffer
+        """
+        started = time.perf_counter()
+        size = FRAME_DTYPE.itemsize
+        frames = np.frombuffer(run, dtype=FRAME_DTYPE)
+        crcs = [binascii.crc_hqx(run[start + 1:start + size - 2], 0)
+                for start in range(0, len(run), size)]
+        good = frames["crc"] == crcs
+        num_good = len(frames) if good.all() else int(np.argmin(good))
+        perf.add_time("decode", started)
+        if num_good and self._frame_callback is not None:
+            self._frame_callback(frames[:num_good])
+        if num_good == len(frames):
+            return pos + len(run)
+        # The sync byte was in the middle of a frame or the frame was
+        # damaged, look for the next frame or line after it.
+        self.bad_frames += 1
+        if self._stats is not None:
+            self._stats.add(malformed=1)
+        if self._bad_frame_callback is not None:
+            self._bad_frame_callback(frames[num_good])
+        start = pos + num_good * size + 1
+        ends = [self.buffer.find(FRAME_SYNC, start),
+                self.buffer.find(self.TERMINATOR, start)]
+        if ends[1] >= 0:
+            ends[1] += len(self.TERMINATOR)
+        ends = [end for end in ends if end >= 0]
+        return min(ends) if ends else len(self.buffer)
+
+
+def command_key(message: str) -> str | None:
+    """
+    Works out which setting a command to the loggy changes, so a newer
+    command for the same setting can replace it before it is sent.
+    message: the command, e.g. "ALT CH1 0.5#"
+    Returns the setting, e.g. "ALT CH1", or None if it is always sent
+    """
+    if not message.startswith(COALESCED_COMMANDS):
+        return None
+    if message[0] == "V":
+        return "V"
+    return message.rsplit(" ", 1)[0]
+
+
+class ThreadLink(st.ReaderThread):
+    """Reads the port with a serial.threaded.ReaderThread. Messages are sent
+    straight away on the calling thread. Has the same methods as AsyncLink.
+    """
+
+    def send(self, message: str) -> None:
+        """Sends a message to the loggy. If the port is lost an EVENT_ERROR
+        is posted and the link is closed.
+        Returns nothing"""
+        try:
+            self.write(message.encode("utf-8"))
+            self.serial.flush()
+        except ser.SerialException:
+            print(f"Failed to send {message}!")
+            events.post(EVENT_ERROR, "Port Connection Lost.")
+            self.close()
+
+    def close(self) -> None:
+        """Stops reading and closes the port.
+        Returns nothing"""
+        if self.is_alive():
+            super().close()  # Waits for the thread
+        else:
+            self.serial.close()
+
+
+class AsyncLink:
+    """
+    Runs the port on an asyncio event loop in one background thread, so the
+    Tk thread never waits for the port. Bytes read are passed to a protocol
+    (WriteFrames) like serial.threaded.ReaderThread does. Messages are
+    queued and sent in order on the loop's executor, a queued command is
+    replaced by a newer one for the same setting (see command_key).
+    The loop is woken when the port has data where the event loop supports
+    it, otherwise the port is polled every ASYNC_POLL_INTERVAL s, slowing
+    down to ASYNC_POLL_IDLE s while nothing is received.
+    """
+
+    def __init__(self, serial_instance: ser.Serial, protocol_factory):
+        """
+        Parameters
+        ----------
+        serial_instance : ser.Serial
+            The open port.
+        protocol_factory :
+            Called on the loop thread to make the protocol.
+        """
+        self.serial = serial_instance
+        self.protocol = None
+        self._protocol_factory = protocol_factory
+        self._loop = asyncio.new_event_loop()
+        self._thread = th.Thread(target=self._run, daemon=True)
+        self._started = th.Event()
+        self._writes = {}  # {setting or number: bytes}, in the order to send
+        self._num_writes = 0  # Numbers the writes that are always sent
+        self._write_ready = None
+        self._closing = None
+
+    def start(self) -> None:
+        """Starts the loop thread and waits for the protocol to be made.
+        Returns nothing"""
+        self.serial.write_timeout = ASYNC_WRITE_TIMEOUT
+        self._thread.start()
+        self._started.wait()
+
+    def send(self, message: str) -> None:
+        """Queues a message for the loggy, can be called from any thread.
+        Returns nothing"""
+        try:
+            self._loop.call_soon_threadsafe(self._queue_write, message)
+        except RuntimeError:  # The loop has stopped
+            print(f"Failed to send {message}!")
+
+    def write(self, data: bytes) -> None:
+        """Queues bytes for the loggy, for protocols that write.
+        Returns nothing"""
+        self.send(data.decode("utf-8"))
+
+    def close(self) -> None:
+        """Sends the queued messages, stops reading and closes the port.
+        Waits up to ASYNC_CLOSE_TIMEOUT s for the loop thread.
+        Returns nothing"""
+        if self._thread.is_alive():
+            try:
+                self._loop.call_soon_threadsafe(self._closing.set)
+            except RuntimeError:
+                pass  # The loop has already stopped
+            self._thread.join(ASYNC_CLOSE_TIMEOUT)
+        self.serial.close()
+
+    def stop(self) -> None:
+        """The same as close, for the ReaderThread API.
+        Returns nothing"""
+        self.close()
+
+    def join(self, timeout: float | None = None) -> None:
+        self._thread.join(timeout)
+
+    def is_alive(self) -> bool:
+        return self._thread.is_alive()
+
+    def _run(self) -> None:
+        """The loop thread.
+        Returns nothing"""
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._main())
+        finally:
+            self._started.set()  # In case the protocol could not be made
+            # Waits for a write still sending, up to ASYNC_WRITE_TIMEOUT s
+            self._loop.run_until_complete(
+                self._loop.shutdown_default_executor())
+            self._loop.close()
+
+    async def _main(self) -> None:
+        """Reads and writes until the link is closed or the port fails, then
+        tells the protocol the connection is lost.
+        Returns nothing"""
+        self._write_ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self.protocol = self._protocol_factory()
+        self.protocol.connection_made(self)
+        self._started.set()
+        tasks = [asyncio.create_task(self._read()),
+                 asyncio.create_task(self._write()),
+                 asyncio.create_task(self._closing.wait())]
+        done, pending = await asyncio.wait(
+            tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        error = None
+        for task in done:
+            if not task.cancelled() and task.exception() is not None:
+                error = task.exception()
+        if error is None:
+            try:
+                await asyncio.wait_for(self._flush_writes(),
+                                       ASYNC_CLOSE_TIMEOUT)
+            except (asyncio.TimeoutError, ser.SerialException):
+                pass
+        self._unwatch_port()
+        self.protocol.connection_lost(error)
+
+    async def _read(self) -> None:
+        """Passes the bytes read to the protocol.
+        Returns nothing"""
+        readable = asyncio.Event()
+        if self._watch_port(readable.set):
+            while True:
+                await readable.wait()
+                readable.clear()
+                # A port that is readable with nothing waiting has gone,
+                # reading raises an error
+                data = self.serial.read(self.serial.in_waiting or 1)
+                if data:
+                    self.protocol.data_received(data)
+        interval = ASYNC_POLL_INTERVAL
+        while True:
+            waiting = self.serial.in_waiting
+            if waiting:
+                self.protocol.data_received(self.serial.read(waiting))
+                interval = ASYNC_POLL_INTERVAL
+            else:
+                await asyncio.sleep(interval)
+                interval = min(interval * 2, ASYNC_POLL_IDLE)
+
+    def _watch_port(self, callback) -> bool:
+        """Asks the loop to call callback when the port has data.
+        Returns False if the loop or the port can't do this"""
+        try:
+            self._loop.add_reader(self.serial.fileno(), callback)
+        except (AttributeError, NotImplementedError, OSError, ValueError):
+            return False
+        return True
+
+    def _unwatch_port(self) -> None:
+        try:
+            self._loop.remove_reader(self.serial.fileno())
+        except (AttributeError, NotImplementedError, OSError, ValueError):
+            pass
+
+    def _queue_write(self, message: str) -> None:
+        """Adds a message to the queue on the loop thread, replacing a queued
+        command for the same setting.
+        Returns nothing"""
+        key = command_key(message)
+        if key is None:
+            key = self._num_writes
+            self._num_writes += 1
+        self._writes.pop(key, None)  # The newest command goes last
+        self._writes[key] = message.encode("utf-8")
+        self._write_ready.set()
+
+    async def _write(self) -> None:
+        """Sends the queued messages as they are queued.
+        Returns nothing"""
+        while True:
+            await self._write_ready.wait()
+            self._write_ready.clear()
+            await self._flush_writes()
+
+    async def _flush_writes(self) -> None:
+        """Sends the queued messages. A message that times out is dropped.
+        The port is written on a worker thread so a full port doesn't hold
+        up the reader.
+        Returns nothing"""
+        while self._writes:
+            data = self._writes.pop(next(iter(self._writes)))
+            try:
+                await self._loop.run_in_executor(None, self.serial.write,
+                                                 data)
+            except ser.SerialTimeoutException:
+                events.post(EVENT_ERROR, f"Timed out sending "
+                                         f"{data.decode('utf-8')}")
+            except ser.SerialException:
+                events.post(EVENT_ERROR, "Port Connection Lost.")
+                raise
+
+
+def open_link(serial_instance: ser.Serial, protocol_factory):
+    """Makes the link of SERIAL_TRANSPORT for an open port, not started.
+    Returns an AsyncLink or a ThreadLink"""
+    if SERIAL_TRANSPORT == "thread":
+        return ThreadLink(serial_instance, protocol_factory)
+    return AsyncLink(serial_instance, protocol_factory)
+
+
+def negotiate_baud(port: ser.Serial) -> int:
+    """Asks the loggy for faster baud rates, slowest first. Each rate is
+    checked by sending a random message that the loggy has to echo at
+    the new rate. Stops at the first rate that does not work, the loggy
+    goes back to the last rate that worked by itself. Old firmware does
+    not reply, so the port stays at BAUDRATE.
+    Parameters
+    ----------
+    port : ser.Serial
+        The open port, before the reader thread is started.
+    Returns the baud rate that was settled on.
+    """
+    rate = port.baudrate
+    for new_rate in BAUD_RATES:
+        port.reset_input_buffer()
+        port.write(f"BAUD {new_rate}#".encode("utf-8"))
+        if not wait_for_reply(port, f"BAUD OK {new_rate}"):
+            break
+        time.sleep(0.01)  # The loggy changes rate after its reply
+        port.baudrate = new_rate
+        port.reset_input_buffer()
+        echo = f"ECHO {os.urandom(4).hex().upper()}"
+        port.write(f"{echo}#".encode("utf-8"))
+        if not wait_for_reply(port, echo):
+            port.baudrate = rate
+            time.sleep(BAUD_TIMEOUT)  # Wait for the loggy to go back
+            port.reset_input_buffer()
+            break
+        rate = new_rate
+    print(f"Baud rate {rate}")
+    return rate
+
+
+def negotiate_later(port: ser.Serial) -> th.Thread:
+    """Runs negotiate_baud on a worker thread, so the Tk thread is not held
+    up for up to a second, then posts an EVENT_BAUD with (port, baud rate).
+    The baud rate is None if the port failed, e.g. it was unplugged.
+    Parameters
+    ----------
+    port : ser.Serial
+        The open port, the loggy has been asked to STOP CONT.
+    Returns the worker thread.
+    """
+    def negotiate():
+        time.sleep(0.05)  # For the loggy to stop sending
+        try:
+            rate = negotiate_baud(port)
+        except (ser.SerialException, OSError, TypeError, ValueError):
+            rate = None  # Also when the port is closed while it is used
+        events.post(EVENT_BAUD, (port, rate))
+
+    worker = th.Thread(target=negotiate, daemon=True)
+    worker.start()
+    return worker
+
+
+def wait_for_reply(port: ser.Serial, reply: str) -> bool:
+    """Reads lines from the port until 'reply' or BAUD_TIMEOUT.
+    Returns True if the reply was received."""
+    expected = reply.encode("utf-8")
+    deadline = time.monotonic() + BAUD_TIMEOUT
+    while time.monotonic() < deadline:
+        # Data sent before the reply can be on the same line
+        if port.readline().rstrip(b"\r\n").endswith(expected):
+            return True
+    return False
+
+
+class Loggy:
+    """
+    A loggy that is only read from: its samples go into a Data and the
+    settings it sends are ignored. Used for the extra loggys of a GUI
+    session and for headless acquisition.
+    """
+
+    def __init__(self, port_name: str, data: Data):
+        """
+        Parameters
+        ----------
+        port_name : str
+            The serial port of the loggy.
+        data : Data
+            Where its samples go.
+        """
+        self.port_name = port_name
+        self.data = data
+        self.baud_rate = BAUDRATE
+        self.negotiate = True  # Ask for a faster baud rate when connecting
+        self._link = None
+
+    def connect(self) -> None:
+        """Opens the port, works out the baud rate and starts reading.
+        Raises ser.SerialException if the port can not be opened.
+        Returns nothing"""
+        port = self.open_port()
+        time.sleep(0.05)
+        if self.negotiate:
+            self.baud_rate = negotiate_baud(port)
+        self.start(port)
+
+    def open_port(self) -> ser.Serial:
+        """Opens the port and stops the loggy sending, the GUI then works
+        out the baud rate with negotiate_later and calls start.
+        Raises ser.SerialException if the port can not be opened.
+        Returns the port"""
+        port = ser.Serial(self.port_name, baudrate=BAUDRATE, timeout=0.1)
+        port.write(b"STOP CONT#")
+        return port
+
+    def start(self, port: ser.Serial) -> None:
+        """Starts reading an open port at its baud rate.
+        Returns nothing"""
+        self.data.reset_stream()
+        # The first loggy of the session may not have connected yet
+        if self.data.time_base.start is None:
+            self.data.time_base.start = time.time()
+        self._link = open_link(
+            port, lambda: WriteFrames(self.handle_message, None,
+                                      self.data.append_lines,
+                                      self.data.append_frames,
+                                      self.data.stats,
+                                      self.data.skip_frame))
+        self._link.start()
+        self.data._ready_to_plot = 1
+        self._link.send(STARTCONTMESSAGE)
+
+    def handle_message(self, message: str) -> None:
+        """Reader thread callback. Finishes the start up messages, the other
+        messages are about settings and are ignored.
+        Returns nothing"""
+        if message == "END CONT":
+            self._link.send("END CONT#")
+            if BINARY_FRAMES:
+                self._link.send(BINARY_ON_MESSAGE)
+
+    def close(self) -> None:
+        """Stops the loggy sending and closes the port.
+        Returns nothing"""
+        if self._link:
+            self._link.send("STOP CONT#")
+            self._link.close()
+            self._link = None
+        self.data._ready_to_plot = 0
+
+    @property
+    def connected(self) -> bool:
+        return self._link is not None and self._link.is_alive()
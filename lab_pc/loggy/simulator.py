@@ -0,0 +1,429 @@
+"""
+A simulated loggy on a Linux pseudo-terminal, for testing the GUI and the
+headless acquisition without a board, at the real sample rate or far
+beyond it.
+
+    python -m loggy.simulator --rate 168
+    LOGGY_PORTS=/dev/pts/5 python main_gui.py
+
+It answers the same commands as the firmware (Src/uart.c) with the same
+messages: the settings between %START CONT and END CONT, BAUD/ECHO,
+BIN ON, V0/V1, the thresholds and alarm modes, AS alarm statuses and the
+samples as "D:" lines or binary frames. The samples are sine waves with
+noise and drift, a channel can be pushed over its high threshold every so
+often, and lines or frames can be damaged or dropped on purpose.
+"""
+import argparse
+import binascii
+import os
+import selectors
+import signal
+import sys
+import time
+import threading as th
+import numpy as np
+from loggy.core import (BAUDRATE, FRAME_DTYPE, FRAME_SEQ_WRAP, FRAME_SYNC,
+                        FRAME_TICK_WRAP, LOGGY_SAMPLE_RATE, TICK_SECONDS)
+
+SIM_INTERVAL = 0.005  # s between blocks of samples
+SIM_MAX_BLOCK = 0.1  # Most seconds of samples sent in one block
+SIM_BACKLOG = 1 << 20  # Bytes waiting for the port, more are lost
+SIM_MAX_BAUD = 500000  # The firmware's MAX_BAUD
+# (amplitude, frequency in Hz, offset) of each channel's sine wave
+SIM_SIGNALS = ((0.5, 0.5, 0.0), (0.5, 1.0, 0.0), (0.5, 2.0, 0.0),
+               (0.5, 5.0, 0.0), (0.2, 1.0, 0.0), (0.2, 1.0, 0.0),
+               (0.2, 1.0, 9.81), (0.5, 0.01, 25.0))
+# Alarm modes of the firmware
+SIM_ALARM_DISABLED = 0
+SIM_ALARM_LIVE = 1
+SIM_ALARM_LATCHING = 2
+SIM_STATUS_INTERVAL = 10.0  # s between status lines of main
+
+
+class SimulatedLoggy:
+    """
+    The firmware's side of the serial link. The loggy is the master end of
+    a pty, the GUI opens the slave end (port_name) like a real port.
+    Samples are made in blocks every SIM_INTERVAL seconds on a background
+    thread, their times come from the sample rate so the rate holds however
+    late a block is. Alarms are checked once for each block.
+    """
+
+    def __init__(self, rate: float = LOGGY_SAMPLE_RATE, noise: float = 0.01,
+                 drift: float = 0.0, breach_every: float | None = None,
+                 breach_length: float = 1.0, malformed: float = 0.0,
+                 drop: float = 0.0, baud: bool = True,
+                 seed: int | None = None):
+        """
+        Parameters
+        ----------
+        rate : float
+            Samples per second.
+        noise : float
+            Standard deviation of the noise added to every value.
+        drift : float
+            Added to every value for each second since START CONT.
+        breach_every : float
+            Seconds between threshold breaches, no breaches if it is None.
+            The breaches go through the channels in turn.
+        breach_length : float
+            Seconds each breach lasts.
+        malformed : float
+            Fraction of the samples sent damaged, lines are cut short and
+            frames have a byte changed so they fail their CRC check.
+        drop : float
+            Fraction of the samples that are never sent, frames still use
+            up a sequence number so they show up as gaps.
+        baud : bool
+            Answer BAUD commands, old firmware ignores them.
+        seed : int
+            Seed of the noise and the damage, for repeatable runs.
+        """
+        self.rate = rate
+        self.noise = noise
+        self.drift = drift
+        self.breach_every = breach_every
+        self.breach_length = breach_length
+        self.malformed = malformed
+        self.drop = drop
+        self.baud = baud
+        self._rng = np.random.default_rng(seed)
+        signals = np.array(SIM_SIGNALS)
+        self._amplitude, self._frequency, self._offset = signals.T
+        # The settings kept in the eeprom of a real loggy
+        self.high_thresholds = self._offset + 2 * self._amplitude
+        self.low_thresholds = self._offset - 2 * self._amplitude
+        self.alarm_modes = [SIM_ALARM_LIVE] * 8
+        self.ten_volt = False  # The V1 range
+        self.baud_rate = BAUDRATE
+        self._trial_baud = None  # Rate sent in BAUD OK, waiting for ECHO
+        self._streaming = False
+        self._binary = False
+        self._sent = 0  # Samples made since START CONT
+        self._start = 0.0
+        self._latched = np.zeros(8, dtype=bool)
+        self._statuses = None  # The AS statuses last sent
+        self._master = None
+        self._slave = None
+        self._pending = bytearray()  # Bytes waiting for the port
+        self._commands = bytearray()
+        self._thread = None
+        self._stop = th.Event()
+        # Counters, read by whoever runs the simulator
+        self.samples_sent = 0
+        self.malformed_sent = 0
+        self.dropped = 0
+        self.bytes_lost = 0  # Sent while nothing was reading the port
+
+    def open(self) -> str:
+        """Opens the pty. The slave end is kept open as well, so the port
+        can be opened and closed by the GUI as often as it likes.
+        Returns the name of the port to connect to"""
+        import tty  # Not on Windows, where there are no ptys
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        os.set_blocking(self._master, False)
+        return os.ttyname(self._slave)
+
+    def start(self) -> str:
+        """Opens the pty and answers the GUI on a background thread.
+        Returns the name of the port to connect to"""
+        port_name = self.open()
+        self._stop.clear()
+        self._thread = th.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return port_name
+
+    def stop(self) -> None:
+        """Stops the background thread and closes the pty.
+        Returns nothing"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                os.close(fd)
+        self._master = self._slave = None
+
+    def run(self) -> None:
+        """Reads commands and sends samples until stop is called.
+        Returns nothing"""
+        selector = selectors.DefaultSelector()
+        selector.register(self._master, selectors.EVENT_READ)
+        while not self._stop.is_set():
+            if selector.select(SIM_INTERVAL):
+                self._read_commands()
+            if self._streaming:
+                self._send_samples()
+            self._flush()
+        selector.close()
+
+    def _read_commands(self) -> None:
+        try:
+            self._commands.extend(os.read(self._master, 4096))
+        except BlockingIOError:
+            return
+        while True:
+            end = self._commands.find(b"#")
+            if end < 0:
+                return
+            command = self._commands[:end].decode("ascii", "replace")
+            del self._commands[:end + 1]
+            self.handle_command(command)
+
+    def send(self, message: str) -> None:
+        """Queues a text message, the line ending is added.
+        Returns nothing"""
+        self._write(f"{message}\r\n".encode("ascii"))
+
+    def _write(self, data: bytes) -> None:
+        if len(self._pending) + len(data) > SIM_BACKLOG:
+            self.bytes_lost += len(data)  # Like a UART nobody listens to
+            return
+        self._pending.extend(data)
+
+    def _flush(self) -> None:
+        while self._pending:
+            try:
+                written = os.write(self._master, self._pending)
+            except BlockingIOError:
+                return
+            del self._pending[:written]
+
+    def handle_command(self, command: str) -> None:
+        """Does what process_command in the firmware does with a command
+        (without the #).
+        Returns nothing"""
+        if self._trial_baud is not None:
+            rate, self._trial_baud = self._trial_baud, None
+            if command.startswith("ECHO "):
+                self.send(command)
+                self.baud_rate = rate
+                return
+        if command == "STOP CONT":
+            self._streaming = False
+            self.baud_rate = BAUDRATE
+        elif command.startswith("START CONT"):
+            self.send("RECEIVED")
+            self.send_config()
+            self._reset_alarms()
+            self._binary = False
+            self._sent = 0
+            self._start = time.monotonic()
+            self.send("END CONT")
+            self._streaming = True
+        elif command.startswith("BAUD ") and self.baud:
+            try:
+                rate = int(command[5:])
+            except ValueError:
+                rate = 0
+            if BAUDRATE <= rate <= SIM_MAX_BAUD:
+                self.send(f"BAUD OK {rate}")
+                self._trial_baud = rate
+            else:
+                self.send("BAUD NO")
+        elif command.startswith("BIN ON"):
+            self.send("BIN OK")
+            self._binary = True
+        elif command.startswith("BIN OFF"):
+            self._binary = False
+        elif command.startswith(("V0", "V1")):
+            # The firmware swaps the range whichever is sent
+            self.ten_volt = not self.ten_volt
+            self.send("V1" if self.ten_volt else "V0")
+        elif command.startswith(("AHT CH", "ALT CH")):
+            channel, value = self._channel_value(command[6:], float)
+            if channel is None:
+                self.send("Invalid parameter")
+                return
+            thresholds = (self.high_thresholds if command[1] == "H"
+                          else self.low_thresholds)
+            thresholds[channel - 1] = value
+            self.send(f"{command[:6]}{channel} {value:.3f}")
+            self._latched[channel - 1] = False
+        elif command.startswith("AM CH"):
+            channel, mode = self._channel_value(command[5:], int)
+            if channel is not None and SIM_ALARM_DISABLED <= mode \
+                    <= SIM_ALARM_LATCHING:
+                self.alarm_modes[channel - 1] = mode
+
+    @staticmethod
+    def _channel_value(text: str, convert) -> tuple:
+        """Reads "<channel> <value>".
+        Returns (channel, value), (None, None) if it can't be read"""
+        try:
+            channel, value = text.split(" ", 1)
+            channel, value = int(channel), convert(value)
+        except ValueError:
+            return None, None
+        if not 1 <= channel <= 8:
+            return None, None
+        return channel, value
+
+    def send_config(self) -> None:
+        """Sends the settings like send_config in the firmware.
+        Returns nothing"""
+        for name, thresholds in (("HT", self.high_thresholds),
+                                 ("LT", self.low_thresholds)):
+            values = " ".join(f"CH{i + 1}:{value:.3f}"
+                              for i, value in enumerate(thresholds))
+            self.send(f"{name}: {values}")
+        for i, mode in enumerate(self.alarm_modes):
+            self.send(f"AM CH{i + 1} {mode}")
+        self.send("V1" if self.ten_volt else "V0")
+
+    def _reset_alarms(self) -> None:
+        if self._streaming:
+            for i in range(8):
+                self.send(f"AS CH{i + 1} 0")
+        self._latched[:] = False
+        self._statuses = np.zeros(8, dtype=bool)
+
+    def make_samples(self, first: int, count: int) -> np.ndarray:
+        """Works out the values of samples first to first + count - 1,
+        counted from START CONT.
+        Returns a (count, 8) array"""
+        times = np.arange(first, first + count) / self.rate
+        values = (self._offset
+                  + self._amplitude * np.sin(2 * np.pi * np.outer(
+                      times, self._frequency) + np.arange(8))
+                  + self.drift * times[:, None])
+        if self.noise:
+            values += self._rng.normal(0.0, self.noise, values.shape)
+        if self.breach_every:
+            # Pushes one channel over its high threshold at a time
+            cycle, phase = np.divmod(times, self.breach_every)
+            breach = phase < self.breach_length
+            channels = cycle.astype(np.int64) % 8
+            rows = np.flatnonzero(breach)
+            span = self.high_thresholds - self.low_thresholds
+            values[rows, channels[rows]] += span[channels[rows]]
+        volt_range = 10.0 if self.ten_volt else 1.0
+        np.clip(values[:, :4], -volt_range, volt_range, out=values[:, :4])
+        return values
+
+    def _send_samples(self) -> None:
+        due = int((time.monotonic() - self._start) * self.rate) - self._sent
+        count = min(due, max(1, int(self.rate * SIM_MAX_BLOCK)))
+        if count <= 0:
+            return
+        first = self._sent
+        values = self.make_samples(first, count)
+        self._sent += count
+        keep = np.ones(count, dtype=bool)
+        if self.drop:
+            keep = self._rng.random(count) >= self.drop
+            self.dropped += count - int(keep.sum())
+        damaged = np.zeros(count, dtype=bool)
+        if self.malformed:
+            damaged = keep & (self._rng.random(count) < self.malformed)
+            self.malformed_sent += int(damaged.sum())
+        self.samples_sent += int(keep.sum())
+        if self._binary:
+            self._write(self._frames(first, values, keep, damaged))
+        else:
+            self._write(self._lines(values, keep, damaged))
+        self._check_alarms(values)
+
+    def _lines(self, values: np.ndarray, keep: np.ndarray,
+               damaged: np.ndarray) -> bytes:
+        lines = []
+        for row, sample in enumerate(values.tolist()):
+            if not keep[row]:
+                continue
+            line = "D:%.6f,%.6f,%.6f,%.6f,%.6f,%.6f,%.6f,%.6f" % tuple(sample)
+            if damaged[row]:
+                # Cut before the last value so it can't be read
+                line = line[:self._rng.integers(2, line.rfind(","))]
+            lines.append(line + "\r\n")
+        return "".join(lines).encode("ascii")
+
+    def _frames(self, first: int, values: np.ndarray, keep: np.ndarray,
+                damaged: np.ndarray) -> bytes:
+        index = np.arange(first, first + len(values))
+        frames = np.zeros(len(values), dtype=FRAME_DTYPE)
+        frames["sync"] = FRAME_SYNC
+        frames["seq"] = index % FRAME_SEQ_WRAP
+        ticks = np.round(index / self.rate / TICK_SECONDS)
+        frames["tick"] = ticks.astype(np.int64) % FRAME_TICK_WRAP
+        frames["values"] = values
+        raw = memoryview(frames.tobytes())
+        size = FRAME_DTYPE.itemsize
+        # The CRC is of everything between the sync byte and the CRC
+        frames["crc"] = [binascii.crc_hqx(raw[start + 1:start + size - 2], 0)
+                         for start in range(0, len(raw), size)]
+        if damaged.any():
+            # A byte of the values is changed after the CRC
+            frames["values"][damaged, 0] += 1.0
+        return frames[keep].tobytes()
+
+    def _check_alarms(self, values: np.ndarray) -> None:
+        """Like check_alarm_threshold in the firmware, with the last sample
+        of the block for live alarms and any sample for latching ones.
+        Returns nothing"""
+        outside = ((values > self.high_thresholds)
+                   | (values < self.low_thresholds))
+        modes = np.array(self.alarm_modes)
+        self._latched |= outside.any(axis=0) & (modes == SIM_ALARM_LATCHING)
+        statuses = np.where(modes == SIM_ALARM_LIVE, outside[-1],
+                            self._latched) & (modes != SIM_ALARM_DISABLED)
+        if not np.array_equal(statuses, self._statuses):
+            self._statuses = statuses
+            for i, status in enumerate(statuses):
+                self.send(f"AS CH{i + 1} {int(status)}")
+
+
+def main(argv: list | None = None) -> int:
+    """Runs a simulated loggy until Ctrl+C or SIGTERM.
+    Returns the exit status"""
+    parser = argparse.ArgumentParser(
+        prog="python -m loggy.simulator",
+        description="Simulate a loggy on a pseudo-terminal.")
+    parser.add_argument("--rate", type=float, default=LOGGY_SAMPLE_RATE,
+                        help="samples per second")
+    parser.add_argument("--noise", type=float, default=0.01,
+                        help="standard deviation of the noise")
+    parser.add_argument("--drift", type=float, default=0.0,
+                        help="added to every value each second")
+    parser.add_argument("--breach-every", type=float,
+                        help="seconds between threshold breaches")
+    parser.add_argument("--breach-length", type=float, default=1.0,
+                        help="seconds each breach lasts")
+    parser.add_argument("--malformed", type=float, default=0.0,
+                        help="fraction of the samples sent damaged")
+    parser.add_argument("--drop", type=float, default=0.0,
+                        help="fraction of the samples never sent")
+    parser.add_argument("--no-baud", action="store_true",
+                        help="ignore BAUD commands like old firmware")
+    parser.add_argument("--seed", type=int, help="seed of the randomness")
+    parser.add_argument("--link",
+                        help="also make this symlink to the port")
+    args = parser.parse_args(argv)
+
+    loggy = SimulatedLoggy(args.rate, args.noise, args.drift,
+                           args.breach_every, args.breach_length,
+                           args.malformed, args.drop, not args.no_baud,
+                           args.seed)
+    port_name = loggy.start()
+    if args.link:
+        if os.path.islink(args.link):
+            os.remove(args.link)
+        os.symlink(port_name, args.link)
+    print(f"Simulated loggy on {port_name}, {args.rate:g} samples/s")
+    print(f"Run the GUI with LOGGY_PORTS={args.link or port_name}")
+    stopped = th.Event()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signal_number, lambda number, frame: stopped.set())
+    while not stopped.wait(SIM_STATUS_INTERVAL):
+        print(f"{loggy.samples_sent} samples sent, {loggy.malformed_sent} "
+              f"malformed, {loggy.dropped} dropped, {loggy.bytes_lost} "
+              f"bytes lost, {loggy.baud_rate} baud")
+    loggy.stop()
+    if args.link and os.path.islink(args.link):
+        os.remove(args.link)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,9 +6,9 @@ Version 1.5
 This program will be able to display input from the loggy.
 It will be able to change settings in the loggy.
 """
-import csv
-import math
 import os
+import sys
+import threading as th
 import tkinter as tk
 import tkinter.ttk as ttk
 from tkinter import filedialog
@@ -17,12 +17,18 @@ from matplotlib import pyplot as plt, animation
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import serial as ser
 import serial.tools.list_ports as stlp
-import serial.threaded as st
-from datetime import datetime
-import sys
 import time
-import threading as th
-import queue as qu
+from collections import deque
+from loggy.core import (ACCEL_CHANNELS, BAUDRATE, BIN_EXTENSION, BINARY_ACK,
+                        BINARY_FRAMES, BINARY_ON_MESSAGE, CHANNELS_LIST,
+                        DATA_CAPACITY, EVENT_ALARM, EVENT_BAUD, EVENT_DATA,
+                        EVENT_ERROR, EVENT_HOST_ALARM, EVENT_MESSAGE,
+                        EVENT_REPLAY_ALARMS, EVENT_THRESHOLD, SENSOR_MODELS,
+                        STARTCONTMESSAGE, VOLT_CHANNELS, Data, Loggy,
+                        ReplayFile, RingBuffer, WriteFrames, binary_to_csv,
+                        csv_to_binary, events, negotiate_later, open_link,
+                        perf)
+from loggy.alarms import ALARM_SIDE_NAMES
 
 VRWIDG = 0
 LOWATWIDG = 1
@@ -31,7 +37,6 @@ ALARMMODEWIDG = 3
 ALARMMODELABEL = 4
 ALARMSTATUSLABEL = 5
 
-STARTCONTMESSAGE = "START CONT#"
 GUI_FONT = "Terminal"
 
 ON = 1
@@ -52,25 +57,23 @@ DIGIT = 1
 FLOAT = 0
 POSITIVE = 1
 NEGATIVE = 2
-BAUDRATE = 9600
+LINK_STATS_INTERVAL = 1000  # ms between updates of the link label
+# Ports listed as well as the serial ports, separated by os.pathsep, e.g. a
+# simulated loggy (python -m loggy.simulator)
+EXTRA_PORTS_VARIABLE = "LOGGY_PORTS"
 READIN = 255
-# Constants for the thermistor
-A_THERM = 3.354016e-3
-B_THERM = 2.909670e-4
-C_THERM = 1.632136e-6
-D_THERM = 7.192200e-8
 # Rtemp related constants
 CHANNELS_RTEMP = ("Channels", "CH1", "CH2", "CH3", "CH4")
 CURRENTS_RTEMP = ("Currents", "200uA", "10uA")
 SENSOR_RTEMP = ("Sensor", "Thermistor", "PT1000")
-# Channels in the loggy
-CHANNELS_LIST = (1, 2, 3, 4, 5, 6, 7, 8)
-VOLT_CHANNELS = (1, 2, 3, 4)
-ACCEL_CHANNELS = (5, 6, 7)
-TEMP_CHANNEL = 8
 # Plot related constants
 TEXT_BOX_STRING = "Hover over the plot to see data\n"
 LIVE_PLOT_INTERVAL = 250
+LIVE_PLOT_BLIT = True  # Only redraw the lines, not the whole figure
+LIVE_SCROLL_STEP = 0.5  # Fraction of the x-axis scrolled at a time
+LIVE_FRAME_STATS = 40  # Number of frame times kept
+PERF_INTERVAL = 1000  # ms between updates of the Performance tab
+ALARM_LOG_LINES = 1000  # Latest alarm events shown on the Alarms tab
 PLOT_HEIGHT = 10  # The dimensions of the plot
 PLOT_WIDTH = 15  # These values are best for 1920 x 1080 displays
 LEGEND_LOC = "upper left"
@@ -88,19 +91,19 @@ COLOURS = ("#e90000", "#ff6100", "#fff500", "#05fb00",
            "#31d5c8", "#33a7c8", "#001eba", "#a538c6")
 MARKER = "."
 # File related constants
-FILE_TYPES = (('CSV files', '*.csv'),)
-FILENAME_FORMAT = "%Y-%m-%d_%H-%M-%S"
-
-# global variable semaphor for threading.
-lock = th.Lock()
-errors = qu.Queue()
+FILE_TYPES = (('Recordings', '*.csv *.lgy'), ('CSV files', '*.csv'),
+              ('Loggy binary files', '*.lgy'))
+# Replay related constants
+REPLAY_WINDOW = 60.0  # Seconds shown when a recording is opened
+REPLAY_MIN_WINDOW = 0.1  # Smallest window that can be zoomed to (seconds)
 
 
 def make_error_pannel(control_frame: tk.Frame | tk.Tk, message: str,
                       program_running: bool):
     """
     Function make an error pannel according to the specific error that has
-    occured to the user.
+    occured to the user. Must be called on the Tk thread, other threads post
+    an EVENT_ERROR instead.
     Parameters
     ----------
     control_frame: tk.Frame|tk.Tk
@@ -112,240 +115,46 @@ def make_error_pannel(control_frame: tk.Frame | tk.Tk, message: str,
     Returns nothing.
     """
     if program_running:
-        lock.acquire()
-        sys.stdout.write("Making top level: \n")
         error_pannel = tk.Toplevel(control_frame)
-        sys.stdout.write("Made top level: \n")
         error_message = tk.Label(error_pannel, text=message, bg="red")
         error_message.grid()
-        lock.release()
     return
 
 
-class Data:
-    """
-    The place where all the data is stored.
-    Readings from the loggy are stored in a list.
-    (Time, ch1, ch2, ch3, ..., ch8)
-    """
-
-    def __init__(self, ready_to_plot):
-        """
-        Parameters
-        ----------
-        ready_to_plot : int
-            1 for ready, 0 for not ready.
-        """
-        # Temporary place to store data from the loggy.
-        # Has a maximum size of 1000.
-        self._data_list = [[] for _ in range(9)]
-        # The place where data is saved
-        self._save_list = [[] for _ in range(9)]
-        # Headers are changed when a voltage channel is switched to a rtemp.
-        self.headers = ["Time",
-                        "CH1 (V)", "CH2 (V)", "CH3 (V)", "CH4 (V)",
-                        "CH5 (m/s^2)", "CH6 (m/s^2)", "CH7 (m/s^2)",
-                        "CH8 (C)\n"]
-        self._ready_to_plot = ready_to_plot
-        # The time that the loggy connected to the GUI
-        self._start_time = None
-        self._is_data_recording = False  # Flag for recording
-
-    def set_headers(self, headers: list) -> None:
-        """Function is used to change the headers of Data.
-        Only used in the replay graph.
-        Returns nothing
-        """
-        self.headers = headers
-
-    def record(self) -> None:
-        """Function is called when user presses record button.
-        The data class will begin to record data when this function is called.
-        Returns nothing
-        """
-        self._is_data_recording = True
-
-    def toggle_rtemp_mode(self, channel: int, current: str,
-                          sensor: str) -> None:
-        """Function is used to change the mode of a Voltage channel
-        Channels 1 to 4 can be switched to temperature mode
-        if current != "OFF" and sensor != "OFF"
-        Channels 1 to 4 can be switched to voltage mode
-        if current == "OFF" and sensor == "OFF"
-        Returns nothing"""
-        if channel in VOLT_CHANNELS:  # only accept voltage channels
-            # Checks in case the main rtemp channel checkbutton was clicked
-            # off.
-            if current == "OFF" and sensor == "OFF":
-                self.headers[channel] = f"CH{channel} (V)"
-                return
-            self.headers[channel] = f"CH{channel} (C) {current} {sensor}"
-
-    def save_data(self) -> None:
-        """Saves the recorded data to a csv file.
-        Line format: YYYY-MM-DD_HH-MM-SS.sss,CH1,CH2,CH3,CH4,CH5,CH6,CH7,CH8
-        file name format: YYYY-MM-DD_HH-MM-SS.csv
-        The file will be saved to the usb drive.
-        """
-        if not self._save_list:
-            return  # _save_list is empty
-        start_time = datetime.fromtimestamp(self._save_list[0][0])
-        # create the filename string
-        filename = start_time.strftime(FILENAME_FORMAT) + ".csv"
-        file_directory = os.getcwd()  # current working directory
-        file_path = os.path.join(file_directory, filename)
-        file = open(file_path, "w")
-        print(f"Saved to {file_path}")
-        # Write the headers on the first line
-        file.write(self.headers[0])
-        for header in self.headers[1:]:
-            file.write(f",{header}")
-        # Write the data that was recorded
-        for i in range(len(self._save_list[0])):
-            time_stamp = self._save_list[0][i]
-            dt = datetime.fromtimestamp(time_stamp)
-            dt_str = (dt.strftime(FILENAME_FORMAT)
-                      + f".{dt.microsecond // 1000:03d}")
-            line = f"{dt_str}"
-            for channel in range(1, 9):
-                line += f",{self._save_list[channel][i]}"
-            line += "\n"
-            file.write(line)
-        file.close()  # close file resources.
-        self._save_list = [[] for _ in range(9)]  # reset the _save_list.
-        self._is_data_recording = False  # data has stopped recording.
-
-    def append_data(self, data_str: str) -> None:
-        """
-        Converts a string from the loggy into a list of floats and
-        appends it to the main list.
-        If recording is enabled, the data will also be recorded.
-        This function will calculate the resistive temperature if required.
-        data_str: "D:CH1,CH2,CH3,CH4,CH5,CH6,CH7,CH8"
-        """
-        if data_str.count(',') != 7:
-            return  # skip the line if it does not follow the protocol
-        data_str = data_str[2:]  # Remove the "D:"
-        data_str_list = data_str.split(',')
-        now = time.time()
-        self._data_list[0].append(now - self._start_time)
-        self._data_list[0] = self._data_list[0][-1000:]
-
-        for channel, dat_str in enumerate(data_str_list, start=1):
-            val = float(dat_str)
-            if channel in VOLT_CHANNELS:
-                if "(C)" in self.headers[channel]:
-                    if "200" in self.headers[channel]:
-                        current = 0.000200  # 200uA
-                    else:
-                        current = 0.000010  # 10uA
-                    if val < 0:
-                        val *= -1
-                    rt = val / current
-                    if "PT1000" in self.headers[channel]:  # °C PT1000 200uA
-                        # if this is negative GUI will fail
-                        val = -0.287154 * math.sqrt(abs(159861899 - 21000 *
-                                                        rt))
-                        val += 3383.81
-                    else:  # °C Thermistor 200uA
-                        ln = math.log(rt / 1000)
-                        val = (A_THERM
-                               + B_THERM * ln
-                               + C_THERM * ln ** 2
-                               + D_THERM * ln ** 3) ** -1
-                        val -= 273.15  # convert kelvins to celcius
-            self._data_list[channel].append(val)
-            self._data_list[channel] = self._data_list[channel][-1000:]
-
-    def clear_data(self) -> None:
-        """This function will remove all the data from the
-         _data_list and the _save_list"""
-        self._start_time = time.time()
-        self._data_list = [[] for _ in range(9)]
-        self._save_list = [[] for _ in range(9)]
-
-    def get_data(self) -> list:
-        """This function returns the entire _data_list.
-        This function should be called every 200ms."""
-        if self._is_data_recording:
-            self._save_list[0].append(time.time())
-            for i in CHANNELS_LIST:
-                self._save_list[i].append(self._data_list[i][-1])
-        return self._data_list
-
-    def ready_to_plot(self) -> int:
-        """This function returns 0 if not ready to plot and
-        1 if ready to plot"""
-        return self._ready_to_plot
-
-
-class WriteLines(st.LineReader):
-    """Class is used to handle a reader thread to read in lines sent from
-    firmware to the GUI."""
-
-    def __init__(self, callback, root: tk.Frame | tk.Tk):
-        """
-        Parameters
-        ----------
-        callback :
-            A callback function used whenever the LineReader recieves a
-            message.
-        """
-        super().__init__()
-        self._callback = callback
-        self._control_frame = root
-
-    def connection_made(self, transport):
-        """Function used to initialise the LineReader. Mostly inherited
-        from the super class, with a message printed to the terminal indicating
-        startup.
-        Returns nothing.
-        """
-        super(WriteLines, self).connection_made(transport)
-
-    def handle_line(self, data):
-        """
-        Function is called whenever the Line Reader reads in data sent from the
-        port.
-        Parameters
-        ----------
-        data:
-            The recieved data from the firmware.
-        """
-        self._callback(data)
-
-    def connection_lost(self, exc):
-        """Function prints a message to the terminal when the connection with
-        the Oirt ceases.
-        """
-
-        sys.stdout.write("error message\n")
-        message = "port closed"
-        errors.put(message)
-
-        pass
+def list_port_names() -> list:
+    """Returns the names of the serial ports, and the ports in the
+    EXTRA_PORTS_VARIABLE environment variable"""
+    names = [port.device for port in stlp.comports(include_links=False)]
+    extra = os.environ.get(EXTRA_PORTS_VARIABLE, "")
+    names.extend(name for name in extra.split(os.pathsep)
+                 if name and name not in names)
+    return names
 
 
 def search_for_point(x_coordinate, xdata) -> int:
     """
-    This function will iterate through all the points in xdata, and it will
-    return the index of the point in xdata.
-    that is closest to x_coordinate
+    This function will return the index of the point in xdata that is
+    closest to x_coordinate. xdata must be sorted (the times always are), so
+    a binary search is used. If two points are equally close the first one
+    is returned.
     """
-    difference = sys.maxsize  # Larges value of a integer
-    idx = 0
-
-    for i, num in enumerate(xdata):
-        diff = abs(num - x_coordinate)
-        if diff < difference:
-            difference = diff
-            idx = i
+    xdata = np.asarray(xdata)
+    if len(xdata) == 0:
+        return 0
+    # First point at or after x_coordinate
+    idx = int(np.searchsorted(xdata, x_coordinate))
+    if idx > 0 and (idx == len(xdata)
+                    or x_coordinate - xdata[idx - 1]
+                    <= xdata[idx] - x_coordinate):
+        # The point before is closer, use the first point with its time
+        idx = int(np.searchsorted(xdata, xdata[idx - 1]))
     return idx
 
 
 class Graph:
     # Static variable that is shared by all the Graph instances
-    num_data_points = 10
+    # Number of samples shown on the live plots, about 2.5 s at 168 S/s
+    num_data_points = 420
 
     def __init__(self, frame: tk.Frame, name: tuple[str, ...],
                  y_labels: tuple[str, ...]):
@@ -361,6 +170,19 @@ class Graph:
             The x-axis is always time in seconds.
         """
         self._ani = None  # The animation needs to be saved for it to work
+        # Used instead of the animation when blitting
+        self._timer = None
+        self._blit = False
+        self._background = None  # Figure without the lines, when blitting
+        self._needs_full_draw = True
+        # Frame times (ms) and number of full redraws, shown under the graph
+        self._frame_times = deque(maxlen=LIVE_FRAME_STATS)
+        self._full_draws = 0
+        self._frame_count = 0
+        self._frame_label = None
+        # The latest samples shown on the live plots
+        self._window = RingBuffer(DATA_CAPACITY)
+        self._sequence = 0  # Sequence number of the last sample plotted
         # This variable will become an instance of a data class
         self._data = None
         self._frame = frame  # frame that the graph is in
@@ -389,6 +211,10 @@ class Graph:
                                         lambda event:
                                         self.is_mouse_on_axis(event))
         self._mouse_position = None
+        # Mouse moves are handled once per idle cycle
+        self._text_box_pending = False
+        # What the text box is showing, so it is only rewritten on changes
+        self._text_box_key = None
         self._canvas_widget = self._graphs_canvas.get_tk_widget()
         self._canvas_widget.grid(row=0, column=0)
         self._graphs_canvas.draw()
@@ -400,11 +226,14 @@ class Graph:
     def is_mouse_on_axis(self, event) -> None:
         """Function is called when mouse is moved over the graphs.
         This function builds the text box when the mouse is hovered over the
-        inside the axis"""
+        inside the axis. The text box is built when Tk is idle, so a burst of
+        mouse moves only builds it once."""
         self._mouse_position = event.xdata
         for ax in self._ax:
             if event.inaxes == ax:
-                self.create_text_box()
+                if not self._text_box_pending:
+                    self._text_box_pending = True
+                    self._canvas_widget.after_idle(self.create_text_box)
                 return
 
     def add_to_plot(self, temp_data: list, headers: list) -> None:
@@ -416,53 +245,72 @@ class Graph:
         headers: The header of the CSV file
         """
         for idx, data in enumerate(temp_data):
-            self.temp_data[idx] = data[-Graph.num_data_points:]
+            self.temp_data[idx] = data
         for channel in CHANNELS_LIST:
             if channel in VOLT_CHANNELS:
                 if "(C)" in headers[channel]:
-                    self._ax[T_GRAPH_IDX].plot(self.temp_data[0],
-                                               self.temp_data[channel],
-                                               label=f"channel {channel}",
-                                               marker=MARKER,
-                                               color=COLOURS[channel - 1])
+                    idx = T_GRAPH_IDX
                 else:
-                    self._ax[V_GRAPH_IDX].plot(self.temp_data[0],
-                                               self.temp_data[channel],
-                                               label=f"channel {channel}",
-                                               marker=MARKER,
-                                               color=COLOURS[channel - 1])
+                    idx = V_GRAPH_IDX
             elif channel in ACCEL_CHANNELS:
-                self._ax[A_GRAPH_IDX].plot(self.temp_data[0],
-                                           self.temp_data[channel],
-                                           label=f"channel {channel}",
-                                           marker=MARKER,
-                                           color=COLOURS[channel - 1])
+                idx = A_GRAPH_IDX
             else:
-                self._ax[T_GRAPH_IDX].plot(self.temp_data[0],
-                                           self.temp_data[channel],
-                                           label=f"channel {channel}",
-                                           marker=MARKER,
-                                           color=COLOURS[channel - 1])
+                idx = T_GRAPH_IDX
+            line, = self._ax[idx].plot(self.temp_data[0],
+                                       self.temp_data[channel],
+                                       label=f"channel {channel}",
+                                       marker=MARKER,
+                                       color=COLOURS[channel - 1])
+            self._lines[channel] = line
         # An instance of the data class is made for the text box
         self._data = Data(0)
         self._data.set_headers(headers)
         for g in range(3):
             self._ax[g].legend(loc=LEGEND_LOC)
 
+    def plot_width(self) -> int:
+        """Returns the width of the plots in pixels"""
+        return max(int(self._ax[0].get_window_extent().width), 1)
+
+    def update_plot(self, temp_data: list, low_x: float,
+                    high_x: float) -> None:
+        """
+        This function is used to change the data on the replay graphs after
+        add_to_plot, e.g. when the replay window is moved or zoomed.
+        temp_data: [[Time, ...], [CH1, ...], [CH2, ...], ..., [CH8, ...]]
+        low_x, high_x: the x-axis limits
+        Returns none
+        """
+        self.temp_data = list(temp_data)
+        for channel, line in self._lines.items():
+            line.set_data(self.temp_data[0], self.temp_data[channel])
+        for ax in self._ax:
+            ax.relim()
+            ax.autoscale_view(scalex=False)
+            if high_x > low_x:
+                ax.set_xlim(low_x, high_x)
+        self._graphs_canvas.draw_idle()
+
     def create_text_box(self) -> None:
         """This function creates a text box. The text box displays information
         about the channels. self.temp_data is used to create calculate the
         point for the text box.
         Returns none"""
+        self._text_box_pending = False
         # Resize the amount of temporary time values to be the same length as
         # number of points specified.
-        if len(self.temp_data[0]) < 1:
+        if len(self.temp_data[0]) < 1 or self._mouse_position is None:
             return
 
         xdata = self.temp_data[0]  # xdata is a list of all the times
         nearest_index = search_for_point(self._mouse_position, xdata)
 
         time_point = xdata[nearest_index]
+        # Skip the rewrite if the same point of the same data is shown
+        key = (id(self.temp_data), nearest_index, time_point)
+        if key == self._text_box_key:
+            return
+        self._text_box_key = key
         self._text_box.config(state=tk.NORMAL)  # enable writing
         # delete everything from the second row to the end
         self._text_box.delete(2.0, tk.END)
@@ -482,27 +330,31 @@ class Graph:
             self._text_box.insert(tk.END, text)
         self._text_box.config(state=tk.DISABLED)
 
-    def add_live_plot(self, channels: tuple, data: Data) -> None:
+    def add_live_plot(self, channels: tuple, data: Data,
+                      blit: bool = LIVE_PLOT_BLIT) -> None:
         """ Function is used to create live plots. It should only be called
         once. 'channel' is a list of channels that will be plotted on the
         graph.'data' is used to get the x and y values of the graph.
+        'blit' only redraws the lines each frame. The whole figure is only
+        redrawn when the axis limits change.
         Returns none
         """
         # Initialise Live Plots
         self._data = data
+        self._blit = blit
         for ch in channels:
             if ch in VOLT_CHANNELS:
                 line, = self._ax[V_GRAPH_IDX].plot(
                     [], [], label=f"channel {ch}", marker=MARKER,
-                    color=COLOURS[ch - 1])
+                    color=COLOURS[ch - 1], animated=blit)
             elif ch in ACCEL_CHANNELS:
                 line, = self._ax[A_GRAPH_IDX].plot(
                     [], [], label=f"channel {ch}", marker=MARKER,
-                    color=COLOURS[ch - 1])
+                    color=COLOURS[ch - 1], animated=blit)
             else:
                 line, = self._ax[T_GRAPH_IDX].plot(
                     [], [], label=f"channel {ch}", marker=MARKER,
-                    color=COLOURS[ch - 1])
+                    color=COLOURS[ch - 1], animated=blit)
             self._lines[ch] = line
         for i in range(3):
             self._ax[i].legend(loc=LEGEND_LOC)
@@ -512,48 +364,140 @@ class Graph:
             if not self._data.ready_to_plot():
                 return self._lines.values()
 
-            rows = self._data.get_data()
-            if len(rows[0]) < 4:
-                return self._lines.values()
-            time_latest_data_point = rows[0][-1]
+            # Every sample received since the last frame
+            new_samples, self._sequence = self._data.get_data_since(
+                self._sequence)
+            self._window.extend(new_samples)
             # temp_data can not exceed the specified points
-            self.temp_data[0].append(time_latest_data_point)
-            self.temp_data[0] = self.temp_data[0][-Graph.num_data_points:]
-            # setting the lines
+            self.temp_data = self._window.view()[:, -Graph.num_data_points:]
+            if len(self.temp_data[0]) < 4:
+                return self._lines.values()
+            # setting the lines, the window buffer is not reallocated
             for channel, line_on_graph in self._lines.items():
-                latest_data_point = rows[channel][-1]
-                self.temp_data[channel].append(latest_data_point)
-                self.temp_data[channel] \
-                    = self.temp_data[channel][-Graph.num_data_points:]
-                xdata, ydata = line_on_graph.get_data()
-                # Change the x-axis
-                xdata = np.append(xdata, time_latest_data_point)
-                xdata = xdata[-Graph.num_data_points:]
-                # Change the y-axis
-                ydata = np.append(ydata, latest_data_point)
-                ydata = ydata[-Graph.num_data_points:]
-                # Reset the points on each line
-                line_on_graph.set_data(xdata, ydata)
+                line_on_graph.set_data(self.temp_data[0],
+                                       self.temp_data[channel])
             # Axis adjustments
-            for g in (V_GRAPH_IDX, A_GRAPH_IDX, T_GRAPH_IDX):
-                self._ax[g].set_ylim(self._lower_limit[g],
-                                     self._upper_limit[g])
-                low_x = self.temp_data[0][0]
-                high_x = self.temp_data[0][-1]
-
-                if high_x > low_x:
-                    self._ax[g].set_xlim(low_x, high_x)
+            self.update_limits()
 
             return self._lines.values()
 
+        # Shows the frame times under the graph
+        self._frame_label = tk.Label(self._frame, font=(GUI_FONT, 10),
+                                     text="")
+        self._frame_label.grid(row=1, column=0, sticky="w")
+        if blit:
+            # The background is saved every time the whole figure is drawn
+            self._graphs_canvas.mpl_connect('draw_event',
+                                            self.cache_background)
+            self._timer = self._fig.canvas.new_timer(
+                interval=LIVE_PLOT_INTERVAL)
+            self._timer.add_callback(self.draw_frame, animate)
+            self._timer.start()
+            return
         # FuncAnimation will keep on calling animate
         self._ani = animation.FuncAnimation(
-            self._fig, animate,
+            self._fig, self.time_frame, fargs=(animate,),
             interval=LIVE_PLOT_INTERVAL,
             cache_frame_data=False,  # If this is true we get a warning message
             blit=False  # We are rebuilding the legend every single time
         )
 
+    def stop_live_plot(self) -> None:
+        """Stops the live plot and frees the figure, used before the graph is
+        destroyed.
+        Returns nothing"""
+        if self._timer is not None:
+            self._timer.stop()
+        if self._ani is not None:
+            self._ani.event_source.stop()
+        plt.close(self._fig)
+
+    def update_limits(self) -> None:
+        """Sets the axis limits of the live plots. The y limits come from the
+        settings. The x-axis is scrolled in steps of LIVE_SCROLL_STEP of the
+        visible time, so the limits (and the tick labels) only change every
+        few frames. A full redraw is needed whenever the limits change.
+        Returns none"""
+        for g in (V_GRAPH_IDX, A_GRAPH_IDX, T_GRAPH_IDX):
+            y_limits = (self._lower_limit[g], self._upper_limit[g])
+            if self._ax[g].get_ylim() != y_limits:
+                self._ax[g].set_ylim(*y_limits)
+                self._needs_full_draw = True
+        low_x = self.temp_data[0][0]
+        high_x = self.temp_data[0][-1]
+        if high_x <= low_x:
+            return
+        span = high_x - low_x
+        x_min, x_max = self._ax[V_GRAPH_IDX].get_xlim()
+        if (low_x < x_min or high_x > x_max
+                or x_max - x_min > span * (1 + 2 * LIVE_SCROLL_STEP)):
+            for ax in self._ax:
+                ax.set_xlim(low_x, high_x + span * LIVE_SCROLL_STEP)
+            self._needs_full_draw = True
+
+    def cache_background(self, _) -> None:
+        """Called after the whole figure is drawn. Saves the figure without
+        the lines, then draws the lines on top.
+        Returns none"""
+        self._background = self._graphs_canvas.copy_from_bbox(self._fig.bbox)
+        self.draw_lines()
+
+    def draw_lines(self) -> None:
+        """Draws the lines of the visible plots onto the canvas.
+        Returns none"""
+        for line in self._lines.values():
+            if line.axes.get_visible():
+                line.axes.draw_artist(line)
+
+    def draw_frame(self, animate) -> None:
+        """Called every LIVE_PLOT_INTERVAL ms when blitting. Updates the lines
+        and copies them onto the saved background. The whole figure is only
+        drawn if the limits or the layout have changed.
+        Returns none"""
+        start = time.perf_counter()
+        animate(None)
+        perf.add_time("animate", start)
+        if self._needs_full_draw or self._background is None:
+            self._needs_full_draw = False
+            self._full_draws += 1
+            self._graphs_canvas.draw()  # Calls cache_background
+        else:
+            self._graphs_canvas.restore_region(self._background)
+            self.draw_lines()
+            self._graphs_canvas.blit(self._fig.bbox)
+        self.add_frame_time(time.perf_counter() - start)
+
+    def time_frame(self, frame, animate):
+        """Used by FuncAnimation when not blitting. The figure is drawn after
+        this returns, so only the time taken by animate is recorded.
+        Returns the lines"""
+        start = time.perf_counter()
+        lines = animate(frame)
+        perf.add_time("animate", start)
+        self._full_draws += 1
+        self.add_frame_time(time.perf_counter() - start)
+        return lines
+
+    def add_frame_time(self, seconds: float) -> None:
+        """Records the time a frame took and shows the average and maximum
+        frame time under the graph.
+        Returns none"""
+        perf.add_seconds("frame", seconds)
+        perf.count("frames")
+        self._frame_times.append(seconds * 1000)
+        self._frame_count += 1
+        if self._frame_count % 4:
+            return  # Only refresh the label every 4 frames
+        self._frame_label.config(
+            text=f"Frame time: {np.mean(self._frame_times):.1f} ms average, "
+                 f"{max(self._frame_times):.1f} ms max, "
+                 f"{self._full_draws} full redraws")
+
+    @property
+    def frame_times(self) -> list:
+        """The most recent frame times in ms"""
+        return list(self._frame_times)
+
     def clear_graphs(self) -> None:
         """Deletes all the data in the graphs.
         Returns none"""
@@ -561,6 +505,8 @@ class Graph:
         for line in self._lines.values():
             line.set_data([], [])
         self._data.clear_data()
+        self._window.clear()
+        self._sequence = self._data.sequence
 
     def move_line(self, channel: int, to_temp: bool) -> None:
         """Function is used to move a line from the volt graph to the
@@ -586,9 +532,11 @@ class Graph:
             label=f"channel {channel}",
             marker=MARKER,
             color=COLOURS[channel - 1],
+            animated=self._blit,
         )
         self._ax[idx].legend(loc=LEGEND_LOC)
         self._lines[channel] = new_line
+        self._needs_full_draw = True  # The legends have changed
 
     def set_upper_limit(self, idx: int, upper_new: float) -> None:
         """Changes the upper limit of the y-axis
@@ -625,6 +573,7 @@ class Graph:
             self._ax[idx].set_visible(True)
         else:
             self._ax[idx].set_visible(False)
+        self._needs_full_draw = True
 
 
 class Port:
@@ -658,10 +607,17 @@ class Port:
         self._port_list = port_list
         self._refresh_but = None
 
-        # Reader thread protocal.
-        self._protocol = None
-        self._err_thread = th.Thread(target=self.handle_errors)
-        self._err_thread.start()
+        # Reads the port and sends messages, see open_link.
+        self._link = None
+        # The port whose baud rate is being worked out, see handle_baud
+        self._negotiating = None
+        # Messages from the reader thread are handled on the Tk thread
+        events.subscribe(EVENT_ERROR, self.show_error)
+        events.subscribe(EVENT_ALARM, self.set_latest_widget_vars)
+        events.subscribe(EVENT_THRESHOLD, self.set_latest_widget_vars)
+        events.subscribe(EVENT_MESSAGE, self.set_widget_vars)
+        events.subscribe(EVENT_DATA, self.update_stats_label)
+        events.subscribe(EVENT_BAUD, self.handle_baud)
 
         # Variables from GUI firmware communicates with.
         self._volt_range = widget_vars[VRWIDG]
@@ -675,6 +631,18 @@ class Port:
         self._prev_message = None
 
         self._prev_error = False
+        # Shows the baud rate and the bytes/s received on the Controls tab
+        self._baud_rate = BAUDRATE
+        self._bytes_received = 0
+        self._link_time = time.monotonic()
+        self._link_label = tk.Label(self._root, font=(GUI_FONT, 10),
+                                    text="Link: not connected")
+        self._link_label.grid(row=10, column=0, columnspan=4)
+        # Shows the samples received, damaged and lost
+        self._stats_label = tk.Label(self._root, font=(GUI_FONT, 10),
+                                     text="Samples: 0 received")
+        self._stats_label.grid(row=11, column=0, columnspan=4)
+        self._root.after(LINK_STATS_INTERVAL, self.update_link_label)
 
         # Initalise ability for user to start connecting to GUI.
         self._port_list = self.init_port_list(self._root, self._port_list)
@@ -682,19 +650,17 @@ class Port:
         # Auto clear inital portlist.
         self.refresh_port_list(self._root, self._port_list)
 
-    def handle_errors(self):
-        """Error handling thread function used to print an error message on GUI
+    def show_error(self, message: str):
+        """Handles an EVENT_ERROR by showing an error message on GUI
         for a user to see."""
-        while self._program_running:
-            while errors.empty():
-                time.sleep(0.1)
-            message = errors.get()
-            make_error_pannel(self._root, message, self._program_running)
+        make_error_pannel(self._root, message, self._program_running)
 
     def get_firmware_message(self, message: str):
         """Function is used as the callback function whenerver the LineReader
-        reads something sent from firmware. Will call another function to
-        handle GUI functionality upon recieveing something.
+        reads something sent from firmware. Runs on the reader thread, so it
+        only posts the message as an event and the widgets are changed by
+        set_widget_vars on the Tk thread. Only the latest alarm and threshold
+        message of each channel is kept until the Tk thread gets to them.
         Parameters
         ----------
         message : str
@@ -706,9 +672,58 @@ class Port:
             self._prev_message = self._firm_message
         self._firm_message = message
 
-        lock.acquire()
-        self.set_widget_vars(message)
-        lock.release()
+        if message[0:2] == "AS" or message[0:5] == "AM CH":
+            # "AS CH1 2", "AM CH1 0"
+            events.post_latest(EVENT_ALARM, message[0:6], message)
+        elif message[0:6] in ("ALT CH", "AHT CH"):
+            # "ALT CH1 0.5"
+            events.post_latest(EVENT_THRESHOLD, message[0:7], message)
+        elif message[0:6] in ("HT: CH", "LT: CH"):
+            # All the channels at once "HT: CH1:0.5 CH2:NAN ..."
+            events.post_latest(EVENT_THRESHOLD, message[0:2], message)
+        else:
+            events.post(EVENT_MESSAGE, message)
+
+    def set_latest_widget_vars(self, latest: dict):
+        """Handles coalesced EVENT_ALARM and EVENT_THRESHOLD events on the Tk
+        thread.
+        Parameters
+        ----------
+        latest : dict
+            The latest message of each channel, in the order received.
+        Returns nothing.
+        """
+        for message in latest.values():
+            self.set_widget_vars(message)
+
+    def update_link_label(self):
+        """Shows the baud rate and the measured bytes/s received from the
+        loggy. Called every LINK_STATS_INTERVAL ms on the Tk thread.
+        Returns nothing."""
+        if not self._program_running:
+            return
+        self._root.after(LINK_STATS_INTERVAL, self.update_link_label)
+        reader = self._link.protocol if self._link else None
+        now = time.monotonic()
+        if reader is None or not self._port or not self._port.is_open:
+            self._link_label.config(text="Link: not connected")
+        else:
+            received = reader.bytes_received
+            rate = ((received - self._bytes_received)
+                    / max(now - self._link_time, 1e-3))
+            self._bytes_received = received
+            self._link_label.config(
+                text=f"Link: {self._baud_rate} baud, {rate:.0f} B/s "
+                     f"({rate * 1000 / self._baud_rate:.0f}% used)")
+        self._link_time = now
+
+    def update_stats_label(self, _=None):
+        """Shows the sample counters, handles EVENT_DATA on the Tk thread.
+        Returns nothing."""
+        received, malformed, gapped = self._data.stats.snapshot()
+        self._stats_label.config(
+            text=f"Samples: {received} received, {malformed} malformed, "
+                 f"{gapped} gapped")
 
     def _check_and_set_alarm(self, message: str, is_high: bool):
         """Function is used to set alarm threasholds within the GUI.
@@ -744,6 +759,20 @@ class Port:
                 self._high_at[channel_idx - 1].set(value=value)
             else:
                 self._low_at[channel_idx - 1].set(value=value)
+            self.update_host_thresholds(channel_idx - 1)
+
+    def update_host_thresholds(self, channel: int):
+        """Gives the thresholds of a channel received from the firmware to
+        the PC's alarms.
+        Parameters
+        ----------
+        channel: int
+            The channel changed, from 0.
+        Returns nothing.
+        """
+        if self._data is not None:
+            set_host_thresholds(self._data, self._low_at[channel],
+                                self._high_at[channel], channel)
 
     def set_widget_vars(self, message):
         """Function is used to adjust the GUI widgets depending on what message
@@ -774,7 +803,13 @@ class Port:
             if self._port.is_open:
                 message = "END CONT#"
                 if self._port.is_open:
-                    self.inside_port_write(message)
+                    self.send(message)
+                    if BINARY_FRAMES:
+                        # Old firmware ignores this and keeps sending text
+                        self.send(BINARY_ON_MESSAGE)
+
+        elif message == BINARY_ACK:
+            pass  # The frames that follow are read by WriteFrames
 
         # High or Low starting thresholds recieved.
         elif message[0:6] == "HT: CH":
@@ -787,9 +822,11 @@ class Port:
         # Individual thresholds recieved.
         elif message[0:6] == "ALT CH":
             self._low_at[int(message[6]) - 1].set(value=message[8:])
+            self.update_host_thresholds(int(message[6]) - 1)
 
         elif message[0:6] == "AHT CH":
             self._high_at[int(message[6]) - 1].set(value=message[8:])
+            self.update_host_thresholds(int(message[6]) - 1)
 
         # Alarm status change.
         elif message[0:2] == "AS":
@@ -843,23 +880,7 @@ class Port:
         Returns a string indicating which port was selected.
         """
         # Check if a prexisting communication exists between firmware and GUI.
-        if self._port:
-            if self._port.is_open:
-                # Stop firmware from sending any messages to GUI.
-                message = "STOP CONT#"
-                self.inside_port_write(message)
-
-                # Killing the reader thread.
-                self._protocol.close()
-                self._protocol.join()
-
-                self._port.close()
-
-                # print(f"number of active threads: {th.active_count()}")
-
-                # print(errors.empty())
-                # time.sleep(0.3)
-                # self._err_thread.join()
+        self.close_link()
 
         # Destroying previous port_list.
         if port_list:
@@ -870,10 +891,7 @@ class Port:
             self._data._ready_to_plot = 0
 
         # Fill out portlist.
-        port_nos = stlp.comports(include_links=False)
-        port_names = []
-        for port_no in port_nos:
-            port_names.append(port_no.device)
+        port_names = list_port_names()
 
         tk.Label(root, text="Port Connection: ").grid(row=0, column=2)
         port_list = ttk.Combobox(root, values=[i for i in port_names],
@@ -909,23 +927,51 @@ class Port:
         self._refresh_but = refresh_ports
         return
 
-    def inside_port_write(self, message):
-        """Function trys to write a message to the firmware connection. If the
-        write fails due to a closed port, a message will be print to the user.
+    def send(self, message):
+        """Sends a message to the firmware. All messages to the firmware go
+        through here. Once connected the link sends it, if the port is lost
+        an error message is shown. Before that it is written straight to the
+        port, and a failure is printed to the terminal.
         Parameters
         ----------
         message : str
             The message to send to firmware.
         Returns nothing.
         """
+        if self._link is not None and self._link.is_alive():
+            self._link.send(message)
+            return
+        if not self._port or not self._port.is_open:
+            return
+        if self._negotiating is not None:
+            print(f"Not sent while connecting: {message}")
+            return
         try:
             self._port.write(message.encode("utf-8"))
 
         except ser.SerialException:
-            print(f"lock status {lock.locked()}")
             print(f"Failed to send {message}!")
             self._prev_error = True
 
+    def close_link(self):
+        """Stops the firmware sending, then stops the reader thread and
+        closes the port, so nothing is left reading it before it (or
+        another port) is connected. A port whose baud rate is being worked
+        out is closed too.
+        Returns nothing.
+        """
+        if self._negotiating is not None:
+            self._negotiating.close()  # handle_baud ignores its result
+            self._negotiating = None
+        if self._port and self._port.is_open:
+            # Sent by the link if there is one, then it stops reading
+            self.send("STOP CONT#")
+        if self._link:
+            self._link.close()
+            self._link = None
+        if self._port:
+            self._port.close()
+
     def connect_to_firm(self, port_items: list):
         """Takes in the selected port from user and starts up connection
         to the firmware. Also starts up the reader thread.
@@ -938,15 +984,16 @@ class Port:
                 located within.
             -   a port_list variable (as described in earlier functions).
 
-        Returns the ser.Serial port connection (after connection) if the
-        connection is succesful. Othewise, an error is thrown and printed in
-        the terminal, and function returns a faulty ser.Serial (which is then
-        refreshed by the user).
+        Returns the ser.Serial port connection if the port was opened, the
+        baud rate is then worked out on a worker thread and the reader thread
+        started by handle_baud. Othewise, an error is shown and function
+        returns None (the port list is then refreshed by the user).
         """
         port = port_items[0]
         port_list = port_items[2]
 
         if port_list:
+            self.close_link()
             try:
                 print("going...")
                 port = ser.Serial(port_list.get(), baudrate=BAUDRATE,
@@ -962,29 +1009,76 @@ class Port:
             # needs to be read in.
 
         self._port = port
-        self._protocol = st.ReaderThread(
+        self._prev_error = False
+        if not port.is_open:
+            return self.start_link(port)
+        # Stop the loggy sending data while the baud rate is worked out. This
+        # also puts the loggy back to BAUDRATE if the GUI was connected.
+        try:
+            port.write(b"STOP CONT#")
+        except ser.SerialException:
+            port.close()
+            make_error_pannel(self._root,
+                              "Invalid Port Connection, "
+                              "please refresh and try another.",
+                              self._program_running)
+            return
+        self._negotiating = port
+        negotiate_later(port)
+        return port
+
+    def handle_baud(self, result: tuple):
+        """Starts reading the port once its baud rate has been worked out,
+        handles EVENT_BAUD on the Tk thread.
+        Parameters
+        ----------
+        result : tuple
+            (port, baud rate), the baud rate is None if the port failed.
+        Returns nothing.
+        """
+        port, rate = result
+        if port is not self._negotiating:
+            return  # Another loggy, see DeviceManager
+        self._negotiating = None
+        if rate is None:
+            port.close()
+            make_error_pannel(self._root, "Lost the connection while "
+                                          "connecting, please refresh and "
+                                          "try another.",
+                              self._program_running)
+            return
+        self._baud_rate = rate
+        self.start_link(port)
+
+    def start_link(self, port: ser.Serial) -> ser.Serial:
+        """Starts the reader thread of a connected port and asks the
+        firmware to start sending.
+        Parameters
+        ----------
+        port : ser.Serial
+            The port, its baud rate has been worked out.
+        Returns the port.
+        """
+        self._bytes_received = 0
+        # The loggy starts the frame sequence again on START CONT
+        self._data.reset_stream()
+
+        self._link = open_link(
             self._port,
-            lambda x=self._root: WriteLines(self.get_firmware_message, x))
-        self._protocol.start()
+            lambda x=self._root: WriteFrames(self.get_firmware_message, x,
+                                             self._data.append_lines,
+                                             self._data.append_frames,
+                                             self._data.stats,
+                                             self._data.skip_frame))
+        self._link.start()
 
         # Initiate graphs to be ready to plot data.
         self._data._ready_to_plot = 1
         self._data._start_time = time.time()
         self._live_graph.clear_graphs()
 
-        # If a previous error has occured, send a message to Firmware to get
-        # starting data.
-        if self._prev_error:
-            lock.acquire()
-            message = "STOP CONT#"
-            self.inside_port_write(message)
-            self._prev_error = True
-            lock.release()
-
         # Send a message to the firmware to say GUI has started connection.
-        lock.acquire()
-        self.inside_port_write(STARTCONTMESSAGE)
-        lock.release()
+        self.send(STARTCONTMESSAGE)
 
         return port
 
@@ -998,9 +1092,198 @@ class Port:
         return self._root
 
 
+class Device(Loggy):
+    """
+    Another loggy connected in the same session as the one on the Controls
+    tab. It has its own link, Data (buffers and counters) and live graph
+    tab. Settings are only sent to the loggy on the Controls tab.
+    """
+
+    def __init__(self, device_id: int, port_name: str, data: Data):
+        """
+        Parameters
+        ----------
+        device_id : int
+            Written with each of its samples in combined recordings.
+        port_name : str
+            The serial port of the loggy.
+        data : Data
+            Where its samples go, shares the TimeBase of the first loggy.
+        """
+        super().__init__(port_name, data)
+        self.device_id = device_id
+        self.graph = None  # Its live graph, set by DeviceManager
+        self.tab = None  # The notebook tab of the graph
+
+
+class DeviceManager:
+    """
+    The loggys connected in one session. The first loggy is the Port on the
+    Controls tab, more are added with the Add Loggy controls and each gets a
+    live graph tab. Every loggy uses the time base of the first one, and
+    while more than one is connected they are recorded to one file with a
+    Device column (see Data.join_recording).
+    """
+
+    def __init__(self, control_frame: tk.Frame, notebook: ttk.Notebook,
+                 port: Port, data: Data, graph: Graph):
+        """
+        Parameters
+        ----------
+        control_frame : tk.Frame
+            Where the Add Loggy controls go.
+        notebook : ttk.Notebook
+            Where the graph tabs of the other loggys go.
+        port, data, graph :
+            The first loggy.
+        """
+        self._notebook = notebook
+        self._port = port
+        self._data = data
+        self._graph = graph
+        self._devices = {}  # {device id: Device}
+        # Loggys whose baud rate is being worked out, {port: Device}
+        self._connecting = {}
+        events.subscribe(EVENT_BAUD, self.handle_baud)
+
+        device_frame = tk.Frame(control_frame)
+        device_frame.grid(row=12, column=0, columnspan=4)
+        tk.Label(device_frame, text="Other Loggys: ").grid(row=0, column=0)
+        self._port_list = ttk.Combobox(device_frame, state="readonly",
+                                       postcommand=self.refresh_ports)
+        self._port_list.grid(row=0, column=1)
+        tk.Button(device_frame, text="Add Loggy",
+                  command=self.add_selected).grid(row=0, column=2)
+        self._root = control_frame
+
+    def refresh_ports(self) -> None:
+        """Lists the ports that are not connected yet.
+        Returns nothing"""
+        in_use = self.ports_in_use()
+        self._port_list["values"] = [
+            name for name in list_port_names() if name not in in_use]
+
+    def ports_in_use(self) -> set:
+        """Returns the names of the ports of all the connected loggys"""
+        in_use = {device.port_name for device in self._devices.values()}
+        in_use.update(device.port_name
+                      for device in self._connecting.values())
+        if self._port.port and self._port.port.is_open:
+            in_use.add(self._port.port.port)
+        return in_use
+
+    def add_selected(self) -> None:
+        """Connects the loggy on the selected port.
+        Returns nothing"""
+        port_name = self._port_list.get()
+        if port_name:
+            self.add_device(port_name)
+
+    def add_device(self, port_name: str) -> Device | None:
+        """Connects another loggy. Its baud rate is worked out on a worker
+        thread, then handle_baud gives it a live graph tab.
+        Returns the Device, or None if it could not be connected"""
+        if self._data.recording:
+            make_error_pannel(self._root, "Stop recording before adding "
+                                          "a loggy.", True)
+            return None
+        if port_name in self.ports_in_use():
+            make_error_pannel(self._root, f"{port_name} is already "
+                                          "connected.", True)
+            return None
+        device_id = max([*self._devices, *(
+            device.device_id for device in self._connecting.values())],
+            default=1) + 1
+        data = Data(0, time_base=self._data.time_base)
+        device = Device(device_id, port_name, data)
+        try:
+            port = device.open_port()
+        except (ser.SerialException, ValueError):
+            make_error_pannel(self._root, "Invalid Port Connection, please "
+                                          "refresh and try another.", True)
+            return None
+        self._connecting[port] = device
+        negotiate_later(port)
+        return device
+
+    def handle_baud(self, result: tuple) -> None:
+        """Starts reading a loggy added with add_device once its baud rate
+        has been worked out and gives it a live graph tab, handles EVENT_BAUD
+        on the Tk thread.
+        result: (port, baud rate), the baud rate is None if the port failed
+        Returns nothing"""
+        port, rate = result
+        device = self._connecting.pop(port, None)
+        if device is None:
+            return  # The loggy on the Controls tab, see Port
+        if rate is None or self._data.recording:
+            port.close()
+            make_error_pannel(
+                self._root, "Stop recording before adding a loggy."
+                if rate else f"Lost the connection to {device.port_name}, "
+                             "please refresh and try another.", True)
+            return
+        device.baud_rate = rate
+        device.start(port)
+        device_id = device.device_id
+        data = device.data
+        port_name = device.port_name
+        self._data.join_recording(data, device_id)
+        self._devices[device_id] = device
+
+        device.tab = ttk.Frame(self._notebook)
+        device.tab.rowconfigure(1, weight=1)
+        device.tab.columnconfigure(0, weight=1)
+        tk.Button(device.tab, text=f"Disconnect {port_name}",
+                  command=lambda: self.remove_device(device_id)).grid(row=0)
+        graph_frame = tk.Frame(device.tab)
+        graph_frame.grid(row=1, column=0, sticky="nsew")
+        graph_frame.rowconfigure(0, weight=1)
+        graph_frame.columnconfigure(0, weight=1)
+        device.graph = Graph(create_scrollable_frame(graph_frame),
+                             (V_TITLE, A_TITLE, T_TITLE),
+                             (VOLT_Y_LABEL, ACCEL_Y_LABEL, TEMP_Y_LABEL))
+        device.graph.add_live_plot(CHANNELS_LIST, data)
+        self._notebook.add(device.tab, text=f"Loggy {device_id}")
+
+    def remove_device(self, device_id: int) -> None:
+        """Disconnects a loggy added with add_device and removes its tab.
+        Returns nothing"""
+        if self._data.recording:
+            make_error_pannel(self._root, "Stop recording before removing "
+                                          "a loggy.", True)
+            return
+        device = self._devices.pop(device_id)
+        device.close()
+        self._data.leave_recording(device.data)
+        device.graph.stop_live_plot()
+        self._notebook.forget(device.tab)
+        device.tab.destroy()
+
+    def clear_graphs(self) -> None:
+        """Clears the graphs of every loggy, the time base starts again.
+        Returns nothing"""
+        self._graph.clear_graphs()
+        for device in self._devices.values():
+            device.graph.clear_graphs()
+
+    def close_all(self) -> None:
+        """Disconnects the loggys added with add_device.
+        Returns nothing"""
+        for device in self._devices.values():
+            device.close()
+        self._devices.clear()
+        for port in self._connecting:
+            port.close()
+        self._connecting.clear()
+
+    @property
+    def devices(self) -> list:
+        return list(self._devices.values())
+
+
 def write_to_port(port_struct: Port, message: str):
-    """Function trys to write a message to the firmware connection. If the
-    write fails due to a closed port, function closes the LineReader thread.
+    """Function sends a message to the firmware connection, see Port.send.
     Parameters
     ----------
     port_struct: Port
@@ -1010,24 +1293,7 @@ def write_to_port(port_struct: Port, message: str):
         The message to send to firmware.
     Returns nothing.
     """
-    serial_con = port_struct.port
-
-    # Attempt to write to the port, if it is open.
-    if serial_con:
-        if serial_con.is_open:
-            try:
-                serial_con.write(message.encode("utf-8"))
-                serial_con.flush()
-                print(f"mess: {message}")
-                return
-
-            except ser.SerialException:
-                print(f"Failed to send mess: {message}")
-                # Killing the reader protocol.
-                port_struct._protocol.close()
-                port_struct._protocol.join()
-                make_error_pannel(port_struct._root, "Port Connection Lost.",
-                                  port_struct._program_running)
+    port_struct.send(message)
 
 
 def setup_channel_controls(control_frame: tk.Frame, graph: Graph) -> None:
@@ -1068,7 +1334,8 @@ class Replay:
     """Class is used to handle replay functionality within the GUI."""
 
     def __init__(self, control_frame: tk.Frame, data: Data,
-                 port_struct: Port) -> None:
+                 port_struct: Port, alarm_tab: "AlarmTab | None" = None
+                 ) -> None:
         """
         Parameters
         ----------
@@ -1077,13 +1344,22 @@ class Replay:
         data: Data
             Custom Data class that will be used to plot the replayed
             graph results.
+        alarm_tab: AlarmTab
+            Shows the alarms of the opened recording, worked out with the
+            alarm settings of the live data.
         """
+        self._alarm_tab = alarm_tab
+        # Set when the alarms of the opened recording are no longer wanted
+        self._alarm_check_stop = th.Event()
+        if alarm_tab is not None:
+            events.subscribe(EVENT_REPLAY_ALARMS, self.show_replay_alarms)
         # Set replaying to OFF by default.
         self._replaying = OFF
         self._port_info = port_struct
         self._port = port_struct.port
 
         self._data = data
+        self._control_frame = control_frame
         self._graph_data = [[] for _ in range(9)]
         control_frame.columnconfigure(0, weight=1)
         control_frame.rowconfigure(1, weight=1)
@@ -1095,7 +1371,21 @@ class Replay:
                                    bg="gray", state="disabled",
                                    command=self.stop_replay)
         self._stop_but.grid(row=0, column=1)
+        self._convert_but = tk.Button(control_frame, text="Convert File",
+                                      bg="gray", command=self.convert_file)
+        self._convert_but.grid(row=0, column=3)
+        # Shows how much of the file has been read
+        self._progress_label = tk.Label(control_frame, text="")
+        self._progress_label.grid(row=0, column=2)
         self._graph = None
+        # The opened recording and the part of it that is shown (seconds)
+        self._replay_file = None
+        self._window_start = 0.0
+        self._window_length = REPLAY_WINDOW
+        self._goto_time = tk.StringVar()
+        self._window_label = None
+        self._nav_buttons = []
+        self.make_nav_controls(control_frame)
 
         self._graphs_on_bot = tk.Frame(control_frame)
         self._graphs_on_bot.columnconfigure(0, weight=1)
@@ -1115,59 +1405,174 @@ class Replay:
                                               initialdir=os.getcwd(),
                                               filetypes=FILE_TYPES
                                               )
-        data_to_plot = {}
         if not filepath:
             return
-        file = open(filepath, "r")
-        reader = csv.DictReader(file)
-        if not reader.fieldnames:
-            return  # Files with incorrect format
-
-        # Headers of the dictionary
-        for header in reader.fieldnames:
-            data_to_plot[header] = []
-
         try:
-            first_row = next(reader)
-        except StopIteration:
+            replay_file = ReplayFile(filepath, self.show_progress)
+        except (OSError, ValueError, UnicodeDecodeError):
+            self._progress_label.config(text="")
+            make_error_pannel(self._control_frame,
+                              "Could not read the file, please choose a "
+                              "recording made by the GUI.", True)
             return  # Files with incorrect format
-
-        start_time = datetime.strptime(
-            first_row["Time"], "%Y-%m-%d_%H-%M-%S.%f")
-        start_time = start_time.timestamp()
-        data_to_plot["Time"].append(0.0)
-        for header, value in first_row.items():
-            if header != "Time":
-                data_to_plot[header].append(float(value))
-
-        for row in reader:
-            time_dt = datetime.strptime(row["Time"], "%Y-%m-%d_%H-%M-%S.%f")
-            diff = time_dt.timestamp() - start_time
-            data_to_plot["Time"].append(diff)
-            for header, value in row.items():
-                if header != "Time":
-                    data_to_plot[header].append(float(value))
-
-        temp_data = [[] for _ in range(9)]
-        headers = []
-
-        channel_num = 1
-        for header, channel_data in data_to_plot.items():
-            if header == "Time":
-                temp_data[0] = channel_data
-                headers.append("RPMODE")
-            else:
-                headers.append(header)
-                temp_data[channel_num] = channel_data
-                channel_num += 1
+        self._progress_label.config(text="")
+        self._alarm_check_stop.set()
+        if self._replay_file:
+            self._replay_file.close()
+        self._replay_file = replay_file
+        if self._alarm_tab is not None:
+            self._alarm_check_stop = th.Event()
+            self._alarm_tab.show_replay(None, replay_file.start)
+            th.Thread(target=self.check_alarms,
+                      args=(replay_file, self._data.alarms.copy(),
+                            self._alarm_check_stop),
+                      daemon=True).start()
+        headers = list(replay_file.headers)
+        headers[0] = "RPMODE"
+        self._window_start = 0.0
+        self._window_length = min(REPLAY_WINDOW,
+                                  max(replay_file.duration,
+                                      REPLAY_MIN_WINDOW))
         self._graph = Graph(self._graph_frame, (V_TITLE, A_TITLE, T_TITLE),
                             (VOLT_Y_LABEL, ACCEL_Y_LABEL, TEMP_Y_LABEL))
-        self._graph.add_to_plot(temp_data, headers)
+        self._graph.add_to_plot(
+            replay_file.window(0.0, self._window_length,
+                               2 * self._graph.plot_width()), headers)
+        self.show_window()
+        for button in self._nav_buttons:
+            button.config(state="normal")
         self._stop_but.config(state="active")
         message = "RPY ON#"
         write_to_port(self._port_info, message)
         self._replaying = ON
 
+    def convert_file(self):
+        """
+        Function converts a recording of the users choice from csv to binary
+        or from binary to csv. The new file is saved next to the old file
+        with the other file extension.
+        No Parameters.
+        """
+        filepath = filedialog.askopenfilename(title="Convert recording",
+                                              initialdir=os.getcwd(),
+                                              filetypes=FILE_TYPES
+                                              )
+        if not filepath:
+            return
+        try:
+            if filepath.lower().endswith(BIN_EXTENSION):
+                new_path = binary_to_csv(filepath)
+            else:
+                new_path = csv_to_binary(filepath)
+        except (OSError, ValueError, UnicodeDecodeError):
+            make_error_pannel(self._control_frame,
+                              "Could not convert the file, please choose a "
+                              "recording made by the GUI.", True)
+            return
+        self._progress_label.config(text=f"Converted to {new_path}")
+
+    def make_nav_controls(self, control_frame: tk.Frame) -> None:
+        """Creates the buttons used to move and zoom the replay window.
+        Returns nothing"""
+        nav_frame = tk.Frame(control_frame)
+        nav_frame.grid(row=0, column=4)
+        for text, command in (("<<", lambda: self.pan(-0.5)),
+                              ("Zoom In", lambda: self.zoom(0.5)),
+                              ("Zoom Out", lambda: self.zoom(2.0)),
+                              (">>", lambda: self.pan(0.5))):
+            button = tk.Button(nav_frame, text=text, bg="gray",
+                               state="disabled", command=command)
+            button.pack(side=tk.LEFT)
+            self._nav_buttons.append(button)
+        tk.Label(nav_frame, text="Go to (s):").pack(side=tk.LEFT)
+        goto_entry = tk.Entry(nav_frame, textvariable=self._goto_time,
+                              width=10)
+        goto_entry.bind("<Return>", lambda event: self.go_to())
+        goto_entry.pack(side=tk.LEFT)
+        self._window_label = tk.Label(nav_frame, text="")
+        self._window_label.pack(side=tk.LEFT)
+
+    def show_window(self) -> None:
+        """Reads the samples in the current window from the recording and
+        plots them.
+        Returns nothing"""
+        if not self._replay_file or not self._graph:
+            return
+        duration = self._replay_file.duration
+        # Keep the window inside the recording
+        self._window_start = min(self._window_start,
+                                 duration - self._window_length)
+        self._window_start = max(self._window_start, 0.0)
+        end = self._window_start + self._window_length
+        # At most 2 points for each pixel across the plot
+        temp_data = self._replay_file.window(
+            self._window_start, end, 2 * self._graph.plot_width())
+        self._graph.update_plot(temp_data, self._window_start, end)
+        self._window_label.config(
+            text=f"Showing {self._window_start:.1f} s to {end:.1f} s "
+                 f"of {duration:.1f} s")
+
+    def pan(self, fraction: float) -> None:
+        """Moves the replay window by a fraction of its length.
+        fraction: negative to move back in time, positive to move forward
+        Returns nothing"""
+        self._window_start += fraction * self._window_length
+        self.show_window()
+
+    def zoom(self, factor: float) -> None:
+        """Changes the length of the replay window, keeping its centre.
+        factor: less than 1 to zoom in, more than 1 to zoom out
+        Returns nothing"""
+        if not self._replay_file:
+            return
+        centre = self._window_start + self._window_length / 2
+        length = self._window_length * factor
+        length = min(max(length, REPLAY_MIN_WINDOW),
+                     max(self._replay_file.duration, REPLAY_MIN_WINDOW))
+        self._window_length = length
+        self._window_start = centre - length / 2
+        self.show_window()
+
+    def go_to(self) -> None:
+        """Moves the replay window to start at the time in the go to entry.
+        Returns nothing"""
+        seconds = get_num(self._goto_time.get())
+        if isinstance(seconds, str):  # "EMPTY" or "Fail"
+            self._goto_time.set("")
+            return
+        self._window_start = seconds
+        self.show_window()
+
+    @staticmethod
+    def check_alarms(replay_file: ReplayFile, engine, stop: th.Event
+                     ) -> None:
+        """Checks the alarms of a recording on a worker thread and posts the
+        log as an EVENT_REPLAY_ALARMS. Stops early, posting nothing, once
+        stop is set (another recording was opened).
+        Returns nothing"""
+        try:
+            log = engine.evaluate_file(
+                replay_file, progress=lambda _: not stop.is_set())
+        except ValueError:
+            return  # The recording was closed while it was checked
+        if not stop.is_set():
+            events.post(EVENT_REPLAY_ALARMS, (replay_file, log))
+
+    def show_replay_alarms(self, result: tuple) -> None:
+        """Shows the alarms of the opened recording, handles
+        EVENT_REPLAY_ALARMS on the Tk thread.
+        Returns nothing"""
+        replay_file, log = result
+        if replay_file is self._replay_file:
+            self._alarm_tab.show_replay(log, replay_file.start)
+
+    def show_progress(self, fraction: float) -> None:
+        """Shows how much of the csv file has been read while it is loading.
+        fraction: between 0 and 1
+        Returns nothing"""
+        self._progress_label.config(text=f"Loading {fraction:.0%}")
+        self._progress_label.update_idletasks()
+
     def stop_replay(self):
         print("hi")
         # message = "STOP CONT"
@@ -1189,6 +1594,11 @@ class Replay:
 
         # Stopping user from stopping refresh twice.
         self._stop_but.config(state="disabled")
+        for button in self._nav_buttons:
+            button.config(state="disabled")
+        if self._replay_file:
+            self._replay_file.close()
+            self._replay_file = None
 
         self._replaying = OFF
         print("finished replay.")
@@ -1230,6 +1640,29 @@ def get_num(input_str: str) -> float | str:
         return "Fail"
 
 
+def set_host_thresholds(data: Data, lower: tk.StringVar,
+                        upper: tk.StringVar, channel: int) -> None:
+    """Gives the thresholds of a channel, typed in or received from the
+    firmware, to the PC's alarms. An empty or invalid threshold is none.
+    Parameters
+    ----------
+    data: Data
+        Its alarms are checked on the PC.
+    lower, upper: tk.StringVar
+        The thresholds of the channel.
+    channel: int
+        The channel, from 0.
+    Returns nothing.
+    """
+    thresholds = []
+    for variable in (lower, upper):
+        try:
+            thresholds.append(float(variable.get()))
+        except ValueError:  # Empty, no threshold
+            thresholds.append(np.nan)
+    data.alarms.set_thresholds(channel + 1, *thresholds)
+
+
 def determine_channel(channel_str) -> int:
     """Returns the index as an int of each channel.
     Returns -1 if invalid channel is given
@@ -1314,12 +1747,21 @@ class Settings:
                              tk.IntVar(value=DISABLED)]
 
         self._alarm_labels = []
+        # Hysteresis and minimum breach duration of the PC's alarms
+        self._hysteresis = tk.StringVar(value="0")
+        self._min_duration = tk.StringVar(value="0")
 
         self.generate_alarmode_labels()
         # Create all the panels
         self.rtemp_pannel()
         self.set_alarms()
         self.set_no_points()
+        # The PC checks the same alarm modes, whether they are changed here
+        # or by the firmware. Thresholds are given to it once they have been
+        # typed in, see set_alarms.
+        for i in range(8):
+            self._alarm_modes[i].trace_add(
+                "write", lambda *_, index=i: self.update_host_mode(index))
 
     def rtemp_switch_on(self, channel: int, current: str, sensor: str):
         """Switches on Current Source and Thermistor settings if and only if
@@ -1363,7 +1805,7 @@ class Settings:
             self._rtemp_channels[index] = selection
         elif selection in CURRENTS_RTEMP:
             self._amps[index] = selection
-        elif selection in SENSOR_RTEMP:
+        elif selection in SENSOR_MODELS:
             self._sensor[index] = selection
         else:
             return
@@ -1444,7 +1886,7 @@ class Settings:
             combo_curr.grid(row=2 + i, column=1)
             self._combo_boxes[i].append(combo_curr)
             # The Combobox for selecting the sensor
-            combo_sens = ttk.Combobox(pannel, values=SENSOR_RTEMP[1:],
+            combo_sens = ttk.Combobox(pannel, values=list(SENSOR_MODELS),
                                       state="readonly")
             combo_sens.set(SENSOR_RTEMP[0])
             combo_sens.bind("<<ComboboxSelected>>",
@@ -1568,8 +2010,11 @@ class Settings:
         # Using self_no_points to remember values.
         tk.Label(pannel, text="No of Points Visible on Graphs",
                  font=(GUI_FONT, 17)).grid(row=0, column=1, sticky=tk.N)
-        tk.Scale(pannel, from_=10, to_=1000, orient=tk.HORIZONTAL,
-                 command=self._change_points_on_graphs).grid(row=1, column=1)
+        points_scale = tk.Scale(pannel, from_=10, to_=DATA_CAPACITY,
+                                orient=tk.HORIZONTAL,
+                                command=self._change_points_on_graphs)
+        points_scale.set(Graph.num_data_points)
+        points_scale.grid(row=1, column=1)
 
         for i in range(3):
             # Defining units to go next to scaling variables.
@@ -1638,6 +2083,7 @@ class Settings:
                         (self._upper_alarms[i]).set(value="")
                         (self._lower_alarms[i]).set(value=lower)
                     print("Upper limit must be more than lower limit.")
+                    self.update_host_thresholds(i)
                     continue
             # Send the corresponding succesful alarm threshold to firmware.
             if (alarm_th[0:5] == "lower") and (int(alarm_th[6]) == i):
@@ -1646,6 +2092,7 @@ class Settings:
             elif (alarm_th[0:5] == "upper") and (int(alarm_th[6]) == i):
                 (self._upper_alarms[i]).set(value=upper)
                 write_to_port(self._port, f"AHT CH{i + 1} {upper}#")
+            self.update_host_thresholds(i)
         return
 
     def set_alarms(self):
@@ -1692,6 +2139,9 @@ class Settings:
             lower_alarm.bind("<Return>",
                              lambda x, index=i: self.check_alarm_input(
                                  f"lower {index}"))
+            lower_alarm.bind("<FocusOut>",
+                             lambda x, index=i: self.update_host_thresholds(
+                                 index))
             # Places alarm appropriatley on grid.
             lower_alarm.grid(row=lo_alarm_row, column=(3 * i) % 12 + 1)
             tk.Label(alarm_frame, text=unit).grid(
@@ -1708,6 +2158,9 @@ class Settings:
             upper_alarm.bind("<Return>",
                              lambda x, index=i: self.check_alarm_input(
                                  f"upper {index}"))
+            upper_alarm.bind("<FocusOut>",
+                             lambda x, index=i: self.update_host_thresholds(
+                                 index))
 
             upper_alarm.grid(row=hi_alarm_row, column=(3 * i) % 12 + 1)
             tk.Label(alarm_frame, text=unit).grid(
@@ -1734,6 +2187,69 @@ class Settings:
                                index, "Latching")
                            ).grid(row=alarm_status_row, column=(4 * i
                                                                 ) % 12 + 3)
+        self.set_host_alarm_rules(alarm_frame)
+
+    def set_host_alarm_rules(self, alarm_frame: tk.Frame):
+        """Adds the hysteresis and minimum duration entries of the alarms
+        checked on the PC, they apply to every channel.
+        Parameters
+        ----------
+        alarm_frame: tk.Frame
+            The alarm settings, the entries go under them.
+        Returns nothing.
+        """
+        rules_frame = tk.Frame(alarm_frame)
+        rules_frame.grid(row=10, column=0, columnspan=12)
+        tk.Label(rules_frame, text="PC Alarm Hysteresis").grid(row=0,
+                                                               column=0)
+        hysteresis = tk.Entry(rules_frame, textvariable=self._hysteresis)
+        hysteresis.bind("<Return>", lambda x: self.set_host_alarm_rule())
+        hysteresis.grid(row=0, column=1)
+        tk.Label(rules_frame, text="Min Breach (s)").grid(row=0, column=2)
+        min_duration = tk.Entry(rules_frame, textvariable=self._min_duration)
+        min_duration.bind("<Return>", lambda x: self.set_host_alarm_rule())
+        min_duration.grid(row=0, column=3)
+
+    def set_host_alarm_rule(self):
+        """Checks the hysteresis and minimum duration entries and gives them
+        to the PC's alarms.
+        Returns nothing.
+        """
+        hysteresis = get_num(self._hysteresis.get())
+        min_duration = get_num(self._min_duration.get())
+        try:
+            self._data.alarms.set_rules(hysteresis, min_duration)
+        except (TypeError, ValueError):  # "EMPTY", "Fail" or negative
+            make_error_pannel(self._frame, "Hysteresis and minimum breach "
+                                           "must be positive numbers.", True)
+
+    def update_host_thresholds(self, channel: int):
+        """Gives the thresholds of a channel to the PC's alarms. Called when
+        Return is pressed in, or the focus leaves, a threshold entry.
+        Parameters
+        ----------
+        channel: int
+            The channel changed, from 0.
+        Returns nothing.
+        """
+        set_host_thresholds(self._data, self._lower_alarms[channel],
+                            self._upper_alarms[channel], channel)
+
+    def update_host_mode(self, channel: int):
+        """Gives the alarm mode of a channel to the PC's alarms. Called
+        whenever it changes.
+        Parameters
+        ----------
+        channel: int
+            The channel changed, from 0.
+        Returns nothing.
+        """
+        try:
+            mode = self._alarm_modes[channel].get()
+        except tk.TclError:  # Not a number yet
+            return
+        if mode in (DISABLED, LIVE, LATCHING):
+            self._data.alarms.set_mode(channel + 1, mode)
 
     def handle_alarmmode(self, channel: int, mode: str):
         """Function updates the alarm modes on the main screen and shares
@@ -1767,9 +2283,8 @@ class Settings:
         for i in range(8):
             alarm_type = "Disabled"
             alarm_mode = tk.Label(self._alarmess_frame, font=("Bold, 12"),
-                                  text=f"  Alarm Mode Ch{i + 1}: {
-                                      alarm_type}  "
-                                  )
+                                  text=f"  Alarm Mode Ch{i + 1}: "
+                                       f"{alarm_type}  ")
             alarm_mode.grid(row=8 + (i // 4), column=(i % 4))
             self._alarm_labels.append(alarm_mode)
 
@@ -1870,6 +2385,12 @@ class Record:
         self._record_but = tk.Button(control_frame, text="Record?",
                                      bg="gray", command=self.record_switch)
         self._record_but.grid(row=1, column=0)
+        # Save recordings in the binary format instead of csv
+        self._binary = tk.BooleanVar(value=False)
+        self._binary_but = tk.Checkbutton(control_frame,
+                                          text="Binary File (.lgy)",
+                                          variable=self._binary)
+        self._binary_but.grid(row=1, column=1)
         self._setting = setting
         self._vbuttons = voltage_buttons
         self._replay = replay
@@ -1893,6 +2414,7 @@ class Record:
             # Save data as csv file.
             self._data.save_data()
             self._status = 0
+            self._binary_but.config(state="normal")
             self._setting.notebook.tab(1,
                                        state=tk.NORMAL
                                        )  # REF see function header
@@ -1912,8 +2434,9 @@ class Record:
         else:
             if self._port.port.is_open:
                 self._record_but.config(text="Recording!!!", bg="red")
-                self._data.record()
+                self._data.record(self._binary.get())
                 self._status = 1
+                self._binary_but.config(state="disabled")
                 self._setting.notebook.tab(1,
                                            state=tk.DISABLED
                                            )  # REF see function header
@@ -1938,7 +2461,219 @@ class Record:
                                   self._port._program_running)
 
 
-def gui_close(root: tk.Tk, port: Port):
+class AlarmTab:
+    """
+    The Alarms tab. Shows the alarms raised and cleared by the alarms
+    checked on the PC (Data.alarms) as they happen, and the alarms of the
+    recording being replayed, checked with the same settings.
+    """
+
+    def __init__(self, frame: ttk.Frame, data: Data):
+        """
+        Parameters
+        ----------
+        frame : ttk.Frame
+            The Alarms tab.
+        data : Data
+            The data of the first loggy, its alarms are shown.
+        """
+        self._frame = frame
+        self._data = data
+        self._shown = 0  # Index of the next event of the log to show
+        button_frame = tk.Frame(frame)
+        button_frame.grid(row=0, column=0, columnspan=2, sticky="w")
+        tk.Button(button_frame, text="Save Log",
+                  command=self.save_log).grid(row=0, column=0)
+        tk.Button(button_frame, text="Clear Log",
+                  command=self.clear_log).grid(row=0, column=1)
+        self._status_label = tk.Label(button_frame, font=(GUI_FONT, 10),
+                                      text="PC alarms: none on")
+        self._status_label.grid(row=0, column=2)
+        tk.Label(frame, text="Live").grid(row=1, column=0)
+        tk.Label(frame, text="Replay").grid(row=1, column=1)
+        frame.rowconfigure(2, weight=1)
+        frame.columnconfigure(0, weight=1)
+        frame.columnconfigure(1, weight=1)
+        self._live_text = tk.Text(frame, font=("Courier", 10))
+        self._live_text.grid(row=2, column=0, sticky="nsew")
+        self._replay_text = tk.Text(frame, font=("Courier", 10))
+        self._replay_text.grid(row=2, column=1, sticky="nsew")
+        events.subscribe(EVENT_HOST_ALARM, self.show_new)
+
+    @staticmethod
+    def format_event(index: int, event, start: float | None = None) -> str:
+        """Returns one line for an event of the log. The time is the time of
+        day, or the seconds since start if it is given."""
+        time_stamp, channel, raised, side, value = event
+        if start is None:
+            when = time.strftime("%H:%M:%S", time.localtime(time_stamp)) \
+                + f".{int(time_stamp * 1000) % 1000:03d}"
+        else:
+            when = f"{time_stamp - start:.3f} s"
+        return (f"{index:6d} {when:>14} CH{channel} "
+                f"{'raised ' if raised else 'cleared'} "
+                f"{ALARM_SIDE_NAMES.get(side, ''):4} {value:g}\n")
+
+    def show_new(self, _=None) -> None:
+        """Shows the events logged since the last call, handles
+        EVENT_HOST_ALARM on the Tk thread.
+        Returns nothing"""
+        new_events = self._data.alarms.log.events(self._shown)
+        self._live_text.insert(tk.END, "".join(
+            self.format_event(index, event) for index, event
+            in enumerate(new_events.tolist(), self._shown)))
+        self._shown += len(new_events)
+        # Only the latest ALARM_LOG_LINES are kept on screen
+        lines = int(self._live_text.index("end-1c").split(".")[0])
+        if lines > ALARM_LOG_LINES:
+            self._live_text.delete("1.0", f"{lines - ALARM_LOG_LINES}.0")
+        self._live_text.see(tk.END)
+        status = [f"CH{channel} {ALARM_SIDE_NAMES[side]}" for channel, side
+                  in enumerate(self._data.alarms.status.tolist(), 1) if side]
+        self._status_label.config(
+            text=f"PC alarms: {', '.join(status) or 'none on'}")
+
+    def show_replay(self, log, start: float) -> None:
+        """Shows the alarms of a recording opened for replay.
+        log: the AlarmLog of the recording, None while it is being checked
+        start: the time of the first sample, times are shown from it
+        Returns nothing"""
+        self._replay_text.delete("1.0", tk.END)
+        if log is None:
+            self._replay_text.insert(tk.END, "Checking alarms...\n")
+            return
+        found = log.events()
+        if not len(found):
+            self._replay_text.insert(tk.END, "No alarms\n")
+            return
+        self._replay_text.insert(tk.END, "".join(
+            self.format_event(index, event, start) for index, event
+            in enumerate(found.tolist())))
+
+    def save_log(self) -> None:
+        """Saves the live alarm log to a csv file chosen by the user.
+        Returns nothing"""
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".csv", filetypes=(("CSV files", "*.csv"),))
+        if not file_path:
+            return
+        try:
+            self._data.alarms.log.save_csv(file_path)
+        except OSError as error:
+            make_error_pannel(self._frame, f"Could not save: {error}", True)
+
+    def clear_log(self) -> None:
+        """Empties the live alarm log.
+        Returns nothing"""
+        self._data.alarms.log.clear()
+        self._shown = 0
+        self._live_text.delete("1.0", tk.END)
+
+
+class PerfTab:
+    """
+    The Performance tab. Shows the timings of each stage of the pipeline
+    (see PerfStats), refreshed every PERF_INTERVAL ms while the tab is
+    open, and saves them. cProfile and tracemalloc sessions are started and
+    stopped from here, the profile only covers the Tk thread (the live
+    plots, the events and the widgets) as cProfile is per thread.
+    """
+
+    def __init__(self, frame: ttk.Frame, notebook: ttk.Notebook):
+        """
+        Parameters
+        ----------
+        frame : ttk.Frame
+            The Performance tab.
+        notebook : ttk.Notebook
+            The stats are only refreshed while the tab is selected.
+        """
+        self._frame = frame
+        self._notebook = notebook
+        button_frame = tk.Frame(frame)
+        button_frame.grid(row=0, column=0, sticky="w")
+        tk.Button(button_frame, text="Save Stats",
+                  command=self.save_stats).grid(row=0, column=0)
+        tk.Button(button_frame, text="Reset",
+                  command=self.reset).grid(row=0, column=1)
+        self._profile_but = tk.Button(button_frame, text="Start Profile",
+                                      command=self.toggle_profile)
+        self._profile_but.grid(row=0, column=2)
+        self._trace_but = tk.Button(button_frame, text="Start Memory Trace",
+                                    command=self.toggle_tracemalloc)
+        self._trace_but.grid(row=0, column=3)
+        self._button_bg = self._trace_but.cget("bg")
+        frame.rowconfigure(1, weight=1)
+        frame.columnconfigure(0, weight=1)
+        self._text = tk.Text(frame, font=("Courier", 10), wrap="none")
+        self._text.grid(row=1, column=0, sticky="nsew")
+        self._report = ""  # The last profile or memory trace
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Shows the latest stats if the tab is selected, then calls itself
+        again after PERF_INTERVAL ms.
+        Returns nothing"""
+        if self._notebook.select() == str(self._frame):
+            text = perf.format()
+            if self._report:
+                text += "\n\n" + self._report
+            self._text.delete("1.0", tk.END)
+            self._text.insert(tk.END, text)
+        self._frame.after(PERF_INTERVAL, self.refresh)
+
+    def save_stats(self) -> None:
+        """Saves the stats to a JSON file chosen by the user.
+        Returns nothing"""
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".json", filetypes=(("JSON files", "*.json"),))
+        if not file_path:
+            return
+        try:
+            perf.dump(file_path)
+        except OSError as error:
+            make_error_pannel(self._frame, f"Could not save: {error}", True)
+
+    def reset(self) -> None:
+        """Forgets the stats and the last report.
+        Returns nothing"""
+        perf.reset()
+        self._report = ""
+
+    def toggle_profile(self) -> None:
+        """Starts cProfile, or stops it and saves the profile to a file
+        chosen by the user.
+        Returns nothing"""
+        if not perf.profiling:
+            perf.start_profile()
+            self._profile_but.config(text="Stop Profile", bg="red")
+            return
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".prof", filetypes=(("Profiles", "*.prof"),))
+        self._profile_but.config(text="Start Profile", bg=self._button_bg)
+        try:
+            self._report = perf.stop_profile(file_path or os.devnull)
+        except OSError as error:
+            make_error_pannel(self._frame, f"Could not save: {error}", True)
+
+    def toggle_tracemalloc(self) -> None:
+        """Starts tracing memory allocations, or stops and saves the lines
+        holding the most memory to a file chosen by the user.
+        Returns nothing"""
+        if not perf.tracing:
+            perf.start_tracemalloc()
+            self._trace_but.config(text="Stop Memory Trace", bg="red")
+            return
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".txt", filetypes=(("Text files", "*.txt"),))
+        self._trace_but.config(text="Start Memory Trace", bg=self._button_bg)
+        try:
+            self._report = perf.stop_tracemalloc(file_path or os.devnull)
+        except OSError as error:
+            make_error_pannel(self._frame, f"Could not save: {error}", True)
+
+
+def gui_close(root: tk.Tk, port: Port, devices: DeviceManager | None = None):
     """
     Function closes the window, and any ongoing threads when the user closes
     the GUI.
@@ -1948,25 +2683,24 @@ def gui_close(root: tk.Tk, port: Port):
         Main window of the GUI.
     port: Port
         Custom Port classed used to communication with firmware.
+    devices: DeviceManager
+        The other loggys connected, they are disconnected too.
     """
 
     # Stop firmware from sending anymore messages through port.
     if port and port._port:
         message = "STOP CONT#"
         write_to_port(port, message)
+    events.stop()
+    if port:
+        port._program_running = False
     root.destroy()
 
-    if port._protocol and port._protocol.is_alive():
-        port._protocol.stop()
-        port._protocol.close()
-        port._protocol.join()
-
-    if port and port._err_thread:
-        port._program_running = False
-        if port._err_thread.is_alive():
-            if errors.empty():
-                errors.put("Ending Program")
-            port._err_thread.join()
+    # Sends the last messages and stops the reader.
+    if port and port._link:
+        port._link.close()
+    if devices:
+        devices.close_all()
 
     sys.exit()
 
@@ -1988,11 +2722,15 @@ def main() -> None:
     setting_tab = ttk.Frame(notebook)
     graphs_tab = ttk.Frame(notebook)
     replay_tab = ttk.Frame(notebook)
+    alarm_tab = ttk.Frame(notebook)
+    perf_tab = ttk.Frame(notebook)
     # Adding to notebook
     notebook.add(controls_tab, text="Controls")
     notebook.add(setting_tab, text="Settings")
     notebook.add(graphs_tab, text="Live Graphs")
     notebook.add(replay_tab, text="Replay")
+    notebook.add(alarm_tab, text="Alarms")
+    notebook.add(perf_tab, text="Performance")
     # Graphs
     graphs_tab.rowconfigure(0, weight=1)
     graphs_tab.columnconfigure(0, weight=1)
@@ -2065,14 +2803,27 @@ def main() -> None:
 
     # Replay
     # Sets up replay button.
-    replay = Replay(replay_tab, loggy_data, port)
+    replay = Replay(replay_tab, loggy_data, port,
+                    AlarmTab(alarm_tab, loggy_data))
 
     # Sets up recording button
     Record(control_frame, clear_graph, replay, port, setting, [volt1, volt2],
            data=loggy_data)
 
+    # More loggys can be connected, each gets a graph tab
+    devices = DeviceManager(control_frame, notebook, port, loggy_data,
+                            live_graph)
+    clear_graph.config(command=devices.clear_graphs)
+
+    # Timings of the pipeline, profiling and memory tracing
+    perf.gauge("record queue", lambda: loggy_data.record_queue_depth)
+    PerfTab(perf_tab, notebook)
+
+    # Handle the events posted by the reader and recording threads
+    events.start(root)
+
     # End
-    root.protocol("WM_DELETE_WINDOW", lambda: gui_close(root, port))
+    root.protocol("WM_DELETE_WINDOW", lambda: gui_close(root, port, devices))
 
     root.mainloop()
 
@@ -0,0 +1,10 @@
+"""
+Run the tests from the lab_pc folder with python -m pytest. They need no
+loggy, the ones that talk to a loggy use the simulator on a pseudo-terminal.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+# No display is needed, set before pyplot is imported by main_gui
+os.environ["MPLBACKEND"] = "Agg"
@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+from loggy.alarms import (ALARM_DISABLED, ALARM_EVENT_DTYPE, ALARM_HIGH,
+                          ALARM_LATCHING, ALARM_LIVE, ALARM_LOW, AlarmEngine,
+                          AlarmLog)
+
+NUM_TRACES = 300
+
+
+def reference(times, values, lower, upper, modes, hysteresis, min_duration):
+    """One sample at a time state machine that AlarmEngine must match.
+    Returns [(time, channel, raised, value)]"""
+    num_channels = len(lower)
+    breached = [False] * num_channels
+    since = [0.0] * num_channels
+    on = [False] * num_channels
+    latched = [False] * num_channels
+    status = [False] * num_channels
+    found = []
+    for i, now in enumerate(times.tolist()):
+        for c in range(num_channels):
+            value = values[c, i]
+            breach = value < lower[c] or value > upper[c]
+            if breach and not breached[c]:
+                since[c] = now
+            breached[c] = breach
+            inside = not (value < lower[c] + hysteresis[c]
+                          or value > upper[c] - hysteresis[c])
+            if breach and now - since[c] >= min_duration[c]:
+                on[c] = True
+            elif inside:
+                on[c] = False
+            latched[c] |= on[c]
+            new_status = modes[c] != ALARM_DISABLED and (
+                latched[c] if modes[c] == ALARM_LATCHING else on[c])
+            if new_status != status[c]:
+                found.append((now, c + 1, int(new_status), value))
+            status[c] = new_status
+    return found
+
+
+@pytest.mark.parametrize("seed", range(NUM_TRACES))
+def test_matches_reference(seed):
+    """Random walks checked in random blocks, every mode, NaN thresholds,
+    hysteresis and minimum duration"""
+    rng = np.random.default_rng(seed)
+    num_samples = int(rng.integers(1, 400))
+    times = np.cumsum(rng.uniform(0.001, 0.02, num_samples))
+    values = np.cumsum(rng.normal(0, 0.3, (8, num_samples)), axis=1)
+    lower = rng.uniform(-3, 0, 8)
+    upper = rng.uniform(0, 3, 8)
+    lower[rng.random(8) < 0.2] = np.nan
+    upper[rng.random(8) < 0.2] = np.nan
+    modes = rng.integers(0, 3, 8)
+    hysteresis = rng.choice([0.0, 0.2, 1.0], 8)
+    min_duration = rng.choice([0.0, 0.01, 0.1], 8)
+    engine = AlarmEngine()
+    for c in range(8):
+        engine.set_thresholds(c + 1, lower[c], upper[c])
+        engine.set_mode(c + 1, int(modes[c]))
+        engine.set_rules(hysteresis[c], min_duration[c], c + 1)
+    cuts = set(rng.integers(0, num_samples, int(rng.integers(0, 6))).tolist())
+    cuts = sorted(cuts | {0, num_samples})
+    for first, last in zip(cuts, cuts[1:]):
+        engine.evaluate(times[first:last], values[:, first:last])
+
+    logged = engine.log.events()
+    expected = reference(times, values, lower, upper, modes, hysteresis,
+                         min_duration)
+    assert sorted((t, c, r) for t, c, r, _, _ in logged.tolist()) \
+        == sorted((t, c, r) for t, c, r, _ in expected)
+    np.testing.assert_array_equal(np.sort(logged["value"]),
+                                  np.sort([v for *_, v in expected]))
+    raised = logged[logged["raised"] == 1]
+    is_low = raised["value"] < lower[raised["channel"] - 1]
+    np.testing.assert_array_equal(raised["side"],
+                                  np.where(is_low, ALARM_LOW, ALARM_HIGH))
+
+
+def test_latching_holds_until_reset():
+    engine = AlarmEngine()
+    engine.set_thresholds(1, -1.0, 1.0)
+    engine.set_mode(1, ALARM_LATCHING)
+    values = np.zeros((8, 4))
+    values[0] = [0.0, 2.0, 0.0, 0.0]
+    engine.evaluate(np.arange(4.0), values)
+    assert engine.status[0] == ALARM_HIGH
+    engine.reset(1)
+    assert engine.status[0] == 0
+    assert len(engine.log) == 1
+
+
+def test_disabled_does_nothing():
+    engine = AlarmEngine()
+    engine.set_thresholds(1, -1.0, 1.0)
+    engine.set_mode(1, ALARM_LIVE)
+    engine.set_mode(1, ALARM_DISABLED)
+    assert not engine.enabled
+    assert not len(engine.evaluate(np.arange(3.0), np.full((8, 3), 5.0)))
+
+
+def test_log_queries():
+    log = AlarmLog()
+    for first in range(0, 3000, 1000):  # Grows past ALARM_LOG_START
+        new_events = np.zeros(1000, dtype=ALARM_EVENT_DTYPE)
+        new_events["time"] = np.arange(first, first + 1000)
+        new_events["channel"] = np.arange(1000) % 8 + 1
+        log.extend(new_events)
+    assert len(log) == 3000
+    assert len(log.events(first=2500)) == 500
+    window = log.events(start=100, end=200)
+    assert window["time"][0] == 100 and len(window) == 100
+    assert (log.events(channel=3)["channel"] == 3).all()
+    log.clear()
+    assert not len(log.events())
+
+
+def test_threshold_change_keeps_latched():
+    """Changing a threshold, or setting the same mode again, leaves a latched
+    alarm on"""
+    engine = AlarmEngine()
+    engine.set_thresholds(1, -1.0, 1.0)
+    engine.set_mode(1, ALARM_LATCHING)
+    values = np.zeros((8, 3))
+    values[0] = [0.0, 2.0, 0.0]
+    engine.evaluate(np.arange(3.0), values)
+    engine.set_thresholds(1, -1.0, 3.0)
+    engine.set_mode(1, ALARM_LATCHING)
+    engine.evaluate(np.arange(3.0, 5.0), np.zeros((8, 2)))
+    assert engine.status[0] == ALARM_HIGH
+    assert len(engine.log) == 1
@@ -0,0 +1,201 @@
+import sys
+import threading as th
+import time
+import pytest
+import serial as ser
+from loggy.core import (BAUD_RATES, BAUDRATE, EVENT_BAUD, AsyncLink, Data,
+                        EventQueue, Loggy, TimeBase, negotiate_later)
+import loggy.core as core
+from loggy.simulator import SimulatedLoggy
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32",
+                                reason="the simulator needs a pty")
+
+
+@pytest.fixture
+def port_name():
+    simulator = SimulatedLoggy(rate=1000)
+    yield simulator.start()
+    simulator.stop()
+
+
+def test_device_added_before_session_started(port_name):
+    """A loggy connected before the first loggy of the session, so nothing
+    has set the shared time base yet"""
+    time_base = TimeBase()
+    data = Data(0, time_base=time_base)
+    loggy = Loggy(port_name, data)
+    loggy.negotiate = False
+    loggy.connect()
+    try:
+        deadline = time.monotonic() + 5
+        while data.stats.snapshot()[0] < 100 and time.monotonic() < deadline:
+            core.events.handle_pending()
+            time.sleep(0.05)
+        assert loggy.connected
+        assert time_base.start is not None
+        received, malformed, gapped = data.stats.snapshot()
+        assert received >= 100
+        # Times are from when it connected, the first samples received
+        # together are spaced out back from then
+        times = data.get_data()[0]
+        assert (times > -1).all() and (times < 60).all()
+    finally:
+        loggy.close()
+
+
+def test_baud_worked_out_on_worker(port_name, monkeypatch):
+    """negotiate_later returns at once and posts the baud rate"""
+    queue = EventQueue()
+    monkeypatch.setattr(core, "events", queue)
+    results = []
+    queue.subscribe(EVENT_BAUD, results.append)
+    port = ser.Serial(port_name, baudrate=BAUDRATE, timeout=0.1)
+    port.write(b"STOP CONT#")
+    try:
+        started = time.perf_counter()
+        worker = negotiate_later(port)
+        assert time.perf_counter() - started < 0.05
+        worker.join(timeout=10)
+        queue.handle_pending()
+        assert results == [(port, BAUD_RATES[-1])]
+    finally:
+        port.close()
+
+
+def test_loggy_started_after_worker(port_name, monkeypatch):
+    """The GUI opens the port, works out the baud rate on a worker and
+    starts the loggy once the rate is posted"""
+    queue = EventQueue()
+    monkeypatch.setattr(core, "events", queue)
+    data = Data(0, time_base=TimeBase())
+    loggy = Loggy(port_name, data)
+    queue.subscribe(EVENT_BAUD, lambda result: loggy.start(result[0]))
+    negotiate_later(loggy.open_port()).join(timeout=10)
+    try:
+        deadline = time.monotonic() + 5
+        while data.stats.snapshot()[0] < 100 and time.monotonic() < deadline:
+            queue.handle_pending()
+            time.sleep(0.05)
+        assert loggy.connected
+        assert data.stats.snapshot()[0] >= 100
+    finally:
+        loggy.close()
+
+
+class PortName:
+    """Stands in for the port list of the Controls tab"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def get(self) -> str:
+        return self.name
+
+
+class NoGraph:
+    def clear_graphs(self):
+        pass
+
+
+def test_reconnect_closes_old_link(port_name, monkeypatch):
+    """Connecting the Controls tab again closes the old reader first, so
+    it does not take the replies to the baud rate negotiation"""
+    import main_gui as gui
+    queue = EventQueue()
+    monkeypatch.setattr(core, "events", queue)
+    monkeypatch.setattr(gui, "events", queue)
+    data = Data(0)
+    data.clear_data()
+    port = gui.Port.__new__(gui.Port)
+    port._root = None
+    port._program_running = True
+    port._live_graph = NoGraph()
+    port._data = data
+    port._port = None
+    port._link = None
+    port._negotiating = None
+    port._baud_rate = BAUDRATE
+    port._firm_message = None
+    port._prev_message = None
+    queue.subscribe(EVENT_BAUD, port.handle_baud)
+    links = []
+    try:
+        for _ in range(2):
+            port.connect_to_firm([None, None, PortName(port_name)])
+            deadline = time.monotonic() + 10
+            while port._link is None and time.monotonic() < deadline:
+                queue.handle_pending()
+                time.sleep(0.05)
+            links.append(port._link)
+            assert port._baud_rate == BAUD_RATES[-1]
+        received = data.stats.snapshot()[0]
+        time.sleep(0.5)
+        assert data.stats.snapshot()[0] > received
+        assert not links[0].is_alive()
+        assert links[1].is_alive()
+    finally:
+        port.close_link()
+
+
+class StuckPort:
+    """A port that receives bytes while a write is stuck"""
+
+    def __init__(self):
+        self.writing = th.Event()
+        self.release = th.Event()
+        self.written = []
+        self.write_timeout = None
+        self.received = b""
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self.received)
+
+    def read(self, size: int) -> bytes:
+        data, self.received = self.received[:size], self.received[size:]
+        return data
+
+    def write(self, data: bytes) -> int:
+        self.writing.set()
+        self.release.wait(5)
+        self.written.append(data)
+        return len(data)
+
+    def close(self):
+        pass
+
+
+class Received:
+    def __init__(self):
+        self.data = b""
+
+    def connection_made(self, transport):
+        pass
+
+    def data_received(self, data: bytes):
+        self.data += data
+
+    def connection_lost(self, error):
+        pass
+
+
+def test_async_link_reads_while_writing():
+    """A write that is stuck does not stop the link reading"""
+    port = StuckPort()
+    link = AsyncLink(port, Received)
+    link.start()
+    try:
+        link.send("STOP CONT#")
+        link.send("SET RATE 10#")
+        assert port.writing.wait(2)
+        port.received = b"1.0#"
+        deadline = time.monotonic() + 2
+        while not link.protocol.data and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert link.protocol.data == b"1.0#"
+        assert port.written == []
+    finally:
+        port.release.set()
+        link.close()
+    assert port.written == [b"STOP CONT#", b"SET RATE 10#"]
@@ -0,0 +1,146 @@
+import threading as th
+import time
+import numpy as np
+import main_gui as gui
+from loggy.alarms import ALARM_HIGH, ALARM_LATCHING, ALARM_LIVE, AlarmEngine
+from loggy.core import (EVENT_ALARM, EVENT_REPLAY_ALARMS, Data, EventQueue,
+                        ReplayFile, WriteFrames)
+
+WIDGET_DELAY = 0.002  # Seconds each widget call takes, a busy UI
+READ_SIZE = 256  # Bytes read from the port at a time
+
+
+class SlowWidget:
+    """Stands in for a Tk variable or label that is slow to change"""
+
+    def __init__(self):
+        self.value = ""
+        self.calls = 0
+
+    def set(self, value=None):
+        time.sleep(WIDGET_DELAY)
+        self.value = value
+        self.calls += 1
+
+    def get(self):
+        return self.value
+
+    def config(self, text=None):
+        self.set(text)
+
+
+def make_port(data: Data):
+    """A Port with slow widgets and no Tk window"""
+    port = gui.Port.__new__(gui.Port)
+    port._firm_message = None
+    port._prev_message = None
+    port._data = data
+    port._alarm_statuses = [SlowWidget() for _ in range(8)]
+    port._alarm_modes = [SlowWidget() for _ in range(8)]
+    port._alarm_mode_label = [SlowWidget() for _ in range(8)]
+    port._low_at = [SlowWidget() for _ in range(8)]
+    port._high_at = [SlowWidget() for _ in range(8)]
+    return port
+
+
+def test_busy_ui_does_not_stall_reader(monkeypatch):
+    """The reader thread reads samples and alarm statuses while the Tk
+    thread is slow to change the widgets. The reader only queues the
+    statuses, so it keeps up, and the widgets end on the latest status"""
+    queue = EventQueue()
+    monkeypatch.setattr(gui, "events", queue)
+    data = Data(1)
+    data.clear_data()
+    port = make_port(data)
+    queue.subscribe(EVENT_ALARM, port.set_latest_widget_vars)
+    lines = []
+    latest = {}
+    for i in range(20_000):
+        lines.append(f"D:{i},1,2,3,4,5,6,7")
+        if i % 10 == 0:
+            channel, status = i // 10 % 8 + 1, i // 10 % 3
+            lines.append(f"AS CH{channel} {status}")
+            latest[channel] = status
+    raw = ("\r\n".join(lines) + "\r\n").encode()
+    reader = WriteFrames(port.get_firmware_message, None, data.append_lines,
+                         data.append_frames, data.stats)
+    read_times = []
+    done = th.Event()
+
+    def read_all():
+        for first in range(0, len(raw), READ_SIZE):
+            start = time.perf_counter()
+            reader.data_received(raw[first:first + READ_SIZE])
+            read_times.append(time.perf_counter() - start)
+        done.set()
+
+    reader_thread = th.Thread(target=read_all, daemon=True)
+    reader_thread.start()
+    drains = 0
+    while not done.is_set() or queue.pending:
+        queue.handle_pending()  # The Tk thread
+        drains += 1
+        time.sleep(0.01)
+    reader_thread.join()
+
+    read_times = np.array(read_times) * 1000
+    # 2000 status messages would take 4 s of widget calls on the reader
+    assert read_times.sum() < 2000, "reader waited for the widgets"
+    assert read_times.max() < 250
+    assert data.stats.snapshot()[0] == 20_000
+    # Coalesced: far fewer widget calls than messages
+    calls = sum(widget.calls for widget in port._alarm_statuses)
+    assert calls <= 8 * drains < 2000
+    for channel, status in latest.items():
+        label = port._alarm_statuses[channel - 1].value
+        assert ("Off" in label) == (status == 0)
+
+
+def test_replay_alarms_checked_on_worker(monkeypatch, tmp_path):
+    """The alarms of a recording are checked on a worker thread and the log
+    is posted to the Tk thread, nothing is posted once it is stopped"""
+    queue = EventQueue()
+    monkeypatch.setattr(gui, "events", queue)
+    file_path = str(tmp_path / "rec.lgy")
+    data = Data(0)
+    data.clear_data()
+    data.record(True, file_path)
+    data.append_lines([f"D:{i % 10},0,0,0,0,0,0,0" for i in range(1000)])
+    data.save_data()
+    replay_file = ReplayFile(file_path)
+    engine = AlarmEngine()
+    engine.set_thresholds(1, float("nan"), 5.0)
+    engine.set_mode(1, ALARM_LIVE)
+    results = []
+    queue.subscribe(EVENT_REPLAY_ALARMS, results.append)
+    for stopped in (True, False):
+        stop = th.Event()
+        if stopped:
+            stop.set()
+        worker = th.Thread(target=gui.Replay.check_alarms,
+                           args=(replay_file, engine.copy(), stop))
+        worker.start()
+        worker.join()
+        queue.handle_pending()
+    assert len(results) == 1
+    checked_file, log = results[0]
+    assert checked_file is replay_file
+    assert len(log) == 199  # Raised every 10 samples, cleared after
+    replay_file.close()
+
+
+def test_firmware_thresholds_keep_latched_alarm():
+    """Thresholds received from the firmware reach the PC's alarms without
+    clearing an alarm that latched"""
+    data = Data(0)
+    data.clear_data()
+    data.alarms.set_mode(1, ALARM_LATCHING)
+    port = make_port(data)
+    port.set_widget_vars("AHT CH1 1.5")
+    data.append_lines(["D:2,0,0,0,0,0,0,0", "D:0,0,0,0,0,0,0,0"])
+    assert data.alarms.status[0] == ALARM_HIGH
+    port.set_widget_vars("AHT CH1 2.5")
+    assert data.alarms.status[0] == ALARM_HIGH
+    data.append_lines(["D:2,0,0,0,0,0,0,0"])
+    assert data.alarms.status[0] == ALARM_HIGH
+    assert len(data.alarms.log) == 1
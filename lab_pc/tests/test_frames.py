@@ -0,0 +1,62 @@
+import binascii
+import numpy as np
+from loggy.core import (FRAME_DTYPE, LOGGY_SAMPLE_RATE, TICK_SECONDS, Data,
+                        WriteFrames)
+
+
+def make_frames(count: int, first_seq: int = 0) -> np.ndarray:
+    """Returns count frames sent at LOGGY_SAMPLE_RATE, the CRCs are not
+    filled in"""
+    frames = np.zeros(count, dtype=FRAME_DTYPE)
+    frames["sync"] = 0xA5
+    frames["seq"] = first_seq + np.arange(count)
+    frames["tick"] = np.arange(count) / LOGGY_SAMPLE_RATE / TICK_SECONDS
+    frames["values"] = np.arange(count)[:, np.newaxis]
+    return frames
+
+
+def test_time_does_not_step_back_after_text():
+    """The first frames after the switch from "D:" lines come after the
+    last line, even though they were taken before it was received"""
+    data = Data(0)
+    data.clear_data()
+    data.append_lines(["D:1,2,3,4,5,6,7,8"] * 10)
+    data.append_frames(make_frames(64))
+    times = data.get_data()[0]
+    assert len(times) == 74
+    assert (np.diff(times) > 0).all()
+
+
+def test_damaged_frame_is_not_a_gap():
+    """A frame with damaged values fails its CRC check, it is counted as
+    malformed but not also as a gap before the next frame"""
+    frames = make_frames(100)
+    size = FRAME_DTYPE.itemsize
+    for frame in frames:
+        frame["crc"] = binascii.crc_hqx(frame.tobytes()[1:size - 2], 0)
+    frames["values"][50, 3] += 1  # The CRC no longer matches
+    data = Data(0)
+    data.clear_data()
+    reader = WriteFrames(lambda message: None, None, data.append_lines,
+                         data.append_frames, data.stats, data.skip_frame)
+    raw = frames.tobytes()
+    for start in range(0, len(raw), 64):
+        reader.data_received(raw[start:start + 64])
+    assert data.stats.snapshot() == (99, 1, 0)
+
+
+def test_frames_recorded_with_float32_repr(tmp_path):
+    """Frame values are written to csv files as the loggy sent them, 0.1
+    and not 0.10000000149011612"""
+    frames = make_frames(300)
+    frames["values"] = np.float32(0.1) * np.arange(300)[:, np.newaxis]
+    file_path = str(tmp_path / "rec.csv")
+    data = Data(0)
+    data.clear_data()
+    data.record(False, file_path)
+    data.append_frames(frames)
+    data.save_data()
+    with open(file_path) as file:
+        rows = file.read().splitlines()[1:]
+    assert [row.split(",")[1:] for row in rows] == [
+        [str(value) for value in frame] for frame in frames["values"]]
@@ -0,0 +1,116 @@
+import os
+import threading as th
+import numpy as np
+import pytest
+from loggy.core import (EVENT_ERROR, Data, Recorder, ReplayFile, events,
+                        float32_to_decimal, format_csv_rows,
+                        open_binary_recording)
+
+HEADERS = ["Time", "CH1 (V)", "CH2 (V)", "CH3 (V)", "CH4 (V)",
+           "CH5 (m/s^2)", "CH6 (m/s^2)", "CH7 (m/s^2)", "CH8 (C)\n"]
+
+
+def make_samples(count: int, start: float = 1.7e9) -> tuple:
+    """Returns (time stamps, (9, count) samples) of made up values"""
+    stamps = start + np.arange(count) / 1000
+    samples = np.random.default_rng(0).normal(size=(9, count))
+    return stamps, samples
+
+
+@pytest.mark.skipif(not os.path.exists("/dev/full"),
+                    reason="needs /dev/full")
+def test_write_error_does_not_block(tmp_path):
+    """Every write to /dev/full fails as if the disk was full. More than
+    RECORD_FLUSH_SIZE is recorded so the writer fails while recording"""
+    errors = []
+    events.subscribe(EVENT_ERROR, errors.append)
+    recorder = Recorder(chunk_size=16, max_chunks=2)
+    recorder.start(HEADERS, str(tmp_path), file_path="/dev/full")
+    stamps, samples = make_samples(60000)
+
+    def add_all():
+        for first in range(0, 60000, 500):
+            recorder.add_block(stamps[first:first + 500],
+                               samples[:, first:first + 500])
+        recorder.stop()
+
+    adder = th.Thread(target=add_all, daemon=True)
+    adder.start()
+    adder.join(timeout=10)
+    assert not adder.is_alive(), "add_block or stop blocked"
+    events.handle_pending()
+    assert any("Could not save recording" in error for error in errors)
+
+
+def make_lines(count: int) -> list:
+    """Returns count "D:" lines like the firmware sends"""
+    values = np.random.default_rng(1).normal(size=(count, 8))
+    return ["D:%.6f,%.6f,%.6f,%.6f,%.6f,%.6f,%.6f,%.6f" % tuple(row)
+            for row in values.tolist()]
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_every_line_is_recorded(tmp_path, binary):
+    """N lines in give N rows out, whether they arrive one at a time or in
+    batches, with no graph drawing anything"""
+    num_lines = 10_000
+    lines = make_lines(num_lines)
+    file_path = str(tmp_path / ("rec.lgy" if binary else "rec.csv"))
+    data = Data(0)
+    data.clear_data()
+    data.record(binary, file_path)
+    for line in lines[:1000]:
+        data.append_data(line)
+    for first in range(1000, num_lines, 64):
+        data.append_lines(lines[first:first + 64])
+    data.save_data()
+    if binary:
+        _, records = open_binary_recording(file_path)
+        values = np.array(records["channels"])
+    else:
+        with open(file_path) as file:
+            rows = file.read().splitlines()[1:]
+        values = np.array([row.split(",")[1:] for row in rows], dtype=float)
+    assert len(values) == num_lines
+    expected = np.array([line[2:].split(",") for line in lines], dtype=float)
+    np.testing.assert_allclose(values, expected, rtol=1e-6)
+    replay_file = ReplayFile(file_path)
+    assert len(replay_file) == num_lines
+    replay_file.close()
+
+
+def test_csv_values_round_trip():
+    """Values are written as f",{value}", and the float32 values of samples
+    from frames with their shortest float32 repr, so both read back the
+    same"""
+    stamps, samples = make_samples(1000)
+    samples[1, :3] = [1.5, 1e-8, 123456.789012]
+    text = format_csv_rows(np.vstack((stamps, samples[1:])))
+    cells = [row.split(",")[1:] for row in text.splitlines()]
+    assert cells == [[f"{value}" for value in row]
+                     for row in samples[1:].T.tolist()]
+    narrow = samples[1:].astype(np.float32)
+    from_frames = np.arange(1000) % 2 == 0
+    mixed = np.where(from_frames, narrow, samples[1:])
+    text = format_csv_rows(np.vstack((stamps, mixed)), from_frames)
+    cells = [row.split(",")[1:] for row in text.splitlines()]
+    assert cells[0::2] == [[str(value) for value in row]
+                           for row in narrow.T[0::2]]
+    assert cells[1::2] == [[f"{value}" for value in row]
+                           for row in samples[1:].T[1::2].tolist()]
+    values = np.array(cells, dtype=float)
+    np.testing.assert_array_equal(values[1::2], mixed.T[1::2])
+    np.testing.assert_array_equal(values[0::2].astype(np.float32),
+                                  narrow.T[0::2])
+
+
+def test_float32_to_decimal():
+    """The same as converting str(np.float32) one value at a time, for any
+    size of value"""
+    rng = np.random.default_rng(2)
+    narrow = np.concatenate((
+        rng.normal(size=1000), rng.normal(size=1000) * 1e4,
+        10.0 ** rng.uniform(-40, 38, 1000), [0.0, -0.0, np.inf, np.nan],
+    )).astype(np.float32)
+    expected = np.array([float(str(value)) for value in narrow])
+    np.testing.assert_array_equal(float32_to_decimal(narrow), expected)
@@ -0,0 +1,85 @@
+import math
+import numpy as np
+import pytest
+from loggy.core import (A_THERM, B_THERM, C_THERM, D_THERM, RTEMP_CURRENTS,
+                        SENSOR_MODELS, RtempTable, add_rtd_model,
+                        add_thermistor_model)
+
+
+def scalar_temperature(voltage: float, current: float, sensor: str) -> float:
+    """The conversion Data.append_data did one sample at a time before the
+    conversion table"""
+    if voltage < 0:
+        voltage *= -1
+    rt = voltage / current
+    if sensor == "PT1000":
+        return -0.287154 * math.sqrt(abs(159861899 - 21000 * rt)) + 3383.81
+    ln = math.log(rt / 1000)
+    return (A_THERM + B_THERM * ln + C_THERM * ln ** 2
+            + D_THERM * ln ** 3) ** -1 - 273.15
+
+
+# Voltages giving -40 C to 150 C for each sensor and current
+VOLTAGES = {
+    ("Thermistor", "200uA"): np.linspace(0.01, 6.0, 500),
+    ("Thermistor", "10uA"): np.linspace(0.0005, 0.3, 500),
+    ("PT1000", "200uA"): np.linspace(0.17, 0.3, 500),
+    ("PT1000", "10uA"): np.linspace(0.0085, 0.015, 500),
+}
+
+
+@pytest.mark.parametrize("sensor, current", list(VOLTAGES))
+def test_table_matches_scalar_formulas(sensor, current):
+    voltages = VOLTAGES[sensor, current]
+    # Negative voltages are converted like positive ones
+    voltages = voltages * np.where(np.arange(len(voltages)) % 2, 1, -1)
+    samples = np.zeros((9, len(voltages)))
+    samples[1:] = voltages
+    table = RtempTable()
+    table.set_channel(2, current, sensor)
+    table.set_channel(4, current, sensor)
+    table.convert(samples)
+    expected = [scalar_temperature(voltage, RTEMP_CURRENTS[current], sensor)
+                for voltage in voltages.tolist()]
+    # The scalar PT1000 formula has rounded constants
+    tolerance = 0.01 if sensor == "PT1000" else 1e-9
+    for channel in (2, 4):
+        np.testing.assert_allclose(samples[channel], expected,
+                                   atol=tolerance)
+    for channel in (1, 3, 5, 6, 7, 8):  # Still voltages
+        np.testing.assert_array_equal(samples[channel], voltages)
+
+
+def test_cleared_channel_is_not_converted():
+    samples = np.full((9, 10), 0.5)
+    table = RtempTable()
+    table.set_channel(1, "200uA", "PT1000")
+    table.clear_channel(1)
+    assert not table
+    table.convert(samples)
+    np.testing.assert_array_equal(samples, 0.5)
+
+
+def test_custom_models():
+    try:
+        # The same coefficients as the built in sensors, under new names
+        add_thermistor_model("Test NTC", 1000.0, A_THERM, B_THERM, C_THERM,
+                             D_THERM)
+        add_rtd_model("Test PT100", 100.0, 3.9083e-3, -5.775e-7)
+        samples = np.zeros((9, 3))
+        samples[1] = [0.1, 0.5, 1.0]
+        temperatures = np.array([-40.0, 25.0, 150.0])
+        resistances = 100.0 * (1 + 3.9083e-3 * temperatures
+                               - 5.775e-7 * temperatures ** 2)
+        samples[2] = resistances * 0.0002
+        table = RtempTable()
+        table.set_channel(1, "200uA", "Test NTC")
+        table.set_channel(2, "200uA", "Test PT100")
+        table.convert(samples)
+        np.testing.assert_allclose(
+            samples[1], [scalar_temperature(v, 0.0002, "Thermistor")
+                         for v in (0.1, 0.5, 1.0)])
+        np.testing.assert_allclose(samples[2], temperatures)
+    finally:
+        SENSOR_MODELS.pop("Test NTC", None)
+        SENSOR_MODELS.pop("Test PT100", None)